@@ -0,0 +1,133 @@
+"""Check that the always-on baseline does not absorb a running device.
+
+A device running at a constant power when the baseline estimator starts
+must still be disaggregated, rather than being taken for always-on load.
+The script checks, with the compiled classifier over the built-in devices:
+
+* ``cold_start``: a fresh estimator whose first readings are the device
+  running on top of the standby load;
+* ``restart``: an estimator that saw ``--days`` days of a synthetic trace
+  from ``load_generator``, then no readings for ``--gap`` days (Home
+  Assistant down for longer than both horizons), then the device running;
+* ``converged``: after those days, the baseline is close to the standby
+  load of the trace.
+
+The script exits non-zero on any failure.
+
+Usage::
+
+    python benchmarks/baseline.py [--device washing_machine] [--power 450]
+        [--hours 3] [--days 2] [--gap 8] [--rate 0.1] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from custom_components.nilm_energy_disaggregation.baseline import (  # noqa: E402
+    BaselineEstimator,
+)
+from custom_components.nilm_energy_disaggregation.model import (  # noqa: E402
+    NilmModel,
+)
+from custom_components.nilm_energy_disaggregation.signatures import (  # noqa: E402
+    builtin_library,
+)
+from load_generator import (  # noqa: E402
+    NOISE_FLOOR,
+    SECONDS_PER_DAY,
+    STANDBY_POWER,
+    generate_day,
+    sample_trace,
+)
+
+MIN_DETECTED = 0.99  # share of the readings the device must be detected in
+STANDBY_TOLERANCE_W = 5.0
+
+
+def constant_load(power: float, hours: float, rate: float) -> np.ndarray:
+    """Return readings of a device running on top of the standby load."""
+    rng = np.random.default_rng(0)
+    count = int(hours * 3600 * rate)
+    return np.round(STANDBY_POWER + power + rng.normal(0.0, NOISE_FLOOR, count), 1)
+
+
+def check_detected(
+    model: NilmModel,
+    estimator: BaselineEstimator,
+    device: str,
+    powers: np.ndarray,
+    start: float,
+    rate: float,
+) -> Dict[str, Any]:
+    """Feed readings from ``start`` and return how often the device is detected."""
+    timestamps = start + np.arange(len(powers)) / rate
+    remaining = estimator.subtract_series(powers, timestamps)
+    detected = model.predict_power_matrix(remaining)[:, model.devices.index(device)] > 0
+    return {
+        "readings": len(powers),
+        "detected": float(detected.mean()),
+        "baseline_w": estimator.value,
+        "ok": bool(detected.mean() >= MIN_DETECTED),
+    }
+
+
+def main() -> None:
+    """Run the checks and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--device", default="washing_machine", help="device running")
+    parser.add_argument("--power", type=float, default=450.0, help="its power in W")
+    parser.add_argument("--hours", type=float, default=3.0, help="how long it runs")
+    parser.add_argument("--days", type=float, default=2.0, help="trace before the gap")
+    parser.add_argument("--gap", type=float, default=8.0, help="days without readings")
+    parser.add_argument("--rate", type=float, default=0.1, help="readings per second")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    model = NilmModel(signatures=builtin_library())
+    load = constant_load(args.power, args.hours, args.rate)
+
+    checks = {
+        "cold_start": check_detected(
+            model, BaselineEstimator(), args.device, load, 0.0, args.rate
+        )
+    }
+
+    estimator = BaselineEstimator()
+    offsets, powers = sample_trace(
+        generate_day(), rate=args.rate, duration=args.days * SECONDS_PER_DAY
+    )
+    estimator.subtract_series(powers, offsets)
+    checks["converged"] = {
+        "baseline_w": estimator.value,
+        "standby_w": STANDBY_POWER,
+        "ok": bool(abs(estimator.value - STANDBY_POWER) <= STANDBY_TOLERANCE_W),
+    }
+    restart = offsets[-1] + args.gap * SECONDS_PER_DAY
+    checks["restart"] = check_detected(model, estimator, args.device, load, restart, args.rate)
+
+    if args.json:
+        print(json.dumps(checks, indent=2))
+    else:
+        for name, check in checks.items():
+            details = " ".join(
+                f"{key}={value:.3g}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in check.items()
+            )
+            print(f"  {name:<11}{details}")
+
+    if not all(check["ok"] for check in checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
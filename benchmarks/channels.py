@@ -0,0 +1,112 @@
+"""Measure the per-tick cost of multi-channel entries.
+
+A tick evaluates the latest reading of every channel. It is timed for a
+growing number of channels in two ways:
+
+* ``batched``: one ``MultiChannelEngine.predict_batch()`` call over the
+  reading vector, as multi-channel entries do;
+* ``per_channel``: one engine call per channel, as separate single-channel
+  entries would do.
+
+Both run the compiled classifier and the edge detection engine, which keeps
+one stream per channel.
+
+Usage::
+
+    python benchmarks/channels.py [--ticks 2000] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from custom_components.nilm_energy_disaggregation.channels import (  # noqa: E402
+    MultiChannelEngine,
+)
+from custom_components.nilm_energy_disaggregation.edge_detection import (  # noqa: E402
+    EdgeDetectionEngine,
+)
+from custom_components.nilm_energy_disaggregation.model import (  # noqa: E402
+    NilmModel,
+)
+from custom_components.nilm_energy_disaggregation.signatures import (  # noqa: E402
+    builtin_library,
+)
+
+CHANNELS = (1, 3, 6, 12, 24)
+
+
+def _tick_us(tick: Callable[[np.ndarray, float], Any], readings: np.ndarray) -> float:
+    """Return the mean time of a tick over every row of readings, in µs."""
+    start = time.perf_counter()
+    for row, values in enumerate(readings):
+        tick(values, float(row))
+    return (time.perf_counter() - start) / len(readings) * 1e6
+
+
+def measure(name: str, factory: Callable[[], Any], ticks: int) -> Dict[str, Any]:
+    """Time both ways of evaluating a tick for every channel count."""
+    rng = np.random.default_rng(0)
+    result: Dict[str, Any] = {"name": name, "ticks": ticks, "latency_us": {}}
+    for channels in CHANNELS:
+        # Piecewise constant loads with a step every 20 ticks or so
+        levels = rng.uniform(0, 3000, (ticks // 20 + 1, channels))
+        readings = np.repeat(levels, 20, axis=0)[:ticks] + rng.normal(0, 5, (ticks, channels))
+
+        engine = MultiChannelEngine(factory(), channels)
+
+        def batched(values: np.ndarray, timestamp: float) -> Any:
+            return engine.predict_batch([values], [timestamp])
+
+        streams = [factory() for _ in range(channels)]
+
+        def per_channel(values: np.ndarray, timestamp: float) -> Any:
+            return [
+                stream.predict_batch([float(value)], [timestamp])
+                for stream, value in zip(streams, values)
+            ]
+
+        result["latency_us"][str(channels)] = {
+            "batched": _tick_us(batched, readings),
+            "per_channel": _tick_us(per_channel, readings),
+        }
+    return result
+
+
+def main() -> None:
+    """Run the measurements and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=2000, help="ticks per measurement")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    model = NilmModel()
+    library = builtin_library()
+    results = [
+        measure("classifier", lambda: model, args.ticks),
+        measure("edge_detection", lambda: EdgeDetectionEngine(library), args.ticks),
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['name']}:")
+        for channels, latency in result["latency_us"].items():
+            print(
+                f"  channels {channels:<3} batched={latency['batched']:.0f} µs "
+                f"per_channel={latency['per_channel']:.0f} µs"
+            )
+
+
+if __name__ == "__main__":
+    main()
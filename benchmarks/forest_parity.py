@@ -0,0 +1,243 @@
+"""Check and measure the compact forest against scikit-learn.
+
+Both the single-feature and the multi-feature training sets of the model
+are fitted with scikit-learn exactly as ``NilmModel.train()`` does, then
+flattened into a ``CompactForest``. Probabilities are compared on:
+
+* ``training``: the training rows;
+* ``random``: uniform rows spanning every feature range and beyond;
+* ``boundaries``: rows placed on every split threshold, one ulp below and
+  one ulp above it, where a folded scaler would most likely disagree;
+* ``counts``: the random rows, through a forest whose leaves hold weighted
+  class counts as scikit-learn stored them before 1.4.
+
+Every comparison must be bit-identical. The script also reports the
+memory of both predictors and their latency for a few batch sizes.
+
+The compiled lookup table of ``NilmModel`` is then compared with the forest
+it was sampled from (``table``), on random powers and on powers around
+every split. The table returns the forest at the nearest grid point, so a
+reading may only get another class, or a confidence off by more than the
+float32 rounding of the table, within half a grid step of a split.
+
+The script exits non-zero on any mismatch.
+
+Usage::
+
+    python benchmarks/forest_parity.py [--rows 20000] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import os
+import pickle
+import sys
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from custom_components.nilm_energy_disaggregation.forest import (  # noqa: E402
+    CompactForest,
+)
+from custom_components.nilm_energy_disaggregation.model import (  # noqa: E402
+    NilmModel,
+)
+
+BATCH_SIZES = (1, 64, 4096)
+TABLE_TOLERANCE = 1e-6  # float32 rounding of the table probabilities
+
+
+def _fit(features: np.ndarray, labels: np.ndarray, params: Dict[str, Any]) -> Any:
+    """Fit a forest behind a scaler, as NilmModel.train() does."""
+    # pylint: disable-next=import-outside-toplevel
+    from sklearn.ensemble import RandomForestClassifier
+
+    # pylint: disable-next=import-outside-toplevel
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(features)
+    forest = RandomForestClassifier(**params).fit(scaler.transform(features), labels)
+    return forest, scaler
+
+
+def _boundary_rows(features: np.ndarray, forest: Any, scaler: Any) -> np.ndarray:
+    """Return rows lying on, just below and just above every split."""
+    rows = []
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        split = tree.children_left >= 0
+        for feature, threshold in zip(tree.feature[split], tree.threshold[split]):
+            raw = threshold * scaler.scale_[feature] + scaler.mean_[feature]
+            for value in (np.nextafter(raw, -np.inf), raw, np.nextafter(raw, np.inf)):
+                row = features[len(rows) % len(features)].copy()
+                row[feature] = value
+                rows.append(row)
+    return np.array(rows)
+
+
+def _with_counts(forest: Any) -> Any:
+    """Return a copy of a forest whose leaves hold weighted class counts."""
+    counted = copy.deepcopy(forest)
+    for estimator in counted.estimators_:
+        tree = estimator.tree_
+        if np.allclose(tree.value.sum(axis=2), 1.0):
+            tree.value[:] = np.rint(
+                tree.value * tree.weighted_n_node_samples[:, np.newaxis, np.newaxis]
+            )
+    return counted
+
+
+def _latency_us(predict: Any, features: np.ndarray, size: int, repeat: int = 20) -> float:
+    """Return the best time of a batch prediction, in µs."""
+    batch = features[:size]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(batch)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def compare(name: str, multi_feature: bool, rows: int) -> Dict[str, Any]:
+    """Compare both predictors on one training set."""
+    model = NilmModel(train=False, multi_feature=multi_feature, compiled=False)
+    data = model.training_data
+    if multi_feature:
+        features = np.asarray(data["features"], dtype=float)
+    else:
+        features = np.asarray(data["power"], dtype=float).reshape(-1, 1)
+    forest, scaler = _fit(features, data["device"], {"n_estimators": 100, "random_state": 42})
+    compact = CompactForest.from_sklearn(forest, scaler)
+
+    def reference(batch: np.ndarray) -> np.ndarray:
+        return forest.predict_proba(scaler.transform(batch))
+
+    rng = np.random.default_rng(0)
+    low, high = features.min(axis=0), features.max(axis=0)
+    span = np.maximum(high - low, 1.0)
+    inputs = {
+        "training": features,
+        "random": rng.uniform(low - span / 4, high + span / 4, (rows, features.shape[1])),
+        "boundaries": _boundary_rows(features, forest, scaler),
+    }
+
+    counted = CompactForest.from_sklearn(_with_counts(forest), scaler)
+    checks = [(check, batch, compact) for check, batch in inputs.items()]
+    checks.append(("counts", inputs["random"], counted))
+
+    result: Dict[str, Any] = {"name": name, "checks": {}}
+    for check, batch, predictor in checks:
+        expected = reference(batch)
+        actual = predictor.predict_proba(batch)
+        result["checks"][check] = {
+            "rows": len(batch),
+            "identical": bool(np.array_equal(expected, actual)),
+            "label_mismatches": int((expected.argmax(axis=1) != actual.argmax(axis=1)).sum()),
+            "max_abs_diff": float(np.abs(expected - actual).max()),
+        }
+
+    result["memory_bytes"] = {
+        "sklearn_pickled": len(pickle.dumps((forest, scaler))),
+        "compact": compact.nbytes,
+    }
+    result["latency_us"] = {
+        str(size): {
+            "sklearn": _latency_us(reference, inputs["random"], size),
+            "compact": _latency_us(compact.predict_proba, inputs["random"], size),
+        }
+        for size in BATCH_SIZES
+    }
+    return result
+
+
+def compare_table(rows: int) -> Dict[str, Any]:
+    """Compare the compiled lookup table with the forest it was sampled from."""
+    # pylint: disable=protected-access
+    compiled = NilmModel(compiled=True)
+    forest = NilmModel(compiled=False)
+    thresholds = np.sort(forest._forest.threshold)
+    powers = np.asarray(compiled.training_data["power"], dtype=float)
+    low, high = powers.min(), powers.max()
+    rng = np.random.default_rng(0)
+    nearby = thresholds[:, np.newaxis] + np.linspace(-2.0, 2.0, 9)
+    batch = np.concatenate(
+        (rng.uniform(low - (high - low) / 4, high + (high - low) / 4, rows), nearby.ravel())
+    )
+
+    expected = forest._predict_proba(batch)
+    actual = compiled._predict_proba(batch)
+    differs = (expected.argmax(axis=1) != actual.argmax(axis=1)) | (
+        np.abs(expected - actual).max(axis=1) > TABLE_TOLERANCE
+    )
+    # Distance of every reading to the nearest split of the forest
+    above = np.clip(np.searchsorted(thresholds, batch), 1, len(thresholds) - 1)
+    distance = np.minimum(
+        np.abs(batch - thresholds[above - 1]), np.abs(batch - thresholds[above])
+    )
+    half_step = compiled._resolution / 2
+    return {
+        "rows": len(batch),
+        "resolution_w": compiled._resolution,
+        "differing": int(differs.sum()),
+        "label_mismatches": int((expected.argmax(axis=1) != actual.argmax(axis=1)).sum()),
+        "max_split_distance_w": float(distance[differs].max()) if differs.any() else 0.0,
+        "ok": bool((distance[differs] <= half_step).all()),
+    }
+
+
+def main() -> None:
+    """Run the comparison and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="random rows per check")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    results = [
+        compare("power", False, args.rows),
+        compare("features", True, args.rows),
+    ]
+    table = compare_table(args.rows)
+    if args.json:
+        print(json.dumps({"forests": results, "table": table}, indent=2))
+    else:
+        for result in results:
+            print(f"{result['name']}:")
+            for check, outcome in result["checks"].items():
+                print(
+                    f"  {check:<11} rows={outcome['rows']:<7} "
+                    f"identical={outcome['identical']} "
+                    f"label_mismatches={outcome['label_mismatches']} "
+                    f"max_abs_diff={outcome['max_abs_diff']:.3g}"
+                )
+            memory = result["memory_bytes"]
+            print(
+                f"  memory     sklearn={memory['sklearn_pickled'] / 1024:.0f} KiB "
+                f"compact={memory['compact'] / 1024:.0f} KiB"
+            )
+            for size, latency in result["latency_us"].items():
+                print(
+                    f"  batch {size:<5} sklearn={latency['sklearn']:.0f} µs "
+                    f"compact={latency['compact']:.0f} µs"
+                )
+
+        print(
+            f"table: rows={table['rows']} resolution={table['resolution_w']:g} W "
+            f"differing={table['differing']} label_mismatches={table['label_mismatches']} "
+            f"max_split_distance={table['max_split_distance_w']:.3g} W ok={table['ok']}"
+        )
+
+    if not table["ok"] or not all(
+        outcome["identical"] for result in results for outcome in result["checks"].values()
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Measure the cold-import cost of the NILM Energy Disaggregation integration.
+
+Every run starts a fresh interpreter, imports the Home Assistant modules the
+integration depends on, and then times:
+
+* ``component``: importing the integration and its platforms, which is what
+  Home Assistant pays before any config entry is set up;
+* ``model``: importing the model module, which setup does in the executor;
+* ``train``: training a model, which only happens on a model cache miss.
+
+Usage::
+
+    python benchmarks/import_time.py [--runs 5] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "custom_components.nilm_energy_disaggregation"
+HEAVY_MODULES = ("numpy", "pandas", "sklearn")
+
+PROBE = f"""
+import json, sys, time
+
+import homeassistant.components.sensor
+import homeassistant.config_entries
+import homeassistant.core
+import homeassistant.helpers.config_validation
+import homeassistant.helpers.event
+import homeassistant.helpers.selector
+import homeassistant.helpers.storage
+
+start = time.perf_counter()
+import {PACKAGE}
+import {PACKAGE}.config_flow
+import {PACKAGE}.sensor
+component = time.perf_counter() - start
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+
+start = time.perf_counter()
+from {PACKAGE}.model import NilmModel
+model = time.perf_counter() - start
+
+start = time.perf_counter()
+nilm_model = NilmModel(train=False)
+nilm_model.train(nilm_model.training_data)
+train = time.perf_counter() - start
+
+print(json.dumps({{
+    "component": component,
+    "model": model,
+    "train": train,
+    "heavy_modules_at_import": loaded,
+}}))
+"""
+
+
+def run_probe() -> dict:
+    """Run the probe in a fresh interpreter and return its measurements."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=REPO_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Run the benchmark and report the median of every stage."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "heavy_modules_at_import": runs[-1]["heavy_modules_at_import"],
+    }
+    for stage in ("component", "model", "train"):
+        result[f"{stage}_ms"] = round(
+            statistics.median(run[stage] for run in runs) * 1000, 2
+        )
+
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print(f"cold import, median of {args.runs} runs")
+    print(f"  component import:          {result['component_ms']:8.2f} ms")
+    print(f"  model import (executor):   {result['model_ms']:8.2f} ms")
+    print(f"  model training (on miss):  {result['train_ms']:8.2f} ms")
+    print(
+        "  heavy modules at import:   "
+        f"{', '.join(result['heavy_modules_at_import']) or 'none'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Generate synthetic household aggregate power traces.
+
+A day of appliance activity is simulated at one second resolution from
+``DEVICE_SIGNATURES``. Every appliance runs a number of times per day, with
+starts favouring the morning and evening. Appliances with a ``cycle_time``
+alternate between heating and idle phases of that many minutes while they
+run, and the refrigerator cycles all day. Runs of different appliances
+overlap freely. A trace is then sampled from the day at any rate, adding
+standby load and measurement noise.
+
+Usage::
+
+    python benchmarks/load_generator.py [--rate 1] [--hours 24] [--seed 0] > trace.csv
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from typing import Dict, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable-next=wrong-import-position
+from custom_components.nilm_energy_disaggregation.const import DEVICE_SIGNATURES
+
+SECONDS_PER_DAY = 86400
+STANDBY_POWER = 15.0  # W drawn by always-on electronics
+NOISE = 0.01  # relative measurement noise
+NOISE_FLOOR = 2.0  # W
+
+# device: (runs per day, run length in minutes); None runs all day
+DEVICE_USAGE: Dict[str, Tuple[float, float] | None] = {
+    "refrigerator": None,
+    "tv": (2, 120),
+    "microwave": (3, 4),
+    "washing_machine": (0.5, 90),
+    "dishwasher": (0.7, 120),
+    "oven": (0.4, 50),
+    "dryer": (0.3, 70),
+    "air_conditioner": (1, 180),
+    "water_heater": (2, 40),
+}
+
+# Relative likelihood of a run starting in each hour of the day
+HOURLY_ACTIVITY = np.array(
+    [1, 1, 1, 1, 1, 1, 2, 4, 4, 2, 2, 2, 3, 2, 2, 2, 3, 4, 5, 5, 4, 3, 2, 1],
+    dtype=float,
+)
+
+
+def _run_starts(rng: np.random.Generator, runs_per_day: float) -> np.ndarray:
+    """Draw the start second of every run of an appliance in one day."""
+    runs = rng.poisson(runs_per_day)
+    hours = rng.choice(24, size=runs, p=HOURLY_ACTIVITY / HOURLY_ACTIVITY.sum())
+    return hours * 3600 + rng.integers(0, 3600, size=runs)
+
+
+def _fill_run(
+    power: np.ndarray,
+    rng: np.random.Generator,
+    signature: Dict[str, float],
+    start: int,
+    length: int,
+) -> None:
+    """Write one run of an appliance into its per-second power array."""
+    end = min(start + length, len(power))
+    cycle = int(signature["cycle_time"] * 60)
+    if cycle <= 0:
+        power[start:end] = rng.uniform(signature["min_power"], signature["max_power"])
+        return
+
+    # Cycling appliances alternate between on and idle phases
+    for phase_start in range(start, end, 2 * cycle):
+        phase_end = min(phase_start + cycle, end)
+        power[phase_start:phase_end] = rng.uniform(
+            signature["min_power"], signature["max_power"]
+        )
+
+
+def generate_day(
+    seed: int = 0, signatures: Dict[str, Dict[str, float]] | None = None
+) -> Dict[str, np.ndarray]:
+    """Return the per-second power of every appliance over one day."""
+    rng = np.random.default_rng(seed)
+    signatures = signatures or DEVICE_SIGNATURES
+    day: Dict[str, np.ndarray] = {}
+    for device, signature in signatures.items():
+        power = np.zeros(SECONDS_PER_DAY)
+        usage = DEVICE_USAGE.get(device, (1, 60))
+        if usage is None:
+            _fill_run(power, rng, signature, int(rng.integers(0, 600)), SECONDS_PER_DAY)
+        else:
+            runs_per_day, minutes = usage
+            for start in _run_starts(rng, runs_per_day):
+                length = int(rng.normal(minutes, minutes / 4) * 60)
+                if length > 0:
+                    _fill_run(power, rng, signature, int(start), length)
+        day[device] = power
+    return day
+
+
+def sample_trace(
+    day: Dict[str, np.ndarray],
+    rate: float = 1.0,
+    start: float = 0.0,
+    duration: float = SECONDS_PER_DAY,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sample the aggregate of a simulated day, return offsets and powers.
+
+    The day wraps around, so any window can be sampled. Readings are rounded
+    to 0.1 W like a typical meter.
+    """
+    rng = np.random.default_rng(seed)
+    offsets = start + np.arange(int(duration * rate)) / rate
+    seconds = offsets.astype(np.int64) % SECONDS_PER_DAY
+    aggregate = np.full(len(offsets), STANDBY_POWER)
+    for power in day.values():
+        aggregate += power[seconds]
+    noise = rng.normal(0.0, 1.0, len(offsets)) * (aggregate * NOISE + NOISE_FLOOR)
+    return offsets - start, np.round(np.maximum(aggregate + noise, 0.0), 1)
+
+
+def main() -> None:
+    """Write a synthetic trace as CSV to stdout."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=1.0, help="samples per second")
+    parser.add_argument("--hours", type=float, default=24.0, help="length of the trace")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    day = generate_day(args.seed)
+    offsets, powers = sample_trace(
+        day, rate=args.rate, duration=args.hours * 3600, seed=args.seed
+    )
+    print("seconds,power")
+    for offset, power in zip(offsets, powers):
+        print(f"{offset:g},{power:g}")
+
+
+if __name__ == "__main__":
+    main()
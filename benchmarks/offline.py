@@ -0,0 +1,672 @@
+"""Disaggregate recorded household datasets offline and score the results.
+
+Houses are read from:
+
+* REDD / UK-DALE style directories: ``labels.dat`` names every
+  ``channel_<n>.dat`` file of ``timestamp power`` rows, and the mains are
+  labelled ``mains`` or ``aggregate``. A directory of ``house_<n>``
+  directories is expanded into its houses;
+* HDF5 files (``.h5``) with one ``(n, 2)`` dataset of timestamps and powers
+  per channel, named after its label. Reading them needs ``h5py``;
+* Home Assistant history CSV exports (``entity_id,state,last_changed``).
+  Their entities are labelled with ``--label``, and a file with a single
+  entity is taken as the mains.
+
+Channel labels are mapped to the devices of the signature library. Common
+REDD and UK-DALE labels are known, and a label equal to a device name maps
+to that device. ``--label LABEL=DEVICE`` adds or overrides a mapping, and
+``--label LABEL=mains`` declares a mains channel. Several mains channels
+(phases) are summed.
+
+Text channels are converted once to raw float64 files in ``--cache-dir``
+and memory-mapped, while HDF5 datasets are sliced directly. Readings are
+evaluated ``--chunk`` rows at a time, so houses of any length run in
+bounded memory. Every house runs in a worker process of a pool.
+
+Readings go through the same steps as the sensor platform:
+
+* an optional mean over ``--interval`` seconds, like the aggregation option;
+* removal of the always-on baseline;
+* the configured engine, built from the signature library in
+  ``--config-dir`` (the built-in library by default). The seq2point
+  engine reads its weights from ``--weights``, or from the config dir.
+
+Device energy is booked like the energy ledger: above ``DEFAULT_MIN_POWER``,
+for the time since the previous reading. Gaps longer than ``--max-gap``
+seconds book nothing. The feature classifier's rolling features and the
+seq2point windows restart at every chunk, like a backfill window.
+
+Reported per house and device:
+
+* the predicted and the true energy;
+* the time-weighted power MAE;
+* the ON/OFF precision, recall and F1.
+
+Reported per house:
+
+* the total energy correctly assigned (TECA), over the devices with ground
+  truth;
+* the throughput in readings per second;
+* how many times faster than real time the house ran.
+
+Usage::
+
+    python benchmarks/offline.py HOUSE [HOUSE ...] [--engine classifier]
+        [--config-dir DIR] [--weights FILE] [--devices refrigerator,oven]
+        [--label LABEL=DEVICE]
+        [--interval 0] [--processes N] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from custom_components.nilm_energy_disaggregation.baseline import (  # noqa: E402
+    BaselineEstimator,
+)
+from custom_components.nilm_energy_disaggregation.const import (  # noqa: E402
+    DEFAULT_ENGINE,
+    DEFAULT_MIN_POWER,
+    DEFAULT_SENSITIVITY,
+    ENGINES,
+    SEQ2POINT_WEIGHTS_FILE,
+)
+from custom_components.nilm_energy_disaggregation.engine_factory import (  # noqa: E402
+    build_channel_engine,
+)
+from custom_components.nilm_energy_disaggregation.signatures import (  # noqa: E402
+    SignatureLibrary,
+    builtin_library,
+    load_signature_library,
+)
+
+MAINS = "mains"
+
+# Dataset labels of the built-in devices
+LABEL_DEVICES = {
+    "mains": MAINS,
+    "aggregate": MAINS,
+    "fridge": "refrigerator",
+    "fridge_freezer": "refrigerator",
+    "freezer": "refrigerator",
+    "television": "tv",
+    "washer_dryer": "washing_machine",
+    "dishwaser": "dishwasher",
+    "electric_oven": "oven",
+    "stove": "oven",
+    "tumble_dryer": "dryer",
+    "air_conditioning": "air_conditioner",
+    "immersion_heater": "water_heater",
+    "boiler": "water_heater",
+}
+
+SECONDS_PER_DAY = 86400
+WH_PER_KWH = 1000
+SECONDS_PER_HOUR = 3600
+
+
+@dataclass(frozen=True)
+class Options:
+    """Settings shared by every house."""
+
+    engine: str
+    sensitivity: float
+    weights: str
+    signatures: SignatureLibrary
+    labels: Dict[str, str]
+    cache_dir: str
+    chunk: int
+    interval: float
+    max_gap: float
+    baseline: bool
+
+
+@dataclass
+class House:
+    """The channels of one house, as sliceable ``(n, 2)`` arrays."""
+
+    name: str
+    mains: List[Any] = field(default_factory=list)
+    devices: Dict[str, List[Any]] = field(default_factory=dict)
+    unmapped: List[str] = field(default_factory=list)
+
+
+def device_of(label: str, options: Options) -> Optional[str]:
+    """Return the device (or mains) a channel label stands for."""
+    if label in options.labels:
+        return options.labels[label]
+    if label in options.signatures or label == MAINS:
+        return label
+    # Numbered channels like "kitchen_outlets_2" share the label of the first
+    return LABEL_DEVICES.get(label.rstrip("0123456789").rstrip("_"), None)
+
+
+def wanted(label: str, options: Options) -> bool:
+    """Return True if a channel is mains or a detected device."""
+    device = device_of(label, options)
+    return device == MAINS or device in options.signatures
+
+
+def add_channel(house: House, label: str, rows: Any, options: Options) -> None:
+    """Add a channel to the house under the device it belongs to."""
+    device = device_of(label, options)
+    if device == MAINS:
+        house.mains.append(rows)
+    elif device in options.signatures:
+        house.devices.setdefault(device, []).append(rows)
+    else:
+        house.unmapped.append(label)
+
+
+def cache_path(options: Options, source: str, key: str = "") -> str:
+    """Return the raw file caching a text channel, keyed by its source."""
+    stat = os.stat(source)
+    digest = hashlib.sha1(
+        f"{os.path.abspath(source)}:{key}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+    ).hexdigest()[:20]
+    return os.path.join(options.cache_dir, f"{digest}.f64")
+
+
+def open_raw(path: str) -> np.ndarray:
+    """Memory-map a raw channel file as ``(n, 2)`` rows."""
+    if not os.path.getsize(path):
+        return np.zeros((0, 2))
+    return np.memmap(path, dtype=np.float64, mode="r").reshape(-1, 2)
+
+
+def convert_dat(source: str, target: str, chunk: int) -> None:
+    """Convert a ``timestamp power`` text channel to a raw file, chunk by chunk."""
+    partial = f"{target}.{os.getpid()}.tmp"
+    with open(source, encoding="ascii") as text, open(partial, "wb") as raw:
+        while True:
+            with warnings.catch_warnings():
+                # The last read of a file is empty
+                warnings.simplefilter("ignore", UserWarning)
+                rows = np.loadtxt(text, max_rows=chunk, ndmin=2, usecols=(0, 1))
+            raw.write(np.ascontiguousarray(rows, dtype=np.float64).tobytes())
+            if len(rows) < chunk:
+                break
+    os.replace(partial, target)
+
+
+def convert_history(source: str, targets: Dict[str, str], chunk: int) -> None:
+    """Convert the entities of a history CSV export to raw files.
+
+    States that are not numbers, such as ``unavailable``, are stored as NaN.
+    """
+    partials = {entity_id: f"{target}.{os.getpid()}.tmp" for entity_id, target in targets.items()}
+    files = {entity_id: open(path, "wb") for entity_id, path in partials.items()}
+    buffers: Dict[str, List[Tuple[float, float]]] = {entity_id: [] for entity_id in targets}
+    try:
+        with open(source, encoding="utf-8", newline="") as text:
+            for row in csv.DictReader(text):
+                buffer = buffers.get(row["entity_id"])
+                if buffer is None:
+                    continue
+                try:
+                    power = float(row["state"])
+                except ValueError:
+                    power = float("nan")
+                changed = datetime.fromisoformat(row["last_changed"].replace("Z", "+00:00"))
+                buffer.append((changed.timestamp(), power))
+                if len(buffer) >= chunk:
+                    files[row["entity_id"]].write(np.array(buffer).tobytes())
+                    buffer.clear()
+        for entity_id, buffer in buffers.items():
+            if buffer:
+                files[entity_id].write(np.array(buffer).tobytes())
+    finally:
+        for raw in files.values():
+            raw.close()
+    for entity_id, partial in partials.items():
+        os.replace(partial, targets[entity_id])
+
+
+def open_dat_house(path: str, options: Options) -> House:
+    """Open a REDD / UK-DALE style house directory."""
+    house = House(os.path.basename(os.path.normpath(path)))
+    with open(os.path.join(path, "labels.dat"), encoding="ascii") as labels:
+        for line in labels:
+            if not line.strip():
+                continue
+            channel, label = line.split(maxsplit=1)
+            label = label.strip()
+            source = os.path.join(path, f"channel_{channel}.dat")
+            if not os.path.isfile(source) or not wanted(label, options):
+                house.unmapped.append(label)
+                continue
+            target = cache_path(options, source)
+            if not os.path.isfile(target):
+                convert_dat(source, target, options.chunk)
+            add_channel(house, label, open_raw(target), options)
+    return house
+
+
+def open_hdf5_house(path: str, options: Options) -> House:
+    """Open an HDF5 house, one dataset per channel."""
+    try:
+        # pylint: disable-next=import-outside-toplevel
+        import h5py
+    except ImportError as err:
+        raise SystemExit(f"Reading {path} needs h5py: pip install h5py") from err
+
+    house = House(os.path.splitext(os.path.basename(path))[0])
+    hdf5 = h5py.File(path, "r")
+    for label, dataset in hdf5.items():
+        if isinstance(dataset, h5py.Dataset) and dataset.ndim == 2:
+            add_channel(house, label, dataset, options)
+    return house
+
+
+def open_history_house(path: str, options: Options) -> House:
+    """Open a Home Assistant history CSV export."""
+    house = House(os.path.splitext(os.path.basename(path))[0])
+    with open(path, encoding="utf-8", newline="") as text:
+        entity_ids = list(dict.fromkeys(row["entity_id"] for row in csv.DictReader(text)))
+    labels = {entity_id: entity_id for entity_id in entity_ids}
+    if len(entity_ids) == 1 and not wanted(entity_ids[0], options):
+        labels[entity_ids[0]] = MAINS
+
+    targets = {
+        entity_id: cache_path(options, path, entity_id)
+        for entity_id, label in labels.items()
+        if wanted(label, options)
+    }
+    missing = {
+        entity_id: target for entity_id, target in targets.items() if not os.path.isfile(target)
+    }
+    if missing:
+        convert_history(path, missing, options.chunk)
+    for entity_id, label in labels.items():
+        if entity_id in targets:
+            add_channel(house, label, open_raw(targets[entity_id]), options)
+        else:
+            house.unmapped.append(entity_id)
+    return house
+
+
+def open_house(path: str, options: Options) -> House:
+    """Open a house in whichever format it is."""
+    if os.path.isdir(path):
+        return open_dat_house(path, options)
+    if path.endswith((".h5", ".hdf5")):
+        return open_hdf5_house(path, options)
+    return open_history_house(path, options)
+
+
+class ChannelCursor:
+    """Look up the value of a channel at increasing timestamps.
+
+    Each reading holds until the next one, for at most ``max_gap`` seconds.
+    Rows are read ``block`` at a time and only the ones still needed are
+    kept, so a channel is streamed once whatever its length.
+    """
+
+    def __init__(self, rows: Any, block: int, max_gap: float) -> None:
+        """Initialize the cursor at the first row."""
+        self._rows = rows
+        self._block = block
+        self._max_gap = max_gap
+        self._next = 0
+        self._times = np.empty(0)
+        self._powers = np.empty(0)
+
+    def values_at(self, times: np.ndarray) -> np.ndarray:
+        """Return the value at every timestamp, NaN where the channel has none."""
+        # Rows before the first timestamp are only needed for the last of them
+        keep = max(int(np.searchsorted(self._times, times[0], side="right")) - 1, 0)
+        times_kept, powers_kept = [self._times[keep:]], [self._powers[keep:]]
+        last = self._times[-1] if len(self._times) else -np.inf
+        while self._next < len(self._rows) and last <= times[-1]:
+            block = np.asarray(self._rows[self._next : self._next + self._block], dtype=float)
+            self._next += len(block)
+            times_kept.append(block[:, 0])
+            powers_kept.append(block[:, 1])
+            last = block[-1, 0]
+        self._times = np.concatenate(times_kept)
+        self._powers = np.concatenate(powers_kept)
+
+        if not len(self._times):
+            return np.full(len(times), np.nan)
+        index = np.searchsorted(self._times, times, side="right") - 1
+        held = np.maximum(index, 0)
+        stale = (index < 0) | (times - self._times[held] > self._max_gap)
+        return np.where(stale, np.nan, self._powers[held])
+
+
+class Resampler:
+    """Mean of the readings over fixed intervals, across chunks."""
+
+    def __init__(self, interval: float) -> None:
+        """Initialize the resampler."""
+        self._interval = interval
+        self._pending = (np.empty(0), np.empty(0))
+
+    def add(
+        self, times: np.ndarray, powers: np.ndarray, final: bool
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the means of the closed intervals, stamped with their end."""
+        times = np.concatenate((self._pending[0], times))
+        powers = np.concatenate((self._pending[1], powers))
+        keys = np.floor(times / self._interval).astype(np.int64)
+        if not final and len(keys):
+            # The last interval may go on in the next chunk
+            cut = int(np.searchsorted(keys, keys[-1]))
+            self._pending = (times[cut:], powers[cut:])
+            keys, powers = keys[:cut], powers[:cut]
+        if not len(keys):
+            return np.empty(0), np.empty(0)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        return (keys[starts] + 1) * self._interval, np.add.reduceat(powers, starts) / counts
+
+
+class Scores:
+    """Energy and accuracy sums of a house, per device, in watt-seconds."""
+
+    def __init__(self, devices: int) -> None:
+        """Initialize empty sums."""
+        self.predicted = np.zeros(devices)
+        self.true = np.zeros(devices)
+        self.error = np.zeros(devices)
+        self.true_positive = np.zeros(devices)
+        self.false_positive = np.zeros(devices)
+        self.false_negative = np.zeros(devices)
+        self.seconds = 0.0
+
+    def add(self, predicted: np.ndarray, truth: np.ndarray, durations: np.ndarray) -> None:
+        """Add the device powers of a chunk of readings."""
+        weights = durations[:, np.newaxis]
+        predicted_on = predicted > DEFAULT_MIN_POWER
+        true_on = truth > DEFAULT_MIN_POWER
+        booked = np.where(predicted_on, predicted, 0.0)
+        self.predicted += (booked * weights).sum(axis=0)
+        self.true += (truth * weights).sum(axis=0)
+        self.error += (np.abs(booked - truth) * weights).sum(axis=0)
+        self.true_positive += ((predicted_on & true_on) * weights).sum(axis=0)
+        self.false_positive += ((predicted_on & ~true_on) * weights).sum(axis=0)
+        self.false_negative += ((~predicted_on & true_on) * weights).sum(axis=0)
+        self.seconds += float(durations.sum())
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    """Return a rounded ratio, None when it is undefined."""
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def evaluate_house(path: str, options: Options) -> Dict[str, Any]:
+    """Disaggregate a house and score it against its device channels."""
+    started = time.perf_counter()
+    house = open_house(path, options)
+    if not house.mains:
+        return {"house": house.name, "error": "no mains channel", "unmapped": house.unmapped}
+
+    engine = _engine(options)
+    devices = list(engine.devices)
+    mains, phases = house.mains[0], house.mains[1:]
+    phase_cursors = [ChannelCursor(rows, options.chunk, options.max_gap) for rows in phases]
+    truth_cursors = {
+        devices.index(device): [
+            ChannelCursor(rows, options.chunk, options.max_gap) for rows in channels
+        ]
+        for device, channels in house.devices.items()
+        if device in devices
+    }
+    estimator = BaselineEstimator() if options.baseline else None
+    resampler = Resampler(options.interval) if options.interval > 0 else None
+    scores = Scores(len(devices))
+    engine_seconds = 0.0
+    readings = 0
+    previous = None
+    first = None
+
+    for start in range(0, len(mains), options.chunk):
+        rows = np.asarray(mains[start : start + options.chunk], dtype=float)
+        times, powers = rows[:, 0], rows[:, 1]
+        for cursor in phase_cursors:
+            powers = powers + cursor.values_at(times)
+        known = ~np.isnan(powers)
+        times, powers = times[known], powers[known]
+        if resampler is not None:
+            times, powers = resampler.add(
+                times, powers, final=start + options.chunk >= len(mains)
+            )
+        if not len(times):
+            continue
+        readings += len(times)
+        first = times[0] if first is None else first
+
+        if estimator is not None:
+            update = estimator.update
+            powers = np.array(
+                [
+                    max(power - update(power, timestamp), 0.0)
+                    for power, timestamp in zip(powers.tolist(), times.tolist())
+                ]
+            )
+        tick = time.perf_counter()
+        predicted = engine.predict_power_matrix(powers, times)
+        engine_seconds += time.perf_counter() - tick
+
+        truth = np.zeros_like(predicted)
+        for column, cursors in truth_cursors.items():
+            for cursor in cursors:
+                truth[:, column] += np.nan_to_num(cursor.values_at(times))
+        durations = np.diff(times, prepend=times[0] if previous is None else previous)
+        durations[durations > options.max_gap] = 0.0
+        scores.add(predicted, truth, durations)
+        previous = times[-1]
+
+    elapsed = time.perf_counter() - started
+    span = float(previous - first) if readings else 0.0
+    error = float(scores.error[list(truth_cursors)].sum())
+    true_total = float(scores.true[list(truth_cursors)].sum())
+    return {
+        "house": house.name,
+        "readings": readings,
+        "days": round(span / SECONDS_PER_DAY, 2),
+        "wall_s": round(elapsed, 2),
+        "engine_s": round(engine_seconds, 2),
+        "readings_per_s": round(readings / elapsed) if elapsed else None,
+        "realtime_factor": round(span / elapsed) if elapsed else None,
+        "teca": round(1 - error / (2 * true_total), 4) if true_total else None,
+        "unmapped": house.unmapped,
+        "devices": {
+            device: {
+                "predicted_kwh": round(scores.predicted[column] / SECONDS_PER_HOUR / WH_PER_KWH, 3),
+                "true_kwh": round(scores.true[column] / SECONDS_PER_HOUR / WH_PER_KWH, 3)
+                if column in truth_cursors
+                else None,
+                **(_device_accuracy(scores, column) if column in truth_cursors else {}),
+            }
+            for column, device in enumerate(devices)
+        },
+    }
+
+
+def _device_accuracy(scores: Scores, column: int) -> Dict[str, Optional[float]]:
+    """Return the accuracy figures of a device with ground truth."""
+    precision = _ratio(
+        scores.true_positive[column],
+        scores.true_positive[column] + scores.false_positive[column],
+    )
+    recall = _ratio(
+        scores.true_positive[column],
+        scores.true_positive[column] + scores.false_negative[column],
+    )
+    return {
+        "energy_error": _ratio(scores.predicted[column] - scores.true[column], scores.true[column]),
+        "mae_w": round(scores.error[column] / scores.seconds, 1) if scores.seconds else None,
+        "precision": precision,
+        "recall": recall,
+        "f1": round(2 * precision * recall / (precision + recall), 4)
+        if precision and recall
+        else None,
+    }
+
+
+# The engine of a worker process, built once and streamed per house
+_ENGINE: Any = None
+
+
+def _init_worker(options: Options) -> None:
+    """Build the engine of a worker process."""
+    global _ENGINE  # pylint: disable=global-statement
+    logging.basicConfig(level=logging.WARNING)
+    _ENGINE = build_channel_engine(
+        options.engine, options.signatures, options.sensitivity, options.weights
+    )
+
+
+def _engine(options: Options) -> Any:
+    """Return the engine for one house, with its own stream state."""
+    if _ENGINE is None:
+        _init_worker(options)
+    return _ENGINE.new_stream() if hasattr(_ENGINE, "new_stream") else _ENGINE
+
+
+def expand_houses(paths: List[str]) -> List[str]:
+    """Return the houses behind the paths, expanding dataset directories."""
+    houses = []
+    for path in paths:
+        if os.path.isdir(path) and not os.path.isfile(os.path.join(path, "labels.dat")):
+            houses.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if os.path.isfile(os.path.join(path, name, "labels.dat"))
+            )
+        else:
+            houses.append(path)
+    return houses
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """Print a table of every house."""
+    for result in results:
+        if "error" in result:
+            print(f"{result['house']}: {result['error']}")
+            continue
+        print(
+            f"{result['house']}: {result['readings']} readings over {result['days']} days "
+            f"in {result['wall_s']} s ({result['readings_per_s']} readings/s, "
+            f"{result['realtime_factor']}x real time), TECA {result['teca']}"
+        )
+        print(
+            f"  {'device':<18}{'pred kWh':>10}{'true kWh':>10}{'error':>8}"
+            f"{'MAE W':>8}{'prec':>7}{'recall':>7}{'F1':>7}"
+        )
+        for device, scores in result["devices"].items():
+            cells = [
+                scores.get(key)
+                for key in ("true_kwh", "energy_error", "mae_w", "precision", "recall", "f1")
+            ]
+            text = ["-" if cell is None else f"{cell:g}" for cell in cells]
+            print(
+                f"  {device:<18}{scores['predicted_kwh']:>10g}{text[0]:>10}{text[1]:>8}"
+                f"{text[2]:>8}{text[3]:>7}{text[4]:>7}{text[5]:>7}"
+            )
+        if result["unmapped"]:
+            print(f"  unmapped: {', '.join(result['unmapped'])}")
+
+
+def main() -> None:
+    """Evaluate every house and report the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("houses", nargs="+", help="house directories, HDF5 or CSV files")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument("--sensitivity", type=float, default=DEFAULT_SENSITIVITY)
+    parser.add_argument("--config-dir", help="directory of a user signature library")
+    parser.add_argument("--devices", help="comma separated devices to detect")
+    parser.add_argument("--weights", help="weights file of the seq2point engine")
+    parser.add_argument(
+        "--label",
+        action="append",
+        default=[],
+        metavar="LABEL=DEVICE",
+        help="map a channel label or entity id to a device, or to mains",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=0.0, help="seconds averaged per reading, 0 for all"
+    )
+    parser.add_argument("--no-baseline", action="store_true", help="keep the always-on load")
+    parser.add_argument(
+        "--max-gap", type=float, default=300.0, help="seconds a reading holds at most"
+    )
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="rows per chunk")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join(os.path.expanduser("~"), ".cache", "nilm_offline"),
+        help="directory of the converted text channels",
+    )
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    signatures = (
+        load_signature_library(args.config_dir) if args.config_dir else builtin_library()
+    )
+    if args.devices:
+        signatures = signatures.subset(args.devices.split(","))
+    os.makedirs(args.cache_dir, exist_ok=True)
+    options = Options(
+        engine=args.engine,
+        sensitivity=args.sensitivity,
+        weights=args.weights
+        or os.path.join(args.config_dir or os.getcwd(), SEQ2POINT_WEIGHTS_FILE),
+        signatures=signatures,
+        labels=dict(label.split("=", 1) for label in args.label),
+        cache_dir=args.cache_dir,
+        chunk=args.chunk,
+        interval=args.interval,
+        max_gap=args.max_gap,
+        baseline=not args.no_baseline,
+    )
+
+    houses = expand_houses(args.houses)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=max(min(args.processes, len(houses)), 1),
+        initializer=_init_worker,
+        initargs=(options,),
+    ) as pool:
+        results = list(pool.map(evaluate_house, houses, [options] * len(houses)))
+    elapsed = time.perf_counter() - started
+
+    readings = sum(result.get("readings", 0) for result in results)
+    summary = {
+        "engine": args.engine,
+        "houses": len(houses),
+        "readings": readings,
+        "wall_s": round(elapsed, 2),
+        "readings_per_s": round(readings / elapsed) if elapsed else None,
+    }
+    if args.json:
+        print(json.dumps({"summary": summary, "results": results}, indent=2))
+        return
+    print_results(results)
+    print(
+        f"{summary['houses']} houses, {readings} readings in {summary['wall_s']} s "
+        f"({summary['readings_per_s']} readings/s) with {args.engine}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Replay synthetic household load through the NILM pipeline.
+
+Every run starts a fresh interpreter with a minimal Home Assistant core,
+sets up config entries of the integration on a source sensor and replays a
+trace from ``load_generator`` into that sensor. The events go through the real
+state listener, the inference worker and the device sensors. Modes:
+
+* ``1hz`` and ``10hz``: events paced in real time at that rate;
+* ``max``: events pushed as fast as the event loop takes them.
+
+Reported per engine and mode:
+
+* ``events_per_s``: source events whose results reached the sensors of
+  every entry, per wall-clock second;
+* ``latency_p50_ms`` and ``latency_p99_ms``: time from a source state change
+  to its result reaching the device sensors;
+* ``dropped``: samples shed by the inference worker;
+* ``alloc_peak_kib`` and ``alloc_retained_kib``: traced allocations during
+  a separate replay of ``--alloc-events`` events;
+* ``rss_per_entry_mib``: resident memory added by setting up one entry.
+
+Usage::
+
+    python benchmarks/replay.py [--engines classifier,combinatorial] [--modes 1hz,max]
+        [--entries 1] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from typing import Any, Dict, List
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from load_generator import generate_day, sample_trace  # noqa: E402
+
+from custom_components.nilm_energy_disaggregation.const import (  # noqa: E402
+    DEVICE_SIGNATURES,
+    DOMAIN,
+    ENGINES,
+)
+
+# mode: (samples per second, wall-clock seconds), None replays unpaced
+MODES = {"1hz": (1.0, 60.0), "10hz": (10.0, 30.0), "max": (1.0, None)}
+SOURCE_SENSOR = "sensor.benchmark_power"
+TRACE_START = 18 * 3600  # evening peak, when most appliances overlap
+
+
+def rss_mib() -> float:
+    """Return the resident set size of this process."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+async def async_start_hass(config_dir: str) -> Any:
+    """Start a Home Assistant core with only what config entries need."""
+    # pylint: disable=import-outside-toplevel
+    from homeassistant import config_entries, loader
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers import (
+        area_registry,
+        device_registry,
+        entity,
+        entity_registry,
+        issue_registry,
+    )
+    from homeassistant.setup import async_setup_component
+
+    os.symlink(
+        os.path.join(REPO_ROOT, "custom_components"),
+        os.path.join(config_dir, "custom_components"),
+    )
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    for registry in (area_registry, device_registry, entity_registry, issue_registry):
+        await registry.async_load(hass)
+    entity.async_setup(hass)
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    await async_setup_component(hass, "homeassistant", {})
+    hass.states.async_set(SOURCE_SENSOR, "0", {"unit_of_measurement": "W"})
+    return hass
+
+
+async def async_add_entry(hass: Any, engine: str, index: int) -> Any:
+    """Set up one config entry monitoring the benchmark source sensor."""
+    # pylint: disable-next=import-outside-toplevel
+    from homeassistant.config_entries import ConfigEntry
+
+    entry = ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title=f"Benchmark {index}",
+        data={
+            "name": f"Benchmark {index}",
+            "source_sensor": SOURCE_SENSOR,
+            "engine": engine,
+            "devices_config": {device: True for device in DEVICE_SIGNATURES},
+        },
+        options={},
+        source="user",
+    )
+    await hass.config_entries.async_add(entry)
+    await hass.async_block_till_done()
+    return entry
+
+
+def track_latency(worker: Any, latencies: List[float]) -> None:
+    """Record the delay between a sample and its result reaching the sensors."""
+    # pylint: disable-next=import-outside-toplevel
+    from homeassistant.util import dt as dt_util
+
+    on_result = worker._on_result  # pylint: disable=protected-access
+
+    def timed(detected: Dict[str, Any], timestamp: Any) -> None:
+        on_result(detected, timestamp)
+        latencies.append((dt_util.utcnow() - timestamp).total_seconds())
+
+    worker._on_result = timed  # pylint: disable=protected-access
+
+
+async def async_replay(hass: Any, powers: np.ndarray, rate: float | None) -> float:
+    """Push powers into the source sensor and return the wall time taken."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for index, power in enumerate(powers):
+        if rate is None:
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(max(start + index / rate - loop.time(), 0.0))
+        hass.states.async_set(SOURCE_SENSOR, str(power), {"unit_of_measurement": "W"})
+    await hass.async_block_till_done()
+    return loop.time() - start
+
+
+async def async_run(engine: str, mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one engine in one mode and return its measurements."""
+    rate, wall_seconds = MODES[mode]
+    events = args.max_events if wall_seconds is None else int(rate * wall_seconds)
+    day = generate_day(args.seed)
+    _, powers = sample_trace(
+        day, rate=rate, start=TRACE_START, duration=events / rate, seed=args.seed
+    )
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        rss_start = rss_mib()
+        hass = await async_start_hass(config_dir)
+        rss_core = rss_mib()
+        entries = [
+            await async_add_entry(hass, engine, index) for index in range(args.entries)
+        ]
+        rss_entries = rss_mib()
+
+        latencies: List[float] = []
+        workers = [hass.data[DOMAIN][entry.entry_id].worker for entry in entries]
+        for worker in workers:
+            track_latency(worker, latencies)
+
+        elapsed = await async_replay(hass, powers, None if wall_seconds is None else rate)
+        delivered = len(latencies)
+        dropped = sum(worker.dropped_samples for worker in workers)
+
+        # Tracing slows everything down, so allocations get their own pass
+        tracemalloc.start()
+        traced_start = tracemalloc.get_traced_memory()[0]
+        await async_replay(hass, powers[: args.alloc_events], None)
+        traced_end, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        await hass.async_stop()
+
+    latency = np.array(latencies[:delivered]) * 1000
+    return {
+        "engine": engine,
+        "mode": mode,
+        "entries": args.entries,
+        "events": events,
+        "events_per_s": round(delivered / args.entries / elapsed, 1),
+        "latency_p50_ms": round(float(np.percentile(latency, 50)), 3) if delivered else None,
+        "latency_p99_ms": round(float(np.percentile(latency, 99)), 3) if delivered else None,
+        "dropped": dropped,
+        "alloc_peak_kib": round((traced_peak - traced_start) / 1024, 1),
+        "alloc_retained_kib": round((traced_end - traced_start) / 1024, 1),
+        "rss_core_mib": round(rss_core - rss_start, 1),
+        "rss_per_entry_mib": round((rss_entries - rss_core) / args.entries, 1),
+    }
+
+
+def run_child(engine: str, mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one engine and mode in a fresh interpreter and return its results."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--child",
+            "--engines",
+            engine,
+            "--modes",
+            mode,
+            "--entries",
+            str(args.entries),
+            "--max-events",
+            str(args.max_events),
+            "--alloc-events",
+            str(args.alloc_events),
+            "--seed",
+            str(args.seed),
+        ],
+        cwd=REPO_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Run the benchmark for every engine and mode and report the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", default=",".join(ENGINES), help="engines to compare")
+    parser.add_argument("--modes", default=",".join(MODES), help="replay modes")
+    parser.add_argument("--entries", type=int, default=1, help="config entries to set up")
+    parser.add_argument(
+        "--max-events", type=int, default=20000, help="events replayed in max mode"
+    )
+    parser.add_argument(
+        "--alloc-events", type=int, default=500, help="events replayed with tracemalloc"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the trace")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        logging.basicConfig(level=logging.ERROR)
+        print(json.dumps(asyncio.run(async_run(args.engines, args.modes, args))))
+        return
+
+    results = [
+        run_child(engine, mode, args)
+        for engine in args.engines.split(",")
+        for mode in args.modes.split(",")
+    ]
+    if args.json:
+        print(json.dumps({"results": results}))
+        return
+
+    width = max(len(name) for name in ["engine", *args.engines.split(",")]) + 2
+    print(
+        f"{'engine':<{width}}{'mode':<6}{'events/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'dropped':>9}{'alloc KiB':>11}{'RSS/entry MiB':>15}"
+    )
+    for result in results:
+        print(
+            f"{result['engine']:<{width}}{result['mode']:<6}{result['events_per_s']:>10}"
+            f"{result['latency_p50_ms']:>9}{result['latency_p99_ms']:>9}"
+            f"{result['dropped']:>9}{result['alloc_peak_kib']:>11}"
+            f"{result['rss_per_entry_mib']:>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Check and measure the sequence-to-point engine against the forest backends.
+
+A weights file is written for a small random network over the built-in
+devices (three convolutions and two dense layers, like a scaled-down
+seq2point model), or read with ``--weights``. On a synthetic trace from
+``load_generator``, the script checks that:
+
+* ``reference``: the engine matches a plain float64 evaluation of every
+  window, normalized as the file says, so the strided views and the
+  folded normalization change nothing;
+* ``stream``: readings streamed one at a time and in batches give the
+  same powers as the backfill path over the whole trace.
+
+It then reports, next to the classifier (compiled lookup table) and the
+forest (``compiled=False``) backends:
+
+* the latency of a live reading, one ``predict()`` call at a time;
+* the windows per second of a backfill, one ``predict_power_matrix()``
+  call over the trace.
+
+The script exits non-zero on any mismatch.
+
+Usage::
+
+    python benchmarks/seq2point.py [--weights FILE] [--window 99] [--hours 24]
+        [--rate 0.1] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from custom_components.nilm_energy_disaggregation.model import (  # noqa: E402
+    NilmModel,
+)
+from custom_components.nilm_energy_disaggregation.seq2point import (  # noqa: E402
+    Seq2PointEngine,
+)
+from custom_components.nilm_energy_disaggregation.signatures import (  # noqa: E402
+    builtin_library,
+)
+from load_generator import generate_day, sample_trace  # noqa: E402
+
+# (kernel, outputs) of the convolutions, then the hidden dense outputs
+CONVOLUTIONS = ((9, 16), (7, 16), (5, 16))
+HIDDEN = 64
+
+LIVE_READINGS = 2000
+STREAM_BATCHES = (1, 7, 64, 1000)
+TOLERANCE_W = 0.05
+
+
+def write_weights(path: str, devices: List[str], window: int, seed: int = 0) -> None:
+    """Write a random network over ``devices`` to a weights file."""
+    rng = np.random.default_rng(seed)
+    arrays: Dict[str, Any] = {
+        "devices": np.array(devices),
+        "window": np.array(window),
+        "mains_mean": np.array(500.0),
+        "mains_std": np.array(800.0),
+        "power_mean": np.full(len(devices), 50.0),
+        "power_std": np.full(len(devices), 300.0),
+    }
+    shapes: List[Tuple[int, ...]] = []
+    length, channels = window, 1
+    for kernel, outputs in CONVOLUTIONS:
+        shapes.append((kernel, channels, outputs))
+        length, channels = length - kernel + 1, outputs
+    shapes.extend([(length * channels, HIDDEN), (HIDDEN, 2 * len(devices))])
+    for number, shape in enumerate(shapes):
+        fan_in = int(np.prod(shape[:-1]))
+        arrays[f"layer_{number}_weight"] = rng.normal(0.0, np.sqrt(2 / fan_in), shape)
+        arrays[f"layer_{number}_bias"] = rng.normal(0.0, 0.1, shape[-1])
+    np.savez(path, **arrays)
+
+
+def reference_predict(path: str, windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Evaluate a weights file on windows in float64, one kernel tap at a time."""
+    with np.load(path) as data:
+        arrays = {key: np.asarray(data[key], dtype=float) for key in data.files if key != "devices"}
+        devices = len(data["devices"])
+    maps = ((windows - arrays["mains_mean"]) / arrays["mains_std"])[:, :, np.newaxis]
+    number = 0
+    while f"layer_{number}_weight" in arrays:
+        weight = arrays[f"layer_{number}_weight"]
+        if weight.ndim == 3:
+            length = maps.shape[1] - weight.shape[0] + 1
+            maps = sum(maps[:, tap : tap + length] @ weight[tap] for tap in range(weight.shape[0]))
+        else:
+            maps = maps.reshape(len(maps), -1) @ weight
+        maps = maps + arrays[f"layer_{number}_bias"]
+        number += 1
+        if f"layer_{number}_weight" in arrays:
+            maps = np.maximum(maps, 0)
+    power = np.maximum(
+        maps[:, :devices] * arrays["power_std"] + arrays["power_mean"], 0
+    )
+    return power, 1 / (1 + np.exp(-maps[:, devices:]))
+
+
+def check_reference(engine: Seq2PointEngine, path: str, powers: np.ndarray) -> Dict[str, Any]:
+    """Compare the engine with the float64 reference on the first windows."""
+    readings = powers[:4096].astype(np.float32)
+    padded = np.concatenate((np.full(engine.window - 1, readings[0]), readings))
+    windows = np.lib.stride_tricks.sliding_window_view(padded.astype(float), engine.window)
+    power, probability = reference_predict(path, windows)
+    expected = np.where(probability > 0.5, power, 0.0)
+    actual = engine.with_sensitivity(0.5).predict_power_matrix(readings)
+    # Readings near the threshold may flip, count them instead of failing
+    flipped = (expected > 0) != (actual > 0)
+    difference = np.abs(expected - actual)[~flipped]
+    return {
+        "rows": len(readings),
+        "max_abs_diff_w": float(difference.max()),
+        "flipped": int(flipped.sum()),
+        "ok": bool(difference.max() <= TOLERANCE_W and flipped.mean() < 1e-3),
+    }
+
+
+def check_stream(engine: Seq2PointEngine, powers: np.ndarray) -> Dict[str, Any]:
+    """Compare streamed readings with the backfill path."""
+    expected = engine.predict_power_matrix(powers)
+    columns = {device: column for column, device in enumerate(engine.devices)}
+    result: Dict[str, Any] = {"rows": len(powers), "batches": {}}
+    for size in STREAM_BATCHES:
+        stream = engine.new_stream()
+        actual = np.zeros_like(expected)
+        for start in range(0, len(powers), size):
+            predictions = stream.predict_batch(powers[start : start + size].tolist())
+            for row, detected in enumerate(predictions, start):
+                for device, data in detected.items():
+                    actual[row, columns[device]] = data["power"]
+        result["batches"][str(size)] = float(np.abs(expected - actual).max())
+    result["ok"] = max(result["batches"].values()) <= TOLERANCE_W
+    return result
+
+
+def live_latency_us(engine: Any, powers: np.ndarray) -> Dict[str, float]:
+    """Return the median and 99th percentile time of one live reading, in µs."""
+    engine = engine.new_stream() if hasattr(engine, "new_stream") else engine
+    timings = np.empty(min(LIVE_READINGS, len(powers)))
+    for position, power in enumerate(powers[: len(timings)].tolist()):
+        start = time.perf_counter()
+        engine.predict(power)
+        timings[position] = time.perf_counter() - start
+    return {
+        "p50": float(np.percentile(timings, 50) * 1e6),
+        "p99": float(np.percentile(timings, 99) * 1e6),
+    }
+
+
+def backfill_rate(engine: Any, powers: np.ndarray, repeat: int = 3) -> float:
+    """Return the readings (windows) evaluated per second by a backfill."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.predict_power_matrix(powers)
+        best = min(best, time.perf_counter() - start)
+    return len(powers) / best
+
+
+def main() -> None:
+    """Run the checks and measurements and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weights", help="weights file, a random network by default")
+    parser.add_argument("--window", type=int, default=99, help="readings per window")
+    parser.add_argument("--hours", type=float, default=24.0, help="length of the trace")
+    parser.add_argument("--rate", type=float, default=0.1, help="readings per second")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    signatures = builtin_library()
+    _, powers = sample_trace(
+        generate_day(), rate=args.rate, duration=args.hours * 3600
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.weights or os.path.join(directory, "nilm_seq2point.npz")
+        if not args.weights:
+            write_weights(path, list(signatures), args.window)
+        engine = Seq2PointEngine.from_file(path, signatures)
+        checks = {
+            "reference": check_reference(engine, path, powers),
+            "stream": check_stream(engine, powers[:20000]),
+        }
+
+    engines = {
+        "seq2point": engine,
+        "classifier": NilmModel(signatures=signatures),
+        "forest": NilmModel(signatures=signatures, compiled=False),
+    }
+    results = {
+        "readings": len(powers),
+        "window": engine.window,
+        "weights_bytes": engine.nbytes,
+        "checks": checks,
+        "engines": {
+            name: {
+                "live_us": live_latency_us(candidate, powers),
+                "backfill_per_s": backfill_rate(candidate, powers),
+            }
+            for name, candidate in engines.items()
+        },
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(
+            f"{results['readings']} readings, window of {results['window']}, "
+            f"{results['weights_bytes'] / 1024:.0f} KiB of weights"
+        )
+        reference = checks["reference"]
+        print(
+            f"  reference  rows={reference['rows']:<6} "
+            f"max_abs_diff={reference['max_abs_diff_w']:.3g} W "
+            f"flipped={reference['flipped']} ok={reference['ok']}"
+        )
+        stream = checks["stream"]
+        batches = " ".join(f"{size}:{diff:.3g}" for size, diff in stream["batches"].items())
+        print(
+            f"  stream     rows={stream['rows']:<6} "
+            f"max_abs_diff by batch size {batches} W ok={stream['ok']}"
+        )
+        for name, result in results["engines"].items():
+            print(
+                f"  {name:<11}live p50={result['live_us']['p50']:.0f} µs "
+                f"p99={result['live_us']['p99']:.0f} µs  "
+                f"backfill={result['backfill_per_s']:,.0f} windows/s"
+            )
+
+    if not all(check["ok"] for check in checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
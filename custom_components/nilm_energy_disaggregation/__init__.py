@@ -3,62 +3,80 @@ from __future__ import annotations
 
 import logging
 import sys
-from typing import Any
+from typing import Any, Tuple
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_SOURCE_SENSOR
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN, PLATFORMS
+from .const import (
+    CONF_AGGREGATION,
+    CONF_DEBUG_CAPTURE,
+    CONF_DEVICES_CONFIG,
+    CONF_SOURCE_SENSOR,
+    DEFAULT_AGGREGATION,
+    DEFAULT_DEBUG_CAPTURE,
+    DOMAIN,
+    PLATFORMS,
+    SIGNAL_OPTIONS_UPDATED,
+    STORAGE_KEY_BASELINE,
+    STORAGE_KEY_LEDGER,
+    STORAGE_VERSION,
+)
+from .debug_log import async_get_debug_capture
+from .engines import get_engine_type
+from .model_cache import async_get_model_registry
+from .runtime import NilmRuntimeData, get_option
+from .services import async_register_services
 
-# Setup logger with debug level
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
-
-# Add a file handler to write detailed logs
-handler = logging.FileHandler("nilm_debug.log")
-handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-_LOGGER.addHandler(handler)
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the NILM Energy Disaggregation component from configuration.yaml."""
     try:
         _LOGGER.debug("Starting async_setup")
-        _LOGGER.debug(f"Python version: {sys.version}")
-        _LOGGER.debug(f"Config: {config}")
+        _LOGGER.debug("Python version: %s", sys.version)
         
         # Store configuration 
         hass.data.setdefault(DOMAIN, {})
+        async_register_services(hass)
         
         # If a configuration exists in configuration.yaml, handle it
         if DOMAIN in config:
             source_sensor = config[DOMAIN].get(CONF_SOURCE_SENSOR)
-            _LOGGER.info(f"NILM Energy Disaggregation configured with source sensor: {source_sensor}")
-            _LOGGER.debug(f"Full domain config: {config[DOMAIN]}")
+            _LOGGER.info(
+                "NILM Energy Disaggregation configured with source sensor: %s", source_sensor
+            )
+            _LOGGER.debug("Full domain config: %s", config[DOMAIN])
         
         _LOGGER.debug("async_setup completed successfully")
         return True
         
     except Exception as e:
-        _LOGGER.error(f"Error in async_setup: {str(e)}")
+        _LOGGER.error("Error in async_setup: %s", e)
         _LOGGER.exception("Full exception details:")
         return False
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up a config entry for NILM Energy Disaggregation."""
     try:
-        _LOGGER.debug(f"Starting async_setup_entry with entry_id: {entry.entry_id}")
-        _LOGGER.debug(f"Entry data: {entry.data}")
+        _LOGGER.debug("Starting async_setup_entry with entry_id: %s", entry.entry_id)
+        _LOGGER.debug("Entry data: %s", entry.data)
         
         # Store the config entry in hass.data
         hass.data.setdefault(DOMAIN, {})
-        hass.data[DOMAIN][entry.entry_id] = entry.data
+        hass.data[DOMAIN][entry.entry_id] = NilmRuntimeData(
+            config=entry.data, pipeline=_pipeline_options(entry)
+        )
+        await _async_migrate_unique_ids(hass, entry)
+        await _async_apply_debug_capture(hass, entry)
+        entry.async_on_unload(entry.add_update_listener(_async_update_listener))
         
-        _LOGGER.debug(f"Setting up platforms: {PLATFORMS}")
+        _LOGGER.debug("Setting up platforms: %s", PLATFORMS)
         # Setup platforms
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
         
@@ -66,14 +84,14 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         return True
         
     except Exception as e:
-        _LOGGER.error(f"Error in async_setup_entry: {str(e)}")
+        _LOGGER.error("Error in async_setup_entry: %s", e)
         _LOGGER.exception("Full exception details:")
         return False
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     try:
-        _LOGGER.debug(f"Starting async_unload_entry for entry_id: {entry.entry_id}")
+        _LOGGER.debug("Starting async_unload_entry for entry_id: %s", entry.entry_id)
         
         # Unload platforms
         unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
@@ -81,14 +99,83 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         # Remove config entry data
         if unload_ok:
             _LOGGER.debug("Platforms unloaded successfully")
-            hass.data[DOMAIN].pop(entry.entry_id)
-            _LOGGER.debug(f"Removed entry {entry.entry_id} from hass.data")
+            runtime_data: NilmRuntimeData = hass.data[DOMAIN].pop(entry.entry_id)
+            if runtime_data.backfill_task is not None:
+                runtime_data.backfill_task.cancel()
+            if runtime_data.retrainer is not None:
+                runtime_data.retrainer.async_cancel()
+            async_get_model_registry(hass).async_release(entry.entry_id)
+            await async_get_debug_capture(hass).async_disable(entry.entry_id)
+            _LOGGER.debug("Removed entry %s from hass.data", entry.entry_id)
         else:
             _LOGGER.warning("Failed to unload some platforms")
         
         return unload_ok
         
     except Exception as e:
-        _LOGGER.error(f"Error in async_unload_entry: {str(e)}")
+        _LOGGER.error("Error in async_unload_entry: %s", e)
         _LOGGER.exception("Full exception details:")
         return False
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the stored energy ledger and baseline of a removed config entry."""
+    for key in (STORAGE_KEY_LEDGER, STORAGE_KEY_BASELINE):
+        store = Store(hass, STORAGE_VERSION, f"{key}.{entry.entry_id}")
+        await store.async_remove()
+
+
+async def _async_migrate_unique_ids(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Scope the unique ids of sensors created before they included the entry id."""
+    legacy_prefix = f"{DOMAIN}_"
+
+    @callback
+    def _async_migrate(entity_entry: er.RegistryEntry) -> dict[str, Any] | None:
+        if not entity_entry.unique_id.startswith(legacy_prefix):
+            return None
+        device = entity_entry.unique_id[len(legacy_prefix):]
+        return {"new_unique_id": f"{entry.entry_id}_{device}"}
+
+    await er.async_migrate_entries(hass, entry.entry_id, _async_migrate)
+
+
+async def _async_apply_debug_capture(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Start or stop capturing the debug log as the entry options ask."""
+    capture = async_get_debug_capture(hass)
+    if get_option(entry, CONF_DEBUG_CAPTURE, DEFAULT_DEBUG_CAPTURE):
+        capture.async_enable(entry.entry_id)
+    else:
+        await capture.async_disable(entry.entry_id)
+
+
+def _pipeline_options(entry: ConfigEntry) -> Tuple[Any, ...]:
+    """Return the options that change how the pipeline of an entry is built.
+
+    The options flow stores a toggle for every device of the signature
+    library while the setup flow stores the built-in devices only. Devices
+    missing from either count as enabled, so the devices are compared by
+    the set of disabled ones.
+    """
+    devices_config = get_option(entry, CONF_DEVICES_CONFIG) or {}
+    return (
+        get_engine_type(entry),
+        get_option(entry, CONF_AGGREGATION, DEFAULT_AGGREGATION),
+        frozenset(device for device, enabled in devices_config.items() if not enabled),
+    )
+
+
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply updated options, reloading the entry only when its pipeline changes.
+
+    Thresholds, intervals and smoothing are applied to the running pipeline
+    by the sensor platform. The engine, the aggregation and the enabled
+    devices decide which objects and entities exist, so they need a reload.
+    """
+    runtime_data = hass.data[DOMAIN].get(entry.entry_id)
+    if not isinstance(runtime_data, NilmRuntimeData):
+        return
+    if _pipeline_options(entry) != runtime_data.pipeline:
+        _LOGGER.debug("Reloading %s to rebuild its pipeline", entry.title)
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    await _async_apply_debug_capture(hass, entry)
+    async_dispatcher_send(hass, f"{SIGNAL_OPTIONS_UPDATED}_{entry.entry_id}")
@@ -0,0 +1,157 @@
+"""Downsampling of high-rate power meters for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .const import AGGREGATION_BUFFER_SIZE, AGGREGATION_STEP_THRESHOLD
+
+
+@dataclass(frozen=True)
+class PowerWindow:
+    """Summary of the readings of one aggregation window."""
+
+    start: datetime
+    end: datetime
+    mean: float
+    minimum: float
+    maximum: float
+    last: float
+    step: float
+    samples: int
+    closed_by_step: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the window for diagnostics."""
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "mean": round(self.mean, 3),
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "last": self.last,
+            "step": self.step,
+            "samples": self.samples,
+            "closed_by_step": self.closed_by_step,
+        }
+
+
+class PowerAggregator:
+    """Buffer readings and summarize them once per scan interval.
+
+    Readings are appended to a preallocated buffer in O(1). Closing a
+    window makes one pass over its readings and returns their time-weighted
+    mean, where every reading holds until the next one and the last reading
+    of the previous window holds from the start of this one, along with
+    the minimum, maximum, last reading and largest step. A step larger than
+    ``step_threshold`` closes the window at once, so the new level can be
+    evaluated without waiting for the interval. A full buffer closes the
+    window as well.
+    """
+
+    __slots__ = (
+        "_step_threshold",
+        "_capacity",
+        "_powers",
+        "_times",
+        "_count",
+        "_start",
+        "_held",
+        "last_window",
+        "windows",
+        "fast_paths",
+    )
+
+    def __init__(
+        self,
+        step_threshold: float = AGGREGATION_STEP_THRESHOLD,
+        capacity: int = AGGREGATION_BUFFER_SIZE,
+    ) -> None:
+        """Initialize the aggregator."""
+        self._step_threshold = step_threshold
+        self._capacity = capacity
+        self._powers: List[float] = [0.0] * capacity
+        self._times: List[Optional[datetime]] = [None] * capacity
+        self._count = 0
+        # Start of the open window and the reading held into it
+        self._start: Optional[datetime] = None
+        self._held: Optional[float] = None
+        self.last_window: Optional[PowerWindow] = None
+        self.windows = 0
+        self.fast_paths = 0
+
+    @property
+    def pending(self) -> int:
+        """Return the number of readings in the open window."""
+        return self._count
+
+    def add(self, power: float, timestamp: datetime) -> Optional[PowerWindow]:
+        """Buffer a reading, returning the window it closes early, if any."""
+        window = None
+        previous = self._powers[self._count - 1] if self._count else self._held
+        if previous is not None and abs(power - previous) > self._step_threshold:
+            window = self._close(timestamp, closed_by_step=True)
+            if window is not None:
+                self.fast_paths += 1
+        if self._count == self._capacity:
+            window = self._close(timestamp) or window
+            if self._count == self._capacity:
+                # Readings with the same timestamp, only the latest one counts
+                self._count -= 1
+
+        if self._start is None:
+            self._start = timestamp
+        self._powers[self._count] = power
+        self._times[self._count] = timestamp
+        self._count += 1
+        return window
+
+    def close(self, timestamp: datetime) -> Optional[PowerWindow]:
+        """Close the open window at the end of a scan interval."""
+        return self._close(timestamp)
+
+    def _close(self, end: datetime, closed_by_step: bool = False) -> Optional[PowerWindow]:
+        """Summarize the open window and start the next one at ``end``."""
+        start = self._start
+        if start is None or end <= start:
+            return None
+
+        # The very first window starts with its first reading, and so does
+        # a window opened by a step
+        value = self._powers[0] if self._held is None else self._held
+        if self._count and self._times[0] == start:
+            value = self._powers[0]
+        minimum = maximum = value
+        held_since = start
+        energy = 0.0
+        step = 0.0
+        for power, time in zip(self._powers[: self._count], self._times[: self._count]):
+            energy += value * (time - held_since).total_seconds()
+            if abs(power - value) > abs(step):
+                step = power - value
+            if power < minimum:
+                minimum = power
+            elif power > maximum:
+                maximum = power
+            value = power
+            held_since = time
+        energy += value * (end - held_since).total_seconds()
+
+        window = PowerWindow(
+            start=start,
+            end=end,
+            mean=energy / (end - start).total_seconds(),
+            minimum=minimum,
+            maximum=maximum,
+            last=value,
+            step=step,
+            samples=self._count,
+            closed_by_step=closed_by_step,
+        )
+        self._count = 0
+        self._start = end
+        self._held = value
+        self.last_window = window
+        self.windows += 1
+        return window
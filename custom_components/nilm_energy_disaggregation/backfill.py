@@ -0,0 +1,167 @@
+"""Historical backfill of NILM Energy Disaggregation statistics."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, List, Tuple
+
+import numpy as np
+
+from homeassistant.components.recorder import get_instance, history
+from homeassistant.components.recorder.models import StatisticData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, State
+from homeassistant.util import dt as dt_util
+
+from .baseline import BaselineEstimator
+from .const import BACKFILL_CHUNK_HOURS, CONF_SOURCE_SENSOR, EVENT_BACKFILL_PROGRESS
+from .engines import async_create_engine
+from .long_term_statistics import energy_metadata, sums_before
+
+_LOGGER = logging.getLogger(__name__)
+
+SECONDS_PER_HOUR = 3600
+
+
+def fetch_states(
+    hass: HomeAssistant, entity_id: str, start: datetime, end: datetime
+) -> List[State]:
+    """Return the states of the source sensor in a time window."""
+    return history.state_changes_during_period(
+        hass, start, end, entity_id, no_attributes=True, include_start_time_state=True
+    ).get(entity_id, [])
+
+
+def parse_states(states: List[State], start: datetime) -> Tuple[np.ndarray, np.ndarray]:
+    """Return sample offsets from ``start`` in seconds and powers, NaN if unknown."""
+    offsets = np.empty(len(states))
+    powers = np.empty(len(states))
+    for position, state in enumerate(states):
+        # The state at the start of the window may have changed before it
+        offsets[position] = max((state.last_changed - start).total_seconds(), 0.0)
+        try:
+            powers[position] = float(state.state)
+        except ValueError:
+            powers[position] = np.nan
+    return offsets, powers
+
+
+def integrate_hourly_energy(
+    engine: Any, offsets: np.ndarray, powers: np.ndarray, hours: int
+) -> np.ndarray:
+    """Disaggregate a window of samples and return kWh per hour and device.
+
+    Each sample holds until the next one. The model runs once over the whole
+    window, then the held powers are integrated into hourly buckets, with
+    samples that span an hour boundary split at the boundary.
+    """
+    device_powers = np.zeros((len(powers), len(engine.devices)))
+    known = ~np.isnan(powers)
+    if known.any():
+        device_powers[known] = engine.predict_power_matrix(
+            powers[known], offsets[known]
+        )
+
+    # Cut the timeline at every sample and every hour boundary
+    cuts = np.union1d(offsets, np.arange(hours) * SECONDS_PER_HOUR)
+    sample = np.searchsorted(offsets, cuts, side="right") - 1
+    durations = np.diff(np.append(cuts, hours * SECONDS_PER_HOUR))
+    covered = sample >= 0
+
+    energy = np.zeros((hours, len(engine.devices)))
+    np.add.at(
+        energy,
+        (cuts[covered] // SECONDS_PER_HOUR).astype(np.intp),
+        device_powers[sample[covered]] * durations[covered, np.newaxis],
+    )
+    return energy / (1000 * SECONDS_PER_HOUR)
+
+
+async def async_backfill(
+    hass: HomeAssistant, config_entry: ConfigEntry, days: int, sensitivity: float
+) -> None:
+    """Disaggregate the recorded history of the source sensor into statistics.
+
+    History is read in fixed windows of ``BACKFILL_CHUNK_HOURS``, so memory
+    does not grow with the length of the history. Reading happens in the
+    recorder executor and disaggregation in the executor. Stateful engines are
+    created afresh so the live engine state is left untouched.
+
+    The always-on baseline is removed from the readings as the sensors do,
+    by an estimator replayed over the history.
+
+    Sums continue from the last statistic before the backfilled period, and
+    statistics after it are shifted by the change of the sum at its end, so
+    the sums stay continuous around the rewritten hours.
+    """
+    source_sensor = config_entry.data[CONF_SOURCE_SENSOR]
+    engine = await async_create_engine(hass, config_entry, sensitivity=sensitivity)
+    devices = engine.devices
+    metadata = [energy_metadata(config_entry.entry_id, device) for device in devices]
+
+    end = dt_util.utcnow().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    statistic_ids = [device_metadata["statistic_id"] for device_metadata in metadata]
+    recorder = get_instance(hass)
+    previous = await recorder.async_add_executor_job(sums_before, hass, statistic_ids, start)
+    previous_end = await recorder.async_add_executor_job(sums_before, hass, statistic_ids, end)
+    sums = np.array([previous.get(statistic_id, 0.0) for statistic_id in statistic_ids])
+    chunk = timedelta(hours=BACKFILL_CHUNK_HOURS)
+    baseline = BaselineEstimator()
+
+    _LOGGER.info("Backfilling %s from %s to %s", source_sensor, start, end)
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + chunk, end)
+        hours = int((chunk_end - chunk_start).total_seconds() // SECONDS_PER_HOUR)
+
+        states = await recorder.async_add_executor_job(
+            fetch_states, hass, source_sensor, chunk_start, chunk_end
+        )
+        offsets, powers = await hass.async_add_executor_job(
+            parse_states, states, chunk_start
+        )
+        del states
+        powers = await hass.async_add_executor_job(
+            baseline.subtract_series, powers, offsets + chunk_start.timestamp()
+        )
+        energy = await hass.async_add_executor_job(
+            integrate_hourly_energy, engine, offsets, powers, hours
+        )
+
+        for column, device_metadata in enumerate(metadata):
+            statistics = []
+            for hour in range(hours):
+                sums[column] += energy[hour, column]
+                statistics.append(
+                    StatisticData(
+                        start=chunk_start + timedelta(hours=hour),
+                        state=float(energy[hour, column]),
+                        sum=float(sums[column]),
+                    )
+                )
+            async_add_external_statistics(hass, device_metadata, statistics)
+
+        progress = (chunk_end - start) / (end - start)
+        hass.bus.async_fire(
+            EVENT_BACKFILL_PROGRESS,
+            {
+                "entry_id": config_entry.entry_id,
+                "progress": round(progress * 100, 1),
+                "processed_until": chunk_end.isoformat(),
+            },
+        )
+        _LOGGER.debug("Backfill of %s at %.1f%%", source_sensor, progress * 100)
+        chunk_start = chunk_end
+
+    for column, device_metadata in enumerate(metadata):
+        adjustment = float(sums[column]) - previous_end.get(device_metadata["statistic_id"], 0.0)
+        if adjustment:
+            recorder.async_adjust_statistics(
+                device_metadata["statistic_id"],
+                end,
+                adjustment,
+                device_metadata["unit_of_measurement"],
+            )
+    _LOGGER.info("Backfill of %s finished", source_sensor)
@@ -0,0 +1,297 @@
+"""Always-on baseline load of NILM Energy Disaggregation sources."""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    BASELINE_DAY,
+    BASELINE_QUANTILE,
+    BASELINE_SAVE_DELAY,
+    BASELINE_WEEK,
+    STORAGE_KEY_BASELINE,
+    STORAGE_VERSION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+MARKERS = 5
+
+
+class P2Quantile:
+    """Streaming estimate of one quantile with the P² algorithm.
+
+    Five markers hold the minimum, the quantile, the maximum and two points
+    in between. Every sample moves the marker positions, and markers whose
+    position drifted from the ideal one are adjusted with a piecewise
+    parabolic interpolation (Jain & Chlamtac, 1985). Memory and cost per
+    sample are constant.
+    """
+
+    __slots__ = ("quantile", "count", "_heights", "_positions", "_desired", "_increments")
+
+    def __init__(self, quantile: float) -> None:
+        """Initialize an empty sketch."""
+        self.quantile = quantile
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [float(marker) for marker in range(MARKERS)]
+        self._desired = [0.0, 2 * quantile, 4 * quantile, 2 + 2 * quantile, 4.0]
+        self._increments = [0.0, quantile / 2, quantile, (1 + quantile) / 2, 1.0]
+
+    @property
+    def value(self) -> Optional[float]:
+        """Return the estimate, None before the first sample."""
+        if self.count >= MARKERS:
+            return self._heights[2]
+        if not self._heights:
+            return None
+        # Too few samples for the markers, they are still kept sorted
+        return self._heights[round(self.quantile * (len(self._heights) - 1))]
+
+    def add(self, value: float) -> None:
+        """Add a sample."""
+        self.count += 1
+        heights = self._heights
+        if self.count <= MARKERS:
+            heights.append(value)
+            heights.sort()
+            return
+
+        positions = self._positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+        for marker in range(cell + 1, MARKERS):
+            positions[marker] += 1
+        for marker in range(MARKERS):
+            self._desired[marker] += self._increments[marker]
+
+        for marker in range(1, MARKERS - 1):
+            drift = self._desired[marker] - positions[marker]
+            if (drift >= 1 and positions[marker + 1] - positions[marker] > 1) or (
+                drift <= -1 and positions[marker - 1] - positions[marker] < -1
+            ):
+                self._adjust(marker, 1 if drift > 0 else -1)
+
+    def _adjust(self, marker: int, step: int) -> None:
+        """Move a marker one position, adjusting its height."""
+        heights = self._heights
+        positions = self._positions
+        below, here, above = positions[marker - 1], positions[marker], positions[marker + 1]
+        height = heights[marker] + step / (above - below) * (
+            (here - below + step) * (heights[marker + 1] - heights[marker]) / (above - here)
+            + (above - here - step) * (heights[marker] - heights[marker - 1]) / (here - below)
+        )
+        if not heights[marker - 1] < height < heights[marker + 1]:
+            # The parabola overshoots a neighbour, fall back to linear
+            neighbour = marker + step
+            height = heights[marker] + step * (heights[neighbour] - heights[marker]) / (
+                positions[neighbour] - here
+            )
+        heights[marker] = height
+        positions[marker] = here + step
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the sketch as stored."""
+        return {
+            "count": self.count,
+            "heights": list(self._heights),
+            "positions": list(self._positions),
+            "desired": list(self._desired),
+        }
+
+    @classmethod
+    def from_dict(cls, quantile: float, data: Dict[str, Any]) -> P2Quantile:
+        """Restore a sketch."""
+        sketch = cls(quantile)
+        sketch.count = data["count"]
+        sketch._heights = [float(height) for height in data["heights"]]
+        sketch._positions = [float(position) for position in data["positions"]]
+        sketch._desired = [float(desired) for desired in data["desired"]]
+        return sketch
+
+
+class RollingQuantile:
+    """A quantile over roughly the last ``horizon`` seconds.
+
+    Two sketches receive every sample and are restarted once per horizon,
+    half a horizon apart. The estimate comes from the older one, so it
+    covers between half and one full horizon of samples and no history is
+    kept. Until the older sketch covers half a horizon and ``MARKERS``
+    samples, after the first sample or after a gap longer than the horizon,
+    there is no estimate.
+    """
+
+    __slots__ = ("quantile", "_half", "_epoch", "_period", "_sketches")
+
+    def __init__(self, quantile: float, horizon: float) -> None:
+        """Initialize the quantile."""
+        self.quantile = quantile
+        self._half = horizon / 2
+        self._epoch: Optional[float] = None
+        self._period = 0
+        self._sketches = [P2Quantile(quantile), P2Quantile(quantile)]
+
+    @property
+    def value(self) -> Optional[float]:
+        """Return the estimate, None while warming up."""
+        sketch = self._sketches[(self._period + 1) % 2]
+        if self._period < 1 or sketch.count < MARKERS:
+            return None
+        return sketch.value
+
+    def add(self, value: float, timestamp: float) -> None:
+        """Add a sample taken at a UNIX timestamp."""
+        if self._epoch is None:
+            self._epoch = timestamp
+        period = int((timestamp - self._epoch) // self._half)
+        if period > self._period:
+            if period - self._period > 1:
+                # No samples for longer than the horizon, start over
+                self._epoch = timestamp
+                period = 0
+                self._sketches = [P2Quantile(self.quantile), P2Quantile(self.quantile)]
+            else:
+                self._sketches[period % 2] = P2Quantile(self.quantile)
+            self._period = period
+        for sketch in self._sketches:
+            sketch.add(value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the quantile as stored."""
+        return {
+            "epoch": self._epoch,
+            "period": self._period,
+            "sketches": [sketch.as_dict() for sketch in self._sketches],
+        }
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        """Restore a stored quantile."""
+        self._epoch = data["epoch"]
+        self._period = data["period"]
+        self._sketches = [
+            P2Quantile.from_dict(self.quantile, sketch) for sketch in data["sketches"]
+        ]
+
+
+class BaselineEstimator:
+    """Always-on load of one power series.
+
+    The baseline is a low quantile of the readings over the last day and
+    over the last week, whichever is lower: an unusual day does not raise
+    it, and an always-on device that was removed stops counting after a
+    day. A quantile that is still warming up is left out, and the baseline
+    is 0 while both are, so a device running when the estimator starts is
+    not taken for always-on load.
+    """
+
+    __slots__ = ("day", "week", "value")
+
+    def __init__(self, quantile: float = BASELINE_QUANTILE) -> None:
+        """Initialize the estimator."""
+        self.day = RollingQuantile(quantile, BASELINE_DAY)
+        self.week = RollingQuantile(quantile, BASELINE_WEEK)
+        self.value = 0.0
+
+    def update(self, power: float, timestamp: float) -> float:
+        """Add a reading and return the baseline."""
+        self.day.add(power, timestamp)
+        self.week.add(power, timestamp)
+        estimates = [
+            estimate for estimate in (self.day.value, self.week.value) if estimate is not None
+        ]
+        self.value = max(min(estimates), 0.0) if estimates else 0.0
+        return self.value
+
+    def subtract_series(self, powers: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """Add readings in order and return each minus the baseline, NaN if unknown."""
+        result = np.full(len(powers), np.nan)
+        update = self.update
+        for position in np.flatnonzero(~np.isnan(powers)):
+            power = float(powers[position])
+            result[position] = max(power - update(power, float(timestamps[position])), 0.0)
+        return result
+
+
+class NilmBaseline:
+    """Baselines of every channel of an entry.
+
+    Readings are passed through ``subtract()`` before disaggregation, which
+    updates the baseline and removes it from the reading. The sketches are
+    persisted to ``.storage`` at most once per ``BASELINE_SAVE_DELAY``, so
+    the week horizon survives restarts.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, channels: int = 1) -> None:
+        """Initialize the baselines."""
+        self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_BASELINE}.{entry_id}")
+        self.estimators = [BaselineEstimator() for _ in range(channels)]
+        self._save_scheduled = False
+
+    @property
+    def value(self) -> float:
+        """Return the baseline of the entry, over every channel."""
+        return sum(estimator.value for estimator in self.estimators)
+
+    def subtract(self, power: float, timestamp: float) -> float:
+        """Return a reading of the first channel minus its baseline."""
+        self._async_schedule_save()
+        return max(power - self.estimators[0].update(power, timestamp), 0.0)
+
+    def subtract_channels(self, readings: np.ndarray, timestamp: float) -> np.ndarray:
+        """Return the readings of every channel minus their baselines."""
+        self._async_schedule_save()
+        baselines = np.array(
+            [
+                estimator.update(float(power), timestamp)
+                for estimator, power in zip(self.estimators, readings)
+            ]
+        )
+        return np.maximum(readings - baselines, 0.0)
+
+    async def async_load(self) -> None:
+        """Restore the sketches from storage."""
+        data = await self._store.async_load()
+        if not data or len(data["channels"]) != len(self.estimators):
+            return
+        for estimator, stored in zip(self.estimators, data["channels"]):
+            estimator.day.restore(stored["day"])
+            estimator.week.restore(stored["week"])
+            estimator.value = stored["value"]
+        _LOGGER.debug("Restored baseline of %.1f W", self.value)
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Schedule one save for every change until it is written."""
+        if self._save_scheduled:
+            return
+        self._save_scheduled = True
+        self._store.async_delay_save(self._data_to_save, BASELINE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        """Return the baselines as stored."""
+        self._save_scheduled = False
+        return {
+            "channels": [
+                {
+                    "day": estimator.day.as_dict(),
+                    "week": estimator.week.as_dict(),
+                    "value": estimator.value,
+                }
+                for estimator in self.estimators
+            ]
+        }
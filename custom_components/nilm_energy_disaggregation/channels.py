@@ -0,0 +1,252 @@
+"""Multi-channel (multi-phase or sub-metered) disaggregation engine."""
+from __future__ import annotations
+
+import copy
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .const import CROSS_PHASE_BALANCE, CROSS_PHASE_WINDOW, DEFAULT_EDGE_THRESHOLD
+from .edge_detection import EDGE_TOLERANCE, state_confidence
+
+if TYPE_CHECKING:
+    from .signatures import SignatureLibrary
+
+
+def channel_device(channel: int, device: str) -> str:
+    """Return the key of a device detected on one channel."""
+    return f"{device}_ch{channel + 1}"
+
+
+class ChannelReadings:
+    """The latest reading of every source sensor of an entry, as one vector."""
+
+    __slots__ = ("entity_ids", "values", "_index")
+
+    def __init__(self, entity_ids: Sequence[str]) -> None:
+        """Initialize the readings, 0 W until a sensor reports."""
+        self.entity_ids = list(entity_ids)
+        self.values = np.zeros(len(self.entity_ids))
+        self._index = {entity_id: index for index, entity_id in enumerate(self.entity_ids)}
+
+    def update(self, entity_id: str, power: float) -> None:
+        """Store the reading of a source sensor."""
+        self.values[self._index[entity_id]] = power
+
+
+class CrossPhaseDetector:
+    """Detect appliances spanning several phases from correlated steps.
+
+    Every phase remembers its last step between two ticks, and when it
+    happened. The phases of a meter may report at slightly different times,
+    so steps less than ``window`` seconds apart are considered together.
+    Steps of the same sign and a similar size on as many phases as a
+    multi-phase signature has are matched by their total against its states.
+
+    A running appliance holds the step it was detected with on each phase.
+    Its load is subtracted from the readings, so the per-phase engines only
+    see the remaining single-phase appliances.
+    """
+
+    __slots__ = (
+        "_signatures",
+        "_index",
+        "_threshold",
+        "_window",
+        "_previous",
+        "_steps",
+        "_stepped_at",
+        "_running",
+        "_load",
+    )
+
+    def __init__(
+        self,
+        signatures: SignatureLibrary,
+        channels: int,
+        threshold: float = DEFAULT_EDGE_THRESHOLD,
+        window: float = CROSS_PHASE_WINDOW,
+    ) -> None:
+        """Initialize the detector."""
+        self._signatures = signatures
+        self._index = signatures.index(EDGE_TOLERANCE)
+        self._threshold = threshold
+        self._window = window
+        self._previous: Optional[np.ndarray] = None
+        self._steps = np.zeros(channels)
+        self._stepped_at = np.full(channels, -np.inf)
+        # Running appliances: device -> (load per phase, confidence)
+        self._running: Dict[str, Tuple[np.ndarray, float]] = {}
+        self._load = np.zeros(channels)
+
+    @property
+    def devices(self) -> List[str]:
+        """Return the devices the detector can detect."""
+        return list(self._signatures)
+
+    @property
+    def detections(self) -> Dict[str, Dict[str, float]]:
+        """Return the running appliances."""
+        return {
+            device: {"power": float(load.sum()), "confidence": confidence}
+            for device, (load, confidence) in self._running.items()
+        }
+
+    def update(self, readings: np.ndarray, timestamp: float) -> np.ndarray:
+        """Process the readings of a tick, returning them minus the running appliances."""
+        if self._previous is not None:
+            jumps = readings - self._previous
+            stepped = np.abs(jumps) > self._threshold
+            if stepped.any():
+                self._steps[stepped] = jumps[stepped]
+                self._stepped_at[stepped] = timestamp
+                recent = timestamp - self._stepped_at <= self._window
+                if recent.sum() >= 2 and self._on_steps(self._steps, recent):
+                    # Steps explain a single appliance
+                    self._stepped_at[recent] = -np.inf
+        self._previous = readings.copy()
+        return np.maximum(readings - self._load, 0.0)
+
+    def _on_steps(self, steps: np.ndarray, stepped: np.ndarray) -> bool:
+        """Match correlated steps, returning True if they were explained."""
+        phases = int(stepped.sum())
+        values = steps[stepped]
+        if not ((values > 0).all() or (values < 0).all()):
+            return False
+        magnitudes = np.abs(values)
+        if magnitudes.min() < (1 - CROSS_PHASE_BALANCE) * magnitudes.max():
+            return False
+
+        total = float(values.sum())
+        if total > 0:
+            best = None
+            for state in self._index.candidates(total):
+                if state.device in self._running:
+                    continue
+                if self._signatures[state.device].phases != phases:
+                    continue
+                confidence = state_confidence(state, total)
+                if best is None or confidence > best[1]:
+                    best = (state.device, confidence)
+            if best is None:
+                return False
+            load = np.where(stepped, steps, 0.0)
+            self._running[best[0]] = (load, best[1])
+            self._load += load
+            return True
+
+        # A falling edge switches off the running appliance on the same
+        # phases whose load it best cancels
+        best_device = None
+        best_error = EDGE_TOLERANCE * 2
+        for device, (load, _) in self._running.items():
+            if not np.array_equal(load > 0, stepped):
+                continue
+            error = abs(total + load.sum()) / load.sum()
+            if error <= best_error:
+                best_device, best_error = device, error
+        if best_device is None:
+            return False
+        load, _ = self._running.pop(best_device)
+        self._load -= load
+        return True
+
+
+class MultiChannelEngine:
+    """Disaggregate the readings of several channels in one call per tick.
+
+    Every sample is the vector of the latest readings of all channels.
+    Multi-phase appliances are detected first, from correlated steps, and
+    their load is removed from the readings. Stateless engines then
+    evaluate every channel of every sample in a single batched call.
+    Stateful engines, which have a ``new_stream()`` method, get one stream
+    per channel. Devices found on a channel are reported under
+    ``channel_device()`` keys, multi-phase appliances under their name.
+    """
+
+    def __init__(
+        self,
+        engine: Any,
+        channels: int,
+        multi_phase: Optional[SignatureLibrary] = None,
+    ) -> None:
+        """Initialize the engine."""
+        self.engine = engine
+        self.channels = channels
+        self._streams: Optional[List[Any]] = None
+        if hasattr(engine, "new_stream"):
+            self._streams = [engine] + [engine.new_stream() for _ in range(channels - 1)]
+        self._cross_phase = (
+            CrossPhaseDetector(multi_phase, channels) if multi_phase else None
+        )
+        self._channel_devices: Dict[str, Tuple[str, Optional[int]]] = {
+            channel_device(channel, device): (device, channel)
+            for channel in range(channels)
+            for device in engine.devices
+        }
+        if self._cross_phase is not None:
+            for device in self._cross_phase.devices:
+                self._channel_devices[device] = (device, None)
+
+    @property
+    def devices(self) -> List[str]:
+        """Return the keys of the devices the engine can detect."""
+        return list(self._channel_devices)
+
+    @property
+    def channel_devices(self) -> Dict[str, Tuple[str, Optional[int]]]:
+        """Return the device and channel behind every key.
+
+        The channel of a multi-phase appliance is None.
+        """
+        return dict(self._channel_devices)
+
+    def with_sensitivity(self, sensitivity: float) -> MultiChannelEngine:
+        """Return the engine at another sensitivity, keeping the stream state."""
+        engine = copy.copy(self)
+        engine.engine = self.engine.with_sensitivity(sensitivity)
+        if self._streams is not None:
+            engine._streams = [engine.engine] + [
+                stream.with_sensitivity(sensitivity) for stream in self._streams[1:]
+            ]
+        return engine
+
+    def predict_batch(
+        self,
+        readings: List[np.ndarray],
+        timestamps: Optional[List[float]] = None,
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Predict devices for a batch of reading vectors."""
+        if timestamps is None:
+            timestamps = [time.time()] * len(readings)
+        powers = np.vstack(readings).astype(float, copy=True)
+
+        results: List[Dict[str, Dict[str, float]]] = [{} for _ in readings]
+        if self._cross_phase is not None:
+            for row, timestamp in enumerate(timestamps):
+                powers[row] = self._cross_phase.update(powers[row], timestamp)
+                results[row].update(self._cross_phase.detections)
+
+        if self._streams is None:
+            # Rows are samples and columns channels, so the flat index is
+            # row * channels + channel
+            flat = self.engine.predict_batch(
+                powers.ravel().tolist(), np.repeat(timestamps, self.channels).tolist()
+            )
+            channel_results = [flat[channel :: self.channels] for channel in range(self.channels)]
+        else:
+            channel_results = [
+                stream.predict_batch(powers[:, channel].tolist(), timestamps)
+                for channel, stream in enumerate(self._streams)
+            ]
+
+        for channel, predictions in enumerate(channel_results):
+            for result, detected in zip(results, predictions):
+                for device, data in detected.items():
+                    result[channel_device(channel, device)] = data
+        return results
+
+    def predict(self, readings: np.ndarray) -> Dict[str, Dict[str, float]]:
+        """Predict devices from the current readings of every channel."""
+        return self.predict_batch([readings])[0]
@@ -0,0 +1,175 @@
+"""Combinatorial-optimization disaggregation engine."""
+from __future__ import annotations
+
+import copy
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .signatures import SignatureLibrary
+
+# Above this many devices the full 2^n table is replaced by two 2^(n/2) halves
+MAX_FULL_TABLE_DEVICES = 16
+
+# Two sum tables of 2^16 combinations keep a reading at a few milliseconds,
+# larger libraries are left to another engine
+MAX_DEVICES = 32
+
+# Low-half combinations times readings completed at once by _solve()
+SOLVE_CHUNK_PAIRS = 1 << 16
+
+
+def _sorted_sum_table(powers: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the expected power, mask and device count of every combination, sorted.
+
+    Combinations with equal power are ordered by their number of running
+    devices, so the simplest explanation of a reading wins.
+    """
+    sums = np.zeros(1)
+    masks = np.zeros(1, dtype=np.int64)
+    counts = np.zeros(1, dtype=np.uint8)
+    # Every device doubles the table, with and without it
+    for bit, power in enumerate(powers):
+        sums = np.concatenate((sums, sums + power))
+        masks = np.concatenate((masks, masks | (1 << bit)))
+        counts = np.concatenate((counts, counts + 1))
+    order = np.lexsort((counts, sums))
+    return sums[order], masks[order], counts[order]
+
+
+def _nearest(sorted_sums: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Return the index of the sum nearest to every target.
+
+    Among equal sums the first one, with the fewest devices, is returned.
+    """
+    upper = np.clip(np.searchsorted(sorted_sums, targets), 1, len(sorted_sums) - 1)
+    # The sum below a target starts its run of equal sums
+    lower = np.searchsorted(sorted_sums, sorted_sums[upper - 1])
+    use_upper = np.abs(sorted_sums[upper] - targets) < np.abs(targets - sorted_sums[lower])
+    return np.where(use_upper, upper, lower)
+
+
+def _confidences(readings: np.ndarray, sums: np.ndarray) -> np.ndarray:
+    """Return how well every combination explains its reading, from 0 to 1."""
+    return np.clip(1 - np.abs(readings - sums) / np.maximum(readings, sums).clip(min=1.0), 0, 1)
+
+
+class CombinatorialEngine:
+    """Explain each reading with the nearest sum of device powers.
+
+    Every on/off combination of the devices is precomputed once with its
+    combined expected power, kept in a sorted array and searched with a
+    bisection per reading. For large signature libraries the devices are
+    split in two halves whose sum tables are joined for a batch of readings
+    at once (meet-in-the-middle), which bounds the tables to 2 * 2^(n/2)
+    entries. At most ``MAX_DEVICES`` devices are supported.
+
+    The expected power of a device is the nominal power of its signature.
+    The aggregate power is shared between the running devices in proportion
+    to their expected power.
+    """
+
+    def __init__(self, signatures: SignatureLibrary, sensitivity: float = 0.5) -> None:
+        """Initialize the engine and precompute the sum tables."""
+        if len(signatures) > MAX_DEVICES:
+            raise ValueError(f"At most {MAX_DEVICES} devices are supported")
+        self._sensitivity = sensitivity
+        self._devices = list(signatures)
+        self._powers = np.array(
+            [signature.nominal_power for signature in signatures.values()],
+            dtype=float,
+        )
+
+        self._split = 0
+        if len(self._devices) <= MAX_FULL_TABLE_DEVICES:
+            self._sums, self._masks, _ = _sorted_sum_table(self._powers)
+        else:
+            self._split = len(self._devices) // 2
+            self._sums, self._masks, self._counts = _sorted_sum_table(
+                self._powers[:self._split]
+            )
+            self._high_sums, self._high_masks, self._high_counts = _sorted_sum_table(
+                self._powers[self._split:]
+            )
+
+    @property
+    def devices(self) -> List[str]:
+        """Return the devices the engine can detect."""
+        return list(self._devices)
+
+    def with_sensitivity(self, sensitivity: float) -> CombinatorialEngine:
+        """Return the engine at another sensitivity, sharing the sum tables."""
+        engine = copy.copy(self)
+        engine._sensitivity = sensitivity
+        return engine
+
+    def _solve(self, powers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the best combination mask and its power for every reading."""
+        if not self._split:
+            index = _nearest(self._sums, powers)
+            return self._masks[index], self._sums[index]
+
+        masks = np.empty(len(powers), dtype=np.int64)
+        sums = np.empty(len(powers), dtype=float)
+        rows = max(1, SOLVE_CHUNK_PAIRS // len(self._sums))
+        for start in range(0, len(powers), rows):
+            targets = powers[start : start + rows, np.newaxis]
+            # Complete every low-half combination with its best high half
+            high = _nearest(self._high_sums, targets - self._sums)
+            totals = self._sums + self._high_sums[high]
+            errors = np.abs(totals - targets)
+            # Equally near totals are ranked like in the full table: the sum
+            # below the reading first, then the fewest running devices, then
+            # the lowest mask
+            rank = np.where(
+                errors == errors.min(axis=1, keepdims=True),
+                (totals > targets) * (MAX_DEVICES + 1) + self._counts + self._high_counts[high],
+                2 * (MAX_DEVICES + 1),
+            )
+            combined = self._masks | (self._high_masks[high] << self._split)
+            best = np.where(
+                rank == rank.min(axis=1, keepdims=True), combined, np.iinfo(np.int64).max
+            ).argmin(axis=1)
+            row = np.arange(len(targets))
+            masks[start : start + rows] = combined[row, best]
+            sums[start : start + rows] = totals[row, best]
+        return masks, sums
+
+    def predict_batch(
+        self, powers: List[float], timestamps: Optional[List[float]] = None
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Disaggregate a batch of readings with one vectorized search."""
+        readings = np.asarray(powers, dtype=float)
+        masks, sums = self._solve(readings)
+        confidences = _confidences(readings, sums)
+
+        results = []
+        for reading, mask, total, confidence in zip(readings, masks, sums, confidences):
+            if not mask or confidence <= self._sensitivity:
+                results.append({})
+                continue
+            share = reading / total
+            results.append({
+                device: {"power": float(self._powers[bit] * share), "confidence": float(confidence)}
+                for bit, device in enumerate(self._devices)
+                if mask >> bit & 1
+            })
+        return results
+
+    def predict_power_matrix(
+        self, powers: np.ndarray, timestamps: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return the power share of every device (columns) for every reading (rows)."""
+        readings = np.asarray(powers, dtype=float)
+        masks, sums = self._solve(readings)
+        confidences = _confidences(readings, sums)
+        running = (masks[:, np.newaxis] >> np.arange(len(self._devices))) & 1
+        share = np.where(
+            (confidences > self._sensitivity) & (sums > 0), readings / np.maximum(sums, 1.0), 0
+        )
+        return running * self._powers * share[:, np.newaxis]
+
+    def predict(self, current_power: float) -> Dict[str, Dict[str, float]]:
+        """Disaggregate a single reading."""
+        return self.predict_batch([current_power])[0]
@@ -9,7 +9,6 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import (
     CONF_NAME,
-    CONF_SOURCE_SENSOR,
     CONF_SCAN_INTERVAL,
     CONF_UNIT_OF_MEASUREMENT,
 )
@@ -21,16 +20,31 @@ from .const import (
     DOMAIN,
     DEFAULT_NAME,
     DEFAULT_SCAN_INTERVAL,
+    CONF_SOURCE_SENSOR,
     CONF_SENSITIVITY,
     CONF_MIN_POWER,
     CONF_DEVICES_CONFIG,
+    CONF_ENGINE,
+    CONF_SMOOTHING_MODE,
+    CONF_SMOOTHING_WINDOW,
+    CONF_DEBUG_CAPTURE,
+    CONF_AGGREGATION,
+    CONF_CHANNEL_SENSORS,
     DEFAULT_SENSITIVITY,
     DEFAULT_MIN_POWER,
+    DEFAULT_ENGINE,
+    DEFAULT_SMOOTHING_MODE,
+    DEFAULT_SMOOTHING_WINDOW,
+    DEFAULT_DEBUG_CAPTURE,
+    DEFAULT_AGGREGATION,
     DEVICE_TYPES,
+    ENGINES,
+    SMOOTHING_MODES,
 )
+from .runtime import get_option
+from .signatures import load_signature_library
 
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
 
 class NilmEnergyDisaggregationConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for NILM Energy Disaggregation."""
@@ -45,7 +59,7 @@ class NilmEnergyDisaggregationConfigFlow(config_entries.ConfigFlow, domain=DOMAI
     async def async_step_user(self, user_input: Optional[Dict[str, Any]] = None) -> FlowResult:
         """Handle the initial step."""
         _LOGGER.debug("Starting async_step_user")
-        _LOGGER.debug(f"User input: {user_input}")
+        _LOGGER.debug("User input: %s", user_input)
         
         errors: Dict[str, str] = {}
 
@@ -57,13 +71,19 @@ class NilmEnergyDisaggregationConfigFlow(config_entries.ConfigFlow, domain=DOMAI
                     CONF_NAME: user_input.get(CONF_NAME, DEFAULT_NAME),
                     CONF_SOURCE_SENSOR: user_input[CONF_SOURCE_SENSOR],
                     CONF_SCAN_INTERVAL: user_input.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+                    # Other phases or circuits, each one a channel of the entry
+                    CONF_CHANNEL_SENSORS: [
+                        entity_id
+                        for entity_id in dict.fromkeys(user_input.get(CONF_CHANNEL_SENSORS, []))
+                        if entity_id != user_input[CONF_SOURCE_SENSOR]
+                    ],
                 }
                 
                 # Move to device configuration
                 return await self.async_step_devices()
                 
             except Exception as e:
-                _LOGGER.error(f"Error in config flow: {str(e)}")
+                _LOGGER.error("Error in config flow: %s", e)
                 _LOGGER.exception("Full exception details:")
                 errors["base"] = "cannot_connect"
 
@@ -78,18 +98,25 @@ class NilmEnergyDisaggregationConfigFlow(config_entries.ConfigFlow, domain=DOMAI
                     multiple=False
                 )
             ),
+            vol.Optional(CONF_CHANNEL_SENSORS, default=[]): selector.EntitySelector(
+                selector.EntitySelectorConfig(
+                    domain="sensor",
+                    device_class="energy",
+                    multiple=True
+                )
+            ),
             vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): selector.NumberSelector(
                 selector.NumberSelectorConfig(
                     min=5,
                     max=3600,
                     step=5,
-                    unit_of_time="seconds",
+                    unit_of_measurement="s",
                     mode="slider"
                 )
             ),
         })
 
-        _LOGGER.debug(f"Showing form with errors: {errors}")
+        _LOGGER.debug("Showing form with errors: %s", errors)
         return self.async_show_form(
             step_id="user",
             data_schema=data_schema,
@@ -110,6 +137,7 @@ class NilmEnergyDisaggregationConfigFlow(config_entries.ConfigFlow, domain=DOMAI
                 self.data.update({
                     CONF_SENSITIVITY: user_input.get(CONF_SENSITIVITY, DEFAULT_SENSITIVITY),
                     CONF_MIN_POWER: user_input.get(CONF_MIN_POWER, DEFAULT_MIN_POWER),
+                    CONF_ENGINE: user_input.get(CONF_ENGINE, DEFAULT_ENGINE),
                     CONF_DEVICES_CONFIG: {
                         device: user_input.get(f"enable_{device}", True)
                         for device in DEVICE_TYPES
@@ -123,7 +151,7 @@ class NilmEnergyDisaggregationConfigFlow(config_entries.ConfigFlow, domain=DOMAI
                 )
                 
             except Exception as e:
-                _LOGGER.error(f"Error configuring devices: {str(e)}")
+                _LOGGER.error("Error configuring devices: %s", e)
                 errors["base"] = "device_config_error"
 
         # Create device configuration form
@@ -145,6 +173,13 @@ class NilmEnergyDisaggregationConfigFlow(config_entries.ConfigFlow, domain=DOMAI
                     mode="box"
                 )
             ),
+            vol.Optional(CONF_ENGINE, default=DEFAULT_ENGINE): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=ENGINES,
+                    translation_key=CONF_ENGINE,
+                    mode="dropdown"
+                )
+            ),
         }
 
         # Add toggles for each device type
@@ -178,29 +213,36 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input: Optional[Dict[str, Any]] = None) -> FlowResult:
         """Handle options flow."""
+        library = await self.hass.async_add_executor_job(
+            load_signature_library, self.hass.config.config_dir
+        )
         if user_input is not None:
+            # Devices are stored as toggles, like the devices step does
+            enabled = set(user_input.get(CONF_DEVICES_CONFIG, library))
+            user_input[CONF_DEVICES_CONFIG] = {
+                device: device in enabled for device in library
+            }
             return self.async_create_entry(title="", data=user_input)
 
+        devices_config = get_option(self.config_entry, CONF_DEVICES_CONFIG) or {}
         options_schema = vol.Schema({
             vol.Optional(
                 CONF_SCAN_INTERVAL,
-                default=self.config_entry.options.get(
-                    CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
+                default=get_option(
+                    self.config_entry, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
                 ),
             ): selector.NumberSelector(
                 selector.NumberSelectorConfig(
                     min=5,
                     max=3600,
                     step=5,
-                    unit_of_time="seconds",
+                    unit_of_measurement="s",
                     mode="slider"
                 )
             ),
             vol.Optional(
                 CONF_SENSITIVITY,
-                default=self.config_entry.options.get(
-                    CONF_SENSITIVITY, DEFAULT_SENSITIVITY
-                ),
+                default=get_option(self.config_entry, CONF_SENSITIVITY, DEFAULT_SENSITIVITY),
             ): selector.NumberSelector(
                 selector.NumberSelectorConfig(
                     min=0.1,
@@ -211,9 +253,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             ),
             vol.Optional(
                 CONF_MIN_POWER,
-                default=self.config_entry.options.get(
-                    CONF_MIN_POWER, DEFAULT_MIN_POWER
-                ),
+                default=get_option(self.config_entry, CONF_MIN_POWER, DEFAULT_MIN_POWER),
             ): selector.NumberSelector(
                 selector.NumberSelectorConfig(
                     min=1,
@@ -223,6 +263,67 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     mode="box"
                 )
             ),
+            vol.Optional(
+                CONF_ENGINE,
+                default=get_option(self.config_entry, CONF_ENGINE, DEFAULT_ENGINE),
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=ENGINES,
+                    translation_key=CONF_ENGINE,
+                    mode="dropdown"
+                )
+            ),
+            vol.Optional(
+                CONF_DEVICES_CONFIG,
+                default=[
+                    device for device in library if devices_config.get(device, True)
+                ],
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=list(library),
+                    multiple=True,
+                    mode="list"
+                )
+            ),
+            vol.Optional(
+                CONF_SMOOTHING_MODE,
+                default=get_option(
+                    self.config_entry, CONF_SMOOTHING_MODE, DEFAULT_SMOOTHING_MODE
+                ),
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=SMOOTHING_MODES,
+                    translation_key=CONF_SMOOTHING_MODE,
+                    mode="dropdown"
+                )
+            ),
+            vol.Optional(
+                CONF_SMOOTHING_WINDOW,
+                default=get_option(
+                    self.config_entry, CONF_SMOOTHING_WINDOW, DEFAULT_SMOOTHING_WINDOW
+                ),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=1,
+                    max=60,
+                    step=1,
+                    mode="box"
+                )
+            ),
+            vol.Optional(
+                CONF_AGGREGATION,
+                default=get_option(self.config_entry, CONF_AGGREGATION, DEFAULT_AGGREGATION),
+            ): selector.BooleanSelector(
+                selector.BooleanSelectorConfig()
+            ),
+            vol.Optional(
+                CONF_DEBUG_CAPTURE,
+                default=get_option(
+                    self.config_entry, CONF_DEBUG_CAPTURE, DEFAULT_DEBUG_CAPTURE
+                ),
+            ): selector.BooleanSelector(
+                selector.BooleanSelectorConfig()
+            ),
         })
 
         return self.async_show_form(
@@ -6,10 +6,65 @@ DOMAIN = "nilm_energy_disaggregation"
 # Platforms that the integration supports
 PLATFORMS = [Platform.SENSOR]
 
+# Storage
+STORAGE_VERSION = 1
+STORAGE_KEY_MODELS = f"{DOMAIN}.models"  # index of the cached models
+STORAGE_DIR_MODELS = f"{DOMAIN}_models"  # one .npz file per cached model, in .storage
+STORAGE_KEY_LEDGER = f"{DOMAIN}.ledger"  # one store per config entry
+STORAGE_KEY_BASELINE = f"{DOMAIN}.baseline"  # one store per config entry
+MAX_CACHED_MODELS = 4
+LEDGER_SAVE_DELAY = 60  # seconds between saves of a changing ledger
+BASELINE_SAVE_DELAY = 300  # seconds between saves of the baseline sketches
+
+# Keys in hass.data[DOMAIN] shared by all config entries
+DATA_MODEL_CACHE = "model_cache"
+DATA_MODEL_REGISTRY = "model_registry"
+DATA_DEBUG_CAPTURE = "debug_capture"
+
 # Configuration
+CONF_SOURCE_SENSOR = "source_sensor"
 CONF_SENSITIVITY = "sensitivity"
 CONF_MIN_POWER = "min_power"
 CONF_DEVICES_CONFIG = "devices_config"
+CONF_ENGINE = "engine"
+CONF_SMOOTHING_MODE = "smoothing_mode"
+CONF_SMOOTHING_WINDOW = "smoothing_window"
+CONF_DEBUG_CAPTURE = "debug_capture"
+CONF_AGGREGATION = "aggregation"
+CONF_CHANNEL_SENSORS = "channel_sensors"  # other phases or circuits of the entry
+
+# Disaggregation engines
+ENGINE_CLASSIFIER = "classifier"
+ENGINE_EDGE_DETECTION = "edge_detection"
+ENGINE_COMBINATORIAL = "combinatorial"
+ENGINE_FEATURE_CLASSIFIER = "feature_classifier"
+ENGINE_SEQ2POINT = "seq2point"
+ENGINES = [
+    ENGINE_CLASSIFIER,
+    ENGINE_EDGE_DETECTION,
+    ENGINE_COMBINATORIAL,
+    ENGINE_FEATURE_CLASSIFIER,
+    ENGINE_SEQ2POINT,
+]
+
+# Smoothing modes
+SMOOTHING_MEAN = "mean"
+SMOOTHING_EMA = "ema"
+SMOOTHING_MEDIAN = "median"
+SMOOTHING_MODES = [SMOOTHING_MEAN, SMOOTHING_EMA, SMOOTHING_MEDIAN]
+
+# Services
+SERVICE_BACKFILL = "backfill"
+SERVICE_RETRAIN_MODEL = "retrain_model"
+SERVICE_SET_DEBUG_CAPTURE = "set_debug_capture"
+SERVICE_RESET_DAILY_ENERGY = "reset_daily_energy"
+ATTR_DAYS = "days"
+ATTR_CANCEL = "cancel"
+ATTR_ENABLED = "enabled"
+
+# Events
+SIGNAL_OPTIONS_UPDATED = f"{DOMAIN}_options_updated"  # suffixed with the entry id
+EVENT_BACKFILL_PROGRESS = f"{DOMAIN}_backfill_progress"
 
 # Attributes for device entities
 ATTR_CURRENT_POWER = "current_power"
@@ -19,11 +74,58 @@ ATTR_DAILY_ENERGY = "daily_energy"
 ATTR_LAST_UPDATE = "last_update"
 ATTR_DETECTION_CONFIDENCE = "detection_confidence"
 
+# Attributes for the standby entity
+ATTR_DAILY_BASELINE = "daily_baseline"
+ATTR_WEEKLY_BASELINE = "weekly_baseline"
+
 # Default values
 DEFAULT_NAME = "NILM Energy Disaggregation"
 DEFAULT_SCAN_INTERVAL = 30  # seconds
 DEFAULT_SENSITIVITY = 0.6
 DEFAULT_MIN_POWER = 10  # watts
+DEFAULT_ENGINE = ENGINE_CLASSIFIER
+DEFAULT_SMOOTHING_MODE = SMOOTHING_MEAN
+DEFAULT_SMOOTHING_WINDOW = 5  # samples
+DEFAULT_COMPILED_RESOLUTION = 1.0  # watts per lookup table step
+DEFAULT_POWER_DEADBAND = 5.0  # watts
+DEFAULT_CONFIDENCE_DEADBAND = 0.05
+DEFAULT_EDGE_THRESHOLD = 30.0  # watts
+DEFAULT_EDGE_SETTLE_SAMPLES = 1  # repeated readings fire no state change
+DEFAULT_DEBUG_CAPTURE = False
+DEFAULT_AGGREGATION = False
+
+# Aggregation of high-rate meters into scan interval windows
+AGGREGATION_STEP_THRESHOLD = 100.0  # watts, larger steps are evaluated at once
+AGGREGATION_BUFFER_SIZE = 4096  # readings per window before it is closed early
+
+# Multi-channel entries
+CROSS_PHASE_WINDOW = 5.0  # seconds for the steps of every phase to arrive
+CHANNEL_TICK_DELAY = 1.0  # seconds the readings of every channel are gathered per tick
+CROSS_PHASE_BALANCE = 0.3  # relative spread allowed between per-phase steps
+
+# Always-on baseline load
+BASELINE_QUANTILE = 0.05  # low quantile of the readings taken as always-on load
+BASELINE_DAY = 86400  # seconds
+BASELINE_WEEK = 7 * 86400  # seconds
+
+# Rolling-window features
+FEATURE_WINDOW = 10  # samples in the variance window
+FEATURE_MAX_SECONDS = 4 * 3600  # state times and cycle periods are capped here
+FEATURE_TRAINING_PERIOD = 30.0  # seconds between synthetic training samples
+
+# Sequence model
+SEQ2POINT_WEIGHTS_FILE = "nilm_seq2point.npz"  # in the config directory
+SEQ2POINT_BATCH_WINDOWS = 512  # windows per matrix product, bounds the activations
+
+# Backfill
+DEFAULT_BACKFILL_DAYS = 30
+BACKFILL_CHUNK_HOURS = 24  # history read and disaggregated per window
+RETRAIN_HISTORY_DAYS = 7
+RETRAIN_MAX_SAMPLES = 20000  # bounds the fitting time of a retrain
+
+# Inference worker
+DEFAULT_INFERENCE_QUEUE_SIZE = 256  # samples waiting for the next batch
+DEFAULT_INFERENCE_MAX_AGE = 60  # seconds before a queued sample is stale
 
 # Device types
 DEVICE_TYPES = [
@@ -50,6 +152,12 @@ DEVICE_SIGNATURES = {
     "air_conditioner": {"min_power": 500, "max_power": 1500, "cycle_time": 20},
     "water_heater": {"min_power": 1000, "max_power": 3000, "cycle_time": 0},
 }
+# User signature libraries in the config directory, first found wins. They
+# add devices to, or override, the signatures above
+SIGNATURE_LIBRARY_FILES = ("nilm_signatures.yaml", "nilm_signatures.json")
 
 # Logging
 LOGGER_NAME = "nilm_energy_disaggregation"
+DEBUG_LOG_FILE = "nilm_debug.log"  # in the config directory
+DEBUG_LOG_MAX_BYTES = 5 * 1024 * 1024
+DEBUG_LOG_BACKUP_COUNT = 3
@@ -0,0 +1,143 @@
+"""Opt-in debug log capture for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional, Set
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    DATA_DEBUG_CAPTURE,
+    DEBUG_LOG_BACKUP_COUNT,
+    DEBUG_LOG_FILE,
+    DEBUG_LOG_MAX_BYTES,
+    DOMAIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DEBUG_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue records as they are, leaving formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return the record unformatted."""
+        return record
+
+
+class _ParentHandler(logging.Handler):
+    """Pass records on to the parent loggers, as propagation would."""
+
+    def __init__(self, logger: logging.Logger, level: int) -> None:
+        """Initialize the handler."""
+        super().__init__(level)
+        self._parent = logger.parent
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Hand the record to the parent logger."""
+        if self._parent is not None:
+            self._parent.handle(record)
+
+
+class NilmDebugCapture:
+    """Write the debug log of the integration to a rotating file.
+
+    While enabled, the package logger runs at DEBUG level. Its records go
+    through a queue to a listener thread, which formats them and writes
+    them to a size-rotated file in the config directory, so the event loop
+    never touches the disk. Records below the previous level are kept out
+    of the Home Assistant log. Capture stays enabled while any config entry
+    or the service asks for it.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the capture."""
+        self._hass = hass
+        self._logger = logging.getLogger(__package__)
+        self._requesters: Set[str] = set()
+        self._listener: Optional[QueueListener] = None
+        self._handlers: List[logging.Handler] = []
+        self._previous_level = logging.NOTSET
+        self._previous_propagate = True
+
+    @property
+    def enabled(self) -> bool:
+        """Return True while debug records are captured."""
+        return self._listener is not None
+
+    @property
+    def path(self) -> str:
+        """Return the path of the debug log file."""
+        return self._hass.config.path(DEBUG_LOG_FILE)
+
+    @callback
+    def async_enable(self, requester: str) -> None:
+        """Start capturing on behalf of a config entry or the service."""
+        self._requesters.add(requester)
+        if self._listener is not None:
+            return
+
+        # The file is only opened by the listener thread, on the first record
+        file_handler = RotatingFileHandler(
+            self.path,
+            maxBytes=DEBUG_LOG_MAX_BYTES,
+            backupCount=DEBUG_LOG_BACKUP_COUNT,
+            encoding="utf-8",
+            delay=True,
+        )
+        file_handler.setFormatter(logging.Formatter(DEBUG_LOG_FORMAT))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        self._listener = QueueListener(records, file_handler)
+        self._listener.start()
+
+        self._previous_level = self._logger.level
+        self._previous_propagate = self._logger.propagate
+        self._handlers = [
+            _DeferredQueueHandler(records),
+            _ParentHandler(self._logger, self._logger.getEffectiveLevel()),
+        ]
+        for handler in self._handlers:
+            self._logger.addHandler(handler)
+        self._logger.propagate = False
+        self._logger.setLevel(logging.DEBUG)
+        _LOGGER.info("Capturing NILM debug log to %s", self.path)
+
+    async def async_disable(self, requester: Optional[str] = None) -> None:
+        """Stop capturing for a requester, or for everyone without one."""
+        if requester is None:
+            self._requesters.clear()
+        else:
+            self._requesters.discard(requester)
+        if self._requesters or self._listener is None:
+            return
+
+        for handler in self._handlers:
+            self._logger.removeHandler(handler)
+        self._handlers = []
+        self._logger.setLevel(self._previous_level)
+        self._logger.propagate = self._previous_propagate
+
+        # Stopping flushes the queue and joins the thread, so not on the loop
+        listener, self._listener = self._listener, None
+        await self._hass.async_add_executor_job(_stop_listener, listener)
+        _LOGGER.info("Stopped capturing NILM debug log")
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    """Flush and stop a listener, then close its handlers."""
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+@callback
+def async_get_debug_capture(hass: HomeAssistant) -> NilmDebugCapture:
+    """Return the debug capture shared by all config entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_DEBUG_CAPTURE not in domain_data:
+        domain_data[DATA_DEBUG_CAPTURE] = NilmDebugCapture(hass)
+    return domain_data[DATA_DEBUG_CAPTURE]
@@ -0,0 +1,85 @@
+"""Diagnostics support for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .engines import get_engine_type
+from .model_cache import async_get_model_registry
+from .runtime import NilmRuntimeData
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    runtime_data: NilmRuntimeData = hass.data[DOMAIN][entry.entry_id]
+    registry = async_get_model_registry(hass)
+    engine = runtime_data.engine
+    worker = runtime_data.worker
+    ledger = runtime_data.ledger
+    aggregator = runtime_data.aggregator
+
+    return {
+        "entry": {
+            "data": dict(entry.data),
+            "options": dict(entry.options),
+        },
+        "engine": {
+            "type": get_engine_type(entry),
+            "class": type(engine).__name__ if engine is not None else None,
+            "devices": list(engine.devices) if engine is not None else [],
+            "channels": getattr(engine, "channels", 1),
+            "sensitivity": runtime_data.sensitivity,
+            "cache_key": getattr(engine, "cache_key", None),
+            "compiled": getattr(engine, "compiled", None),
+            "model_bytes": getattr(engine, "nbytes", None),
+        },
+        "inference": {
+            "batches": worker.batches if worker is not None else 0,
+            "dropped_samples": worker.dropped_samples if worker is not None else 0,
+            "queued": worker.queued if worker is not None else 0,
+        },
+        "aggregation": {
+            "windows": aggregator.windows,
+            "fast_paths": aggregator.fast_paths,
+            "pending": aggregator.pending,
+            "last_window": aggregator.last_window.as_dict()
+            if aggregator.last_window is not None
+            else None,
+        }
+        if aggregator is not None
+        else None,
+        "model_registry": {
+            "models_in_memory": registry.model_count,
+            "shared_hits": registry.shared_hits,
+            "cache_hits": registry.cache_hits,
+            "cache_misses": registry.cache_misses,
+        },
+        "ledger": {
+            "hour": ledger.hour,
+            "energy_kwh": {
+                device: ledger.energy_kwh(index)
+                for index, device in enumerate(ledger.devices)
+            },
+        }
+        if ledger is not None
+        else None,
+        "baseline": {
+            "standby_w": runtime_data.baseline.value,
+            "channels_w": [
+                estimator.value for estimator in runtime_data.baseline.estimators
+            ],
+        }
+        if runtime_data.baseline is not None
+        else None,
+        "statistics": {
+            "exported_rows": runtime_data.exporter.exported_rows,
+        }
+        if runtime_data.exporter is not None
+        else None,
+        "metrics": runtime_data.metrics.as_dict(),
+    }
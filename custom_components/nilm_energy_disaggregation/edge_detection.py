@@ -0,0 +1,188 @@
+"""Streaming edge-detection disaggregation engine."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .const import DEFAULT_EDGE_SETTLE_SAMPLES, DEFAULT_EDGE_THRESHOLD
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .signatures import PowerState, SignatureLibrary
+
+# Edges this much outside a signature's power range can still match it
+EDGE_TOLERANCE = 0.2
+
+# Past this many samples the steady state becomes an exponential mean
+STEADY_WINDOW = 600
+
+
+def state_confidence(state: PowerState, step: float) -> float:
+    """Return how well a power state explains a step.
+
+    The confidence is 1.0 at the middle of the range and 0.5 at its bounds.
+    """
+    half_range = max((state.max_power - state.min_power) / 2, 1.0)
+    return max(0.0, 1 - abs(step - state.center) / (2 * half_range))
+
+
+class EdgeDetectionEngine:
+    """Hart-style step-change disaggregation in O(1) per sample.
+
+    The engine tracks the current steady state of the aggregate power. When
+    the power settles at a new level for ``settle_samples`` consecutive
+    samples, the step between both steady states is matched against the
+    device signatures: a rising edge switches on the idle device with a
+    power state that best explains it, found through the interval index of
+    the signatures, a falling edge switches off the running device
+    whose rising edge it best cancels. Running devices are tracked
+    additively, so concurrent loads are reported together.
+    """
+
+    def __init__(
+        self,
+        signatures: SignatureLibrary,
+        threshold: float = DEFAULT_EDGE_THRESHOLD,
+        settle_samples: int = DEFAULT_EDGE_SETTLE_SAMPLES,
+    ) -> None:
+        """Initialize the engine."""
+        self._signatures = signatures
+        self._index = signatures.index(EDGE_TOLERANCE)
+        self._threshold = threshold
+        self._settle_samples = max(1, settle_samples)
+
+        # Current steady state, as a running mean of its samples
+        self._steady_sum = 0.0
+        self._steady_count = 0
+
+        # Samples that left the steady state and may form a new one
+        self._candidate_sum = 0.0
+        self._candidate_count = 0
+
+        # Running devices: device -> (power, confidence)
+        self._running: Dict[str, Tuple[float, float]] = {}
+
+    @property
+    def devices(self) -> List[str]:
+        """Return the devices the engine can detect."""
+        return list(self._signatures)
+
+    @property
+    def steady_power(self) -> float:
+        """Return the power of the current steady state."""
+        if not self._steady_count:
+            return 0.0
+        return self._steady_sum / self._steady_count
+
+    def new_stream(self) -> EdgeDetectionEngine:
+        """Return an engine with the same settings and no stream state."""
+        return EdgeDetectionEngine(self._signatures, self._threshold, self._settle_samples)
+
+    def with_sensitivity(self, sensitivity: float) -> EdgeDetectionEngine:
+        """Return the engine, edges do not depend on the sensitivity."""
+        return self
+
+    def reset(self) -> None:
+        """Forget the steady state and all running devices."""
+        self._steady_sum = self._candidate_sum = 0.0
+        self._steady_count = self._candidate_count = 0
+        self._running.clear()
+
+    def _match_rising_edge(self, step: float) -> Optional[Tuple[str, float]]:
+        """Return the idle device that best explains a rising edge."""
+        best = None
+        for state in self._index.candidates(step):
+            if state.device in self._running:
+                continue
+            confidence = state_confidence(state, step)
+            if best is None or confidence > best[1]:
+                best = (state.device, confidence)
+        return best
+
+    def _match_falling_edge(self, step: float) -> Optional[str]:
+        """Return the running device whose power best matches a falling edge."""
+        best = None
+        best_error = EDGE_TOLERANCE * 2
+        for device, (power, _) in self._running.items():
+            error = abs(step - power) / power
+            if error <= best_error:
+                best, best_error = device, error
+        return best
+
+    def _on_step(self, step: float) -> None:
+        """Update the running devices for a step between steady states."""
+        if step > 0:
+            match = self._match_rising_edge(step)
+            if match is not None:
+                self._running[match[0]] = (step, match[1])
+        else:
+            device = self._match_falling_edge(-step)
+            if device is not None:
+                del self._running[device]
+
+        # Nothing can be running below the detection threshold
+        if self.steady_power < self._threshold:
+            self._running.clear()
+
+    def process(self, power: float) -> Dict[str, Dict[str, float]]:
+        """Process a sample and return the running devices."""
+        if not self._steady_count or abs(power - self.steady_power) < self._threshold:
+            # Still in the steady state
+            if self._steady_count >= STEADY_WINDOW:
+                self._steady_sum -= self._steady_sum / self._steady_count
+                self._steady_count -= 1
+            self._steady_sum += power
+            self._steady_count += 1
+            self._candidate_sum = 0.0
+            self._candidate_count = 0
+        else:
+            # Outside the steady state: grow or restart the candidate state
+            if self._candidate_count and (
+                abs(power - self._candidate_sum / self._candidate_count)
+                >= self._threshold
+            ):
+                self._candidate_sum = 0.0
+                self._candidate_count = 0
+            self._candidate_sum += power
+            self._candidate_count += 1
+
+            if self._candidate_count >= self._settle_samples:
+                previous = self.steady_power
+                self._steady_sum = self._candidate_sum
+                self._steady_count = self._candidate_count
+                self._candidate_sum = 0.0
+                self._candidate_count = 0
+                self._on_step(self.steady_power - previous)
+
+        return {
+            device: {"power": device_power, "confidence": confidence}
+            for device, (device_power, confidence) in self._running.items()
+        }
+
+    def predict_batch(
+        self, powers: List[float], timestamps: Optional[List[float]] = None
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Process a batch of samples in order."""
+        return [self.process(power) for power in powers]
+
+    def predict_power_matrix(
+        self, powers: np.ndarray, timestamps: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return the power of every device (columns) for every reading (rows).
+
+        Edges depend on the previous samples, so readings are processed in
+        order; the engine state carries over between calls.
+        """
+        # pylint: disable-next=import-outside-toplevel
+        import numpy as np
+
+        columns = {device: column for column, device in enumerate(self._signatures)}
+        matrix = np.zeros((len(powers), len(columns)))
+        for row, power in enumerate(powers):
+            for device, device_data in self.process(float(power)).items():
+                matrix[row, columns[device]] = device_data["power"]
+        return matrix
+
+    def predict(self, current_power: float) -> Dict[str, Dict[str, float]]:
+        """Process a single sample."""
+        return self.process(current_power)
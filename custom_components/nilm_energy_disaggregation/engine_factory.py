@@ -0,0 +1,90 @@
+"""Engine construction shared by the integration and the offline tools.
+
+Nothing here imports Home Assistant, so ``benchmarks/offline.py`` builds its
+engines with the same selection and fallbacks as the integration. The numpy
+engine modules are imported on first use: the integration calls
+``build_channel_engine`` in the executor, keeping those imports off-loop.
+"""
+from __future__ import annotations
+
+import importlib
+import logging
+from typing import Any, Callable, Optional
+
+from .const import (
+    ENGINE_COMBINATORIAL,
+    ENGINE_EDGE_DETECTION,
+    ENGINE_FEATURE_CLASSIFIER,
+    ENGINE_SEQ2POINT,
+)
+from .edge_detection import EdgeDetectionEngine
+from .signatures import SignatureLibrary
+
+_LOGGER = logging.getLogger(__name__)
+
+# Returns the trained NILM model of the signatures, per-reading or multi-feature
+ModelFactory = Callable[[bool], Any]
+
+
+def _import(module: str) -> Any:
+    """Import an engine module of this package."""
+    return importlib.import_module(f"{__package__}.{module}")
+
+
+def build_channel_engine(
+    engine_type: str,
+    signatures: SignatureLibrary,
+    sensitivity: float,
+    weights_path: str,
+    model_factory: Optional[ModelFactory] = None,
+) -> Any:
+    """Create the engine of the given type for the readings of one channel.
+
+    The classifier engines get their model from ``model_factory``, called
+    with whether it takes multi-feature rows; without it the model is
+    trained here. An engine that cannot handle the signatures falls back:
+    the combinatorial engine to edge detection past ``MAX_DEVICES``, and
+    the sequence model to the classifier when its weights cannot be loaded.
+    """
+    if model_factory is None:
+
+        def model_factory(multi_feature: bool) -> Any:
+            return _import("model").NilmModel(
+                sensitivity=sensitivity,
+                multi_feature=multi_feature,
+                signatures=signatures,
+            )
+
+    if engine_type == ENGINE_EDGE_DETECTION:
+        return EdgeDetectionEngine(signatures)
+
+    if engine_type == ENGINE_COMBINATORIAL:
+        module = _import("combinatorial")
+        if len(signatures) > module.MAX_DEVICES:
+            _LOGGER.warning(
+                "Using edge detection, the combinatorial engine supports at most %d "
+                "devices and %d are enabled",
+                module.MAX_DEVICES,
+                len(signatures),
+            )
+            return EdgeDetectionEngine(signatures)
+        return module.CombinatorialEngine(signatures, sensitivity)
+
+    if engine_type == ENGINE_FEATURE_CLASSIFIER:
+        # The model may be shared, the rolling feature state belongs to the engine
+        return _import("features").FeatureClassifier(model_factory(True))
+
+    if engine_type == ENGINE_SEQ2POINT:
+        module = _import("seq2point")
+        try:
+            return module.Seq2PointEngine.from_file(
+                weights_path, signatures, sensitivity
+            )
+        except (OSError, KeyError, ValueError) as err:
+            _LOGGER.error(
+                "Using the classifier, cannot load the sequence model %s: %s",
+                weights_path,
+                err,
+            )
+
+    return model_factory(False)
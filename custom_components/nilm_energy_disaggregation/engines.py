@@ -0,0 +1,101 @@
+"""Disaggregation engine selection for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, List
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    CONF_CHANNEL_SENSORS,
+    CONF_ENGINE,
+    CONF_SENSITIVITY,
+    CONF_SOURCE_SENSOR,
+    DEFAULT_ENGINE,
+    DEFAULT_SENSITIVITY,
+    SEQ2POINT_WEIGHTS_FILE,
+)
+from .engine_factory import build_channel_engine
+from .model_cache import async_get_model_registry, async_import_module
+from .runtime import get_option
+from .signatures import SignatureLibrary, async_get_signatures
+
+
+def get_engine_type(config_entry: ConfigEntry) -> str:
+    """Return the engine configured for an entry, options taking precedence."""
+    return get_option(config_entry, CONF_ENGINE, DEFAULT_ENGINE)
+
+
+def get_sensitivity(config_entry: ConfigEntry) -> float:
+    """Return the sensitivity configured for an entry, options taking precedence."""
+    return get_option(config_entry, CONF_SENSITIVITY, DEFAULT_SENSITIVITY)
+
+
+def get_source_sensors(config_entry: ConfigEntry) -> List[str]:
+    """Return the source sensor of every channel of an entry, the main one first."""
+    return [config_entry.data[CONF_SOURCE_SENSOR]] + list(
+        config_entry.data.get(CONF_CHANNEL_SENSORS, [])
+    )
+
+
+async def async_create_engine(
+    hass: HomeAssistant, config_entry: ConfigEntry, sensitivity: float
+) -> Any:
+    """Create the disaggregation engine for a config entry.
+
+    Every engine exposes ``devices`` and ``predict_batch()``, which is what
+    the inference worker and the sensor platform rely on. Readings come with
+    their timestamps, which only engines with time-based features use.
+    Engines only detect the devices enabled for the entry.
+
+    An entry with several source sensors gets a ``MultiChannelEngine``,
+    which takes the readings of all channels as one vector. Its channels are
+    evaluated by the configured engine, trained on the single-phase
+    signatures only.
+    """
+    signatures = await async_get_signatures(hass, config_entry)
+    channels = len(get_source_sensors(config_entry))
+    if channels == 1:
+        return await _async_create_channel_engine(
+            hass, config_entry, sensitivity, signatures
+        )
+
+    engine = await _async_create_channel_engine(
+        hass, config_entry, sensitivity, signatures.by_phases(multi_phase=False)
+    )
+    module = await async_import_module(hass, "channels")
+    return module.MultiChannelEngine(
+        engine, channels, signatures.by_phases(multi_phase=True)
+    )
+
+
+async def _async_create_channel_engine(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    sensitivity: float,
+    signatures: SignatureLibrary,
+) -> Any:
+    """Create the configured engine for the readings of one channel."""
+    registry = async_get_model_registry(hass)
+
+    def acquire_model(multi_feature: bool) -> Any:
+        # Share the trained NILM model with other entries, training it off-loop on a miss
+        return asyncio.run_coroutine_threadsafe(
+            registry.async_acquire(
+                config_entry.entry_id,
+                sensitivity,
+                signatures,
+                multi_feature=multi_feature,
+            ),
+            hass.loop,
+        ).result()
+
+    return await hass.async_add_executor_job(
+        build_channel_engine,
+        get_engine_type(config_entry),
+        signatures,
+        sensitivity,
+        hass.config.path(SEQ2POINT_WEIGHTS_FILE),
+        acquire_model,
+    )
@@ -0,0 +1,345 @@
+"""Rolling-window features of the aggregate power for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import copy
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .const import (
+    DEFAULT_EDGE_THRESHOLD,
+    FEATURE_MAX_SECONDS,
+    FEATURE_TRAINING_PERIOD,
+    FEATURE_WINDOW,
+)
+
+if TYPE_CHECKING:
+    from .signatures import SignatureLibrary
+
+FEATURES = ("power", "delta", "variance", "state_time", "cycle_period", "duty_cycle")
+
+# Power is quantized to 0.1 W, so running sums are exact integers and the
+# streaming and vectorized paths compute bit-identical features
+POWER_QUANTA = 10
+
+# Synthetic training traces: cycling devices run three on/off cycles,
+# other devices one long run
+TRAINING_CYCLES = 3
+TRAINING_RUN_MINUTES = 90
+TRAINING_LEVELS = 10
+TRAINING_NOISE = 0.01  # relative standard deviation of the readings
+
+
+class FeatureExtractor:
+    """Compute the features of a power stream in O(1) per sample.
+
+    A step is a change of more than ``threshold`` between two consecutive
+    readings. For every reading the extractor reports the power, its delta
+    from the steady state before the last step, the variance over the last
+    ``window`` readings, the time since the last step, and the period and
+    duty cycle of the last completed on/off cycle (a rising step up to the
+    next step, then a falling step up to the next one). A rising step that
+    differs from the previous one by more than ``threshold`` is another
+    load, so it clears the cycle. The variance comes from running sums over
+    a preallocated ring buffer.
+    """
+
+    __slots__ = (
+        "_window",
+        "_threshold",
+        "_buffer",
+        "_position",
+        "_count",
+        "_sum",
+        "_sum_squares",
+        "_previous",
+        "_steady_before",
+        "_step_time",
+        "_segment_rising",
+        "_last_rise",
+        "_last_up",
+        "_last_down",
+    )
+
+    def __init__(
+        self, window: int = FEATURE_WINDOW, threshold: float = DEFAULT_EDGE_THRESHOLD
+    ) -> None:
+        """Initialize the extractor."""
+        self._window = window
+        self._threshold = round(threshold * POWER_QUANTA)
+        self._buffer: List[int] = [0] * window
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the stream seen so far."""
+        self._position = 0
+        self._count = 0
+        self._sum = 0
+        self._sum_squares = 0
+        self._previous: Optional[int] = None
+        self._steady_before = 0
+        self._step_time = 0.0
+        self._segment_rising: Optional[bool] = None
+        self._last_rise: Optional[int] = None
+        self._last_up = 0.0
+        self._last_down = 0.0
+
+    def update(self, power: float, timestamp: float) -> Tuple[float, ...]:
+        """Add a reading and return its features, in ``FEATURES`` order."""
+        quanta = round(power * POWER_QUANTA)
+        previous = self._previous
+        if previous is None:
+            self._steady_before = quanta
+            self._step_time = timestamp
+        elif abs(quanta - previous) > self._threshold:
+            # The step closes the segment started by the previous step
+            if self._segment_rising is not None:
+                if self._segment_rising:
+                    self._last_up = timestamp - self._step_time
+                else:
+                    self._last_down = timestamp - self._step_time
+            self._segment_rising = quanta > previous
+            if self._segment_rising:
+                rise = quanta - previous
+                if self._last_rise is None or abs(rise - self._last_rise) > self._threshold:
+                    self._last_up = 0.0
+                    self._last_down = 0.0
+                self._last_rise = rise
+            self._steady_before = previous
+            self._step_time = timestamp
+        self._previous = quanta
+
+        # Rolling sums over the ring buffer
+        if self._count == self._window:
+            oldest = self._buffer[self._position]
+            self._sum -= oldest
+            self._sum_squares -= oldest * oldest
+        else:
+            self._count += 1
+        self._buffer[self._position] = quanta
+        self._position = (self._position + 1) % self._window
+        self._sum += quanta
+        self._sum_squares += quanta * quanta
+        count = self._count
+        variance = float(count * self._sum_squares - self._sum * self._sum) / float(
+            count * count * POWER_QUANTA * POWER_QUANTA
+        )
+
+        period = 0.0
+        duty_cycle = 0.0
+        if self._last_up > 0 and self._last_down > 0:
+            period = self._last_up + self._last_down
+            duty_cycle = self._last_up / period
+
+        return (
+            float(quanta) / POWER_QUANTA,
+            float(quanta - self._steady_before) / POWER_QUANTA,
+            variance,
+            min(timestamp - self._step_time, FEATURE_MAX_SECONDS),
+            min(period, FEATURE_MAX_SECONDS),
+            duty_cycle,
+        )
+
+
+def extract_features(
+    timestamps: Sequence[float],
+    powers: Sequence[float],
+    window: int = FEATURE_WINDOW,
+    threshold: float = DEFAULT_EDGE_THRESHOLD,
+) -> np.ndarray:
+    """Return the features of a whole series (rows), as FeatureExtractor would.
+
+    This is the vectorized counterpart of feeding every reading to a fresh
+    ``FeatureExtractor``, with the same arithmetic, so features computed
+    for training match the ones computed live.
+    """
+    times = np.asarray(timestamps, dtype=float)
+    quanta = np.rint(np.asarray(powers, dtype=float) * POWER_QUANTA).astype(np.int64)
+    count = len(quanta)
+    features = np.zeros((count, len(FEATURES)))
+    if not count:
+        return features
+
+    limit = round(threshold * POWER_QUANTA)
+    changes = np.diff(quanta, prepend=quanta[0])
+    rising = changes > limit
+    steps = rising | (changes < -limit)
+    index = np.arange(count)
+
+    # The first reading counts as a step for the state, not for the cycles
+    last_step = np.maximum.accumulate(np.where(steps, index, 0))
+    steady_before = quanta[np.maximum(last_step - 1, 0)]
+
+    # Rolling sums as differences of integer cumulative sums
+    sums = np.concatenate(([0], np.cumsum(quanta)))
+    sums_squares = np.concatenate(([0], np.cumsum(quanta * quanta)))
+    lower = np.maximum(index + 1 - window, 0)
+    counts = index + 1 - lower
+    total = sums[index + 1] - sums[lower]
+    numerator = counts * (sums_squares[index + 1] - sums_squares[lower]) - total * total
+    variance = numerator.astype(float) / (
+        counts * counts * POWER_QUANTA * POWER_QUANTA
+    ).astype(float)
+
+    # Durations of the on and off segments, known from the step closing them
+    last_up = np.zeros(count)
+    last_down = np.zeros(count)
+    step_index = np.flatnonzero(steps)
+    if len(step_index):
+        order = np.arange(len(step_index))
+        durations = np.diff(times[step_index], prepend=times[step_index[0]])
+        step_rising = rising[step_index]
+        closes_up = np.concatenate(([False], step_rising[:-1]))
+        closes_down = np.concatenate(([False], ~step_rising[:-1]))
+
+        # A rising step unlike the previous one clears the cycle
+        rises = changes[step_index[step_rising]]
+        clears = np.zeros(len(step_index), dtype=bool)
+        similar = np.abs(np.diff(rises, prepend=rises[:1])) <= limit
+        similar[:1] = False
+        clears[step_rising] = ~similar
+        latest_clear = np.maximum.accumulate(np.where(clears, order, -1))
+
+        up_at_step = np.zeros(len(step_index))
+        down_at_step = np.zeros(len(step_index))
+        for values, closes in ((up_at_step, closes_up), (down_at_step, closes_down)):
+            latest = np.maximum.accumulate(np.where(closes, order, 0))
+            kept = (latest > 0) & (latest > latest_clear)
+            values[kept] = durations[latest[kept]]
+        step_of_sample = np.searchsorted(step_index, index, side="right") - 1
+        after_step = step_of_sample >= 0
+        last_up[after_step] = up_at_step[step_of_sample[after_step]]
+        last_down[after_step] = down_at_step[step_of_sample[after_step]]
+
+    cycling = (last_up > 0) & (last_down > 0)
+    period = np.where(cycling, last_up + last_down, 0.0)
+    duty_cycle = np.divide(last_up, period, out=np.zeros(count), where=cycling)
+
+    features[:, 0] = quanta.astype(float) / POWER_QUANTA
+    features[:, 1] = (quanta - steady_before).astype(float) / POWER_QUANTA
+    features[:, 2] = variance
+    features[:, 3] = np.minimum(times - times[last_step], FEATURE_MAX_SECONDS)
+    features[:, 4] = np.minimum(period, FEATURE_MAX_SECONDS)
+    features[:, 5] = duty_cycle
+    return features
+
+
+def _training_pattern(cycle_time: float, period: float) -> np.ndarray:
+    """Return the on/off pattern of a synthetic trace, True while running."""
+    if cycle_time > 0:
+        half = max(int(cycle_time * 60 / period), 1)
+        cycle = np.concatenate((np.zeros(half, dtype=bool), np.ones(half, dtype=bool)))
+        return np.concatenate((np.tile(cycle, TRAINING_CYCLES), np.zeros(half, dtype=bool)))
+    run = int(TRAINING_RUN_MINUTES * 60 / period)
+    return np.concatenate(
+        (np.zeros(run, dtype=bool), np.ones(run, dtype=bool), np.zeros(run, dtype=bool))
+    )
+
+
+def signature_training_set(
+    signatures: SignatureLibrary,
+    period: float = FEATURE_TRAINING_PERIOD,
+    seed: int = 42,
+) -> Dict[str, np.ndarray]:
+    """Return labelled features of synthetic traces of every device.
+
+    Every power state of every device is simulated alone at
+    ``TRAINING_LEVELS`` levels spanning its range, cycling with the device
+    ``cycle_time``. The traces of a state are drawn as one matrix. Readings
+    taken while the device runs are labelled with it.
+    """
+    rng = np.random.default_rng(seed)
+    powers: List[np.ndarray] = []
+    features: List[np.ndarray] = []
+    labels: List[np.ndarray] = []
+    for signature in signatures.values():
+        running = _training_pattern(signature.cycle_time, period)
+        times = period * np.arange(len(running))
+        for state in signature.states:
+            levels = np.linspace(state.min_power, state.max_power, TRAINING_LEVELS)
+            traces = np.abs(
+                levels[:, np.newaxis]
+                * (running + rng.normal(0.0, TRAINING_NOISE, (TRAINING_LEVELS, len(running))))
+            )
+            powers.append(traces[:, running].ravel())
+            features.extend(extract_features(times, trace)[running] for trace in traces)
+            labels.append(
+                np.full(TRAINING_LEVELS * int(running.sum()), signature.name, dtype=object)
+            )
+
+    return {
+        "power": np.concatenate(powers),
+        "features": np.concatenate(features),
+        "device": np.concatenate(labels),
+    }
+
+
+class FeatureClassifier:
+    """Stream the features of one entry into a shared multi-feature model.
+
+    The model is shared between entries, the extractor state is not. Live
+    readings go through the streaming extractor, history arrays (backfill)
+    are featurized on their own with ``extract_features``.
+    """
+
+    def __init__(self, model: Any) -> None:
+        """Initialize the classifier."""
+        self.model = model
+        self._extractor = FeatureExtractor()
+
+    @property
+    def devices(self) -> List[str]:
+        """Return the devices the model can detect."""
+        return self.model.devices
+
+    @property
+    def cache_key(self) -> str:
+        """Return the cache key of the model."""
+        return self.model.cache_key
+
+    @property
+    def compiled(self) -> bool:
+        """Return True if the model is served from a lookup table."""
+        return self.model.compiled
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory held by the model arrays."""
+        return self.model.nbytes
+
+    def new_stream(self) -> FeatureClassifier:
+        """Return a classifier sharing the model, with no stream state."""
+        return FeatureClassifier(self.model)
+
+    def with_sensitivity(self, sensitivity: float) -> FeatureClassifier:
+        """Return the classifier at another sensitivity, keeping the stream state."""
+        classifier = copy.copy(self)
+        classifier.model = self.model.with_sensitivity(sensitivity)
+        return classifier
+
+    def predict_batch(
+        self, powers: List[float], timestamps: Optional[List[float]] = None
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Predict devices for a batch of readings, in order."""
+        if timestamps is None:
+            timestamps = [time.time()] * len(powers)
+        update = self._extractor.update
+        features = np.array(
+            [update(power, timestamp) for power, timestamp in zip(powers, timestamps)]
+        ).reshape(-1, len(FEATURES))
+        return self.model.predict_batch(powers, features=features)
+
+    def predict_power_matrix(
+        self, powers: np.ndarray, timestamps: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return the power of every device (columns) for every reading (rows)."""
+        if timestamps is None:
+            raise ValueError("Features of a history need its timestamps")
+        return self.model.predict_power_matrix(
+            powers, features=extract_features(timestamps, powers)
+        )
+
+    def predict(self, current_power: float) -> Dict[str, Dict[str, float]]:
+        """Predict devices from current power consumption."""
+        return self.predict_batch([current_power])[0]
@@ -0,0 +1,225 @@
+"""Compact random forest predictor of NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import base64
+from typing import Any, Dict, Mapping
+
+import numpy as np
+
+# Rows walked through the trees at once
+PREDICT_CHUNK_ROWS = 1024
+
+
+def _encode(array: np.ndarray) -> Dict[str, Any]:
+    """Return an array as a JSON serializable dict."""
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "data": base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii"),
+    }
+
+
+def _decode(data: Dict[str, Any]) -> np.ndarray:
+    """Return an array encoded with _encode()."""
+    return np.frombuffer(
+        base64.b64decode(data["data"]), dtype=np.dtype(data["dtype"])
+    ).reshape(data["shape"])
+
+
+def _to_ordered(values: np.ndarray) -> np.ndarray:
+    """Map float64 values to int64 keys that sort like them, one per value."""
+    bits = np.asarray(values, dtype=float).view(np.int64)
+    return np.where(bits < 0, np.iinfo(np.int64).min - bits, bits)
+
+
+def _from_ordered(keys: np.ndarray) -> np.ndarray:
+    """Return the float64 values of keys made by _to_ordered()."""
+    return np.where(keys < 0, np.iinfo(np.int64).min - keys, keys).view(np.float64)
+
+
+def _fold_thresholds(
+    thresholds: np.ndarray, mean: np.ndarray, scale: np.ndarray
+) -> np.ndarray:
+    """Return raw-feature thresholds that split exactly like the scaled ones.
+
+    scikit-learn compares ``float32((x - mean) / scale) <= threshold``.
+    Every raw threshold is the largest float64 ``x`` passing that test, so
+    the comparison on raw features takes the same branch for every input.
+    """
+    # Largest float32 not above the threshold, and the rounding boundary above it
+    limit = thresholds.astype(np.float32)
+    limit = np.where(limit > thresholds, np.nextafter(limit, np.float32(-np.inf)), limit)
+    upper = np.nextafter(limit, np.float32(np.inf))
+    middle = (limit.astype(float) + upper.astype(float)) / 2
+    # A tie rounds to the even neighbour, which passes if it is the limit
+    limit_even = (limit.view(np.int32) & 1) == 0
+    bound = np.where(limit_even, middle, np.nextafter(middle, -np.inf))
+
+    # Scaling is monotonic: bracket the largest passing input around the
+    # estimate, then bisect over the float64 values in between
+    def passes(ordered: np.ndarray) -> np.ndarray:
+        return (_from_ordered(ordered) - mean) / scale <= bound
+
+    estimate = bound * scale + mean
+    width = 4 * np.spacing(np.abs(mean) + np.abs(bound * scale))
+    while True:
+        low = _to_ordered(estimate - width)
+        high = _to_ordered(estimate + width)
+        bracketed = passes(low) & ~passes(high)
+        if bracketed.all():
+            break
+        width = np.where(bracketed, width, 2 * width)
+    while (high - low > 1).any():
+        middle = low + (high - low) // 2
+        middle_passes = passes(middle)
+        low = np.where(middle_passes, middle, low)
+        high = np.where(middle_passes, high, middle)
+    return _from_ordered(low)
+
+
+def _leaf_probabilities(values: np.ndarray) -> np.ndarray:
+    """Return the class probabilities of leaf values.
+
+    scikit-learn stores class fractions from 1.4 on and weighted class
+    counts before, which its ``predict_proba()`` normalized. Rows that do
+    not sum to 1 are normalized the same way.
+    """
+    totals = values.sum(axis=1, keepdims=True)
+    return np.where(
+        np.isclose(totals, 1.0), values, values / np.where(totals == 0, 1.0, totals)
+    )
+
+
+class CompactForest:
+    """A trained random forest flattened into a few contiguous arrays.
+
+    Split nodes of every tree are stored back to back: the feature and
+    threshold they split on, and their two children. A child is either the
+    index of another split node, or ``~leaf`` for a row of leaf class
+    probabilities. The scaler the forest was trained behind is folded into
+    the thresholds, so raw features are compared directly.
+
+    ``predict_proba()`` walks all trees for a batch at once, advancing every
+    (row, tree) pair that has not reached a leaf by one level per step, and
+    sums the leaf probabilities in tree order, so it returns the same
+    probabilities as scikit-learn without importing it.
+    """
+
+    __slots__ = ("feature", "threshold", "children", "values", "roots")
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        values: np.ndarray,
+        roots: np.ndarray,
+    ) -> None:
+        """Initialize the forest from its arrays."""
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.values = values
+        self.roots = roots
+
+    @classmethod
+    def from_sklearn(cls, forest: Any, scaler: Any) -> CompactForest:
+        """Flatten a fitted RandomForestClassifier and its StandardScaler."""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        split_count = 0
+        leaf_count = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            split = tree.children_left >= 0
+            # Number split nodes and leaves in their own sequences
+            codes = np.where(
+                split,
+                split_count + np.cumsum(split) - 1,
+                ~(leaf_count + np.cumsum(~split) - 1),
+            ).astype(np.int32)
+
+            features.append(tree.feature[split].astype(np.int32))
+            thresholds.append(tree.threshold[split])
+            children.append(
+                np.stack(
+                    (codes[tree.children_left[split]], codes[tree.children_right[split]]),
+                    axis=1,
+                ).ravel()
+            )
+            values.append(_leaf_probabilities(tree.value[~split, 0, :]))
+            roots.append(codes[0])
+
+            split_count += int(split.sum())
+            leaf_count += int((~split).sum())
+
+        feature = np.concatenate(features)
+        return cls(
+            feature,
+            _fold_thresholds(
+                np.concatenate(thresholds),
+                np.asarray(scaler.mean_, dtype=float)[feature],
+                np.asarray(scaler.scale_, dtype=float)[feature],
+            ),
+            np.concatenate(children),
+            np.ascontiguousarray(np.concatenate(values), dtype=float),
+            np.asarray(roots, dtype=np.int32),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory held by the arrays."""
+        return sum(
+            array.nbytes
+            for array in (self.feature, self.threshold, self.children, self.values, self.roots)
+        )
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Return class probabilities for a batch of feature rows."""
+        features = np.asarray(features, dtype=float)
+        if features.ndim == 1:
+            features = features.reshape(-1, 1)
+        probabilities = np.empty((len(features), self.values.shape[1]))
+        # Bound the (trees x rows) working arrays on long histories
+        for start in range(0, len(features), PREDICT_CHUNK_ROWS):
+            chunk = slice(start, start + PREDICT_CHUNK_ROWS)
+            leaves = self._leaves(features[chunk])
+            # Summed over trees in order, as scikit-learn does
+            probabilities[chunk] = self.values[leaves].sum(axis=0)
+        probabilities /= len(self.roots)
+        return probabilities
+
+    def _leaves(self, features: np.ndarray) -> np.ndarray:
+        """Return the leaf every tree (rows) reaches for every sample (columns)."""
+        flat = np.ascontiguousarray(features).ravel()
+        codes = np.repeat(self.roots, len(features))
+        offsets = np.tile(np.arange(len(features)) * features.shape[1], len(self.roots))
+
+        # Only pairs still on a split node are advanced
+        pending = np.flatnonzero(codes >= 0)
+        nodes = codes[pending]
+        offsets = offsets[pending]
+        while len(pending):
+            go_right = flat[offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+            codes[pending] = nodes
+            split = nodes >= 0
+            pending, nodes, offsets = pending[split], nodes[split], offsets[split]
+        return ~codes.reshape(len(self.roots), len(features))
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Export the forest as a JSON serializable dict."""
+        return {name: _encode(getattr(self, name)) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> CompactForest:
+        """Restore a forest exported with as_dict()."""
+        return cls(*(_decode(data[name]) for name in cls.__slots__))
+
+    def as_arrays(self) -> Dict[str, np.ndarray]:
+        """Export the forest as named arrays."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray]) -> CompactForest:
+        """Restore a forest exported with as_arrays()."""
+        return cls(*(np.asarray(arrays[name]) for name in cls.__slots__))
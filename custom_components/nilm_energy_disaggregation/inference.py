@@ -0,0 +1,120 @@
+"""Background inference worker for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DEFAULT_INFERENCE_MAX_AGE, DEFAULT_INFERENCE_QUEUE_SIZE
+from .metrics import STAGE_INFERENCE, NilmMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+ResultCallback = Callable[[Dict[str, Dict[str, float]], datetime], None]
+
+# A power reading, or the readings of every channel of a multi-channel entry
+Reading = Union[float, Sequence[float]]
+
+
+class NilmInferenceWorker:
+    """Run model inference in the executor on coalesced micro-batches.
+
+    Samples are queued from the event loop. While a batch is being evaluated
+    in the executor, new samples accumulate in a bounded queue and are
+    evaluated together in a single vectorized call once the batch returns.
+    When the queue overflows, or samples grow older than ``max_age``, the
+    oldest samples are shed.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        model: Any,
+        on_result: ResultCallback,
+        max_queue: int = DEFAULT_INFERENCE_QUEUE_SIZE,
+        max_age: float = DEFAULT_INFERENCE_MAX_AGE,
+        metrics: Optional[NilmMetrics] = None,
+    ) -> None:
+        """Initialize the worker."""
+        self._hass = hass
+        self.model = model
+        self._on_result = on_result
+        self._timings = (metrics or NilmMetrics()).stages[STAGE_INFERENCE]
+        self._queue: Deque[Tuple[Reading, datetime]] = deque(maxlen=max_queue)
+        self._max_age = timedelta(seconds=max_age)
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        self.batches = 0
+        self.dropped_samples = 0
+
+    @property
+    def queued(self) -> int:
+        """Return the number of samples waiting for inference."""
+        return len(self._queue)
+
+    @callback
+    def async_submit(self, power: Reading, timestamp: datetime) -> None:
+        """Queue a sample and make sure a batch is scheduled."""
+        if self._stopped:
+            return
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped_samples += 1
+        self._queue.append((power, timestamp))
+        if self._task is None:
+            self._task = self._hass.async_create_task(self._async_drain())
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the worker and discard pending samples."""
+        self._stopped = True
+        self._queue.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @callback
+    def _async_take_batch(self) -> List[Tuple[Reading, datetime]]:
+        """Take every queued sample that is not stale."""
+        cutoff = self._queue[-1][1] - self._max_age
+        batch = [sample for sample in self._queue if sample[1] >= cutoff]
+        self.dropped_samples += len(self._queue) - len(batch)
+        self._queue.clear()
+        return batch
+
+    def _predict_batch(
+        self, batch: List[Tuple[Reading, datetime]]
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Evaluate a batch in the executor and time it."""
+        start = time.perf_counter_ns()
+        results = self.model.predict_batch(
+            [power for power, _ in batch],
+            [timestamp.timestamp() for _, timestamp in batch],
+        )
+        self._timings.record(time.perf_counter_ns() - start)
+        return results
+
+    async def _async_drain(self) -> None:
+        """Evaluate queued samples until the queue is empty."""
+        try:
+            while self._queue and not self._stopped:
+                batch = self._async_take_batch()
+                results = await self._hass.async_add_executor_job(
+                    self._predict_batch, batch
+                )
+                if self._stopped:
+                    return
+                self.batches += 1
+                _LOGGER.debug("Evaluated a batch of %d samples", len(batch))
+                for (_, timestamp), detected_devices in zip(batch, results):
+                    self._on_result(detected_devices, timestamp)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.exception("Unexpected error in NILM inference worker: %s", err)
+        finally:
+            self._task = None
@@ -0,0 +1,144 @@
+"""Per-device daily energy ledger of NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import LEDGER_SAVE_DELAY, STORAGE_KEY_LEDGER, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+HOURS_PER_DAY = 24
+
+
+class NilmEnergyLedger:
+    """Energy and runtime of every device today, in local hourly buckets.
+
+    Energy (Wh) and runtime (s) live in two ``devices x 24`` arrays. The
+    current bucket is moved by a timer at the top of every local hour, and
+    the ledger is cleared by the same timer at local midnight, so adding a
+    sample does no date arithmetic. Changes are persisted to ``.storage``
+    at most once per ``LEDGER_SAVE_DELAY`` and restored on startup if they
+    are from the same day.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, devices: List[str]) -> None:
+        """Initialize an empty ledger."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_LEDGER}.{entry_id}")
+        self.devices = list(devices)
+        self._index = {device: index for index, device in enumerate(self.devices)}
+        self.energy_wh = np.zeros((len(self.devices), HOURS_PER_DAY))
+        self.runtime_s = np.zeros((len(self.devices), HOURS_PER_DAY))
+        now = dt_util.now()
+        self._date = now.date()
+        self._hour = now.hour
+        self._save_scheduled = False
+
+    def index(self, device: str) -> int:
+        """Return the row of a device."""
+        return self._index[device]
+
+    @property
+    def date(self) -> date:
+        """Return the local day the ledger holds."""
+        return self._date
+
+    @property
+    def hour(self) -> int:
+        """Return the local hour samples are currently booked in."""
+        return self._hour
+
+    def add(self, index: int, energy_wh: float, runtime_s: float) -> None:
+        """Book energy and runtime of a device in the current hour."""
+        self.energy_wh[index, self._hour] += energy_wh
+        self.runtime_s[index, self._hour] += runtime_s
+        self._async_schedule_save()
+
+    def energy_kwh(self, index: int) -> float:
+        """Return the energy of a device today, in kWh."""
+        return float(self.energy_wh[index].sum()) / 1000
+
+    def runtime(self, index: int) -> float:
+        """Return the runtime of a device today, in seconds."""
+        return float(self.runtime_s[index].sum())
+
+    @callback
+    def async_reset(self, index: Optional[int] = None) -> None:
+        """Clear today's buckets of one device, or of every device."""
+        rows = slice(None) if index is None else index
+        self.energy_wh[rows] = 0.0
+        self.runtime_s[rows] = 0.0
+        self._async_schedule_save()
+
+    @callback
+    def async_start(
+        self,
+        on_reset: Callable[[], None],
+        on_hour_closed: Optional[Callable[[date, int], None]] = None,
+    ) -> CALLBACK_TYPE:
+        """Start moving the current bucket every hour, clearing at midnight.
+
+        ``on_hour_closed`` is called with the day and its number of completed
+        hours whenever an hour ends, before the ledger is cleared.
+        """
+
+        @callback
+        def _async_new_hour(now: datetime) -> None:
+            if now.date() != self._date:
+                if on_hour_closed is not None:
+                    on_hour_closed(self._date, HOURS_PER_DAY)
+                self._hour = now.hour
+                self._date = now.date()
+                self.async_reset()
+                on_reset()
+                return
+            self._hour = now.hour
+            if on_hour_closed is not None:
+                on_hour_closed(self._date, now.hour)
+
+        return async_track_time_change(
+            self._hass, _async_new_hour, minute=0, second=0
+        )
+
+    async def async_load(self) -> None:
+        """Restore today's buckets from storage."""
+        data = await self._store.async_load()
+        if not data or data.get("date") != self._date.isoformat():
+            return
+        energy = np.asarray(data["energy_wh"], dtype=float)
+        runtime = np.asarray(data["runtime_s"], dtype=float)
+        # Devices may have been enabled or disabled since the save
+        for row, device in enumerate(data["devices"]):
+            index = self._index.get(device)
+            if index is not None:
+                self.energy_wh[index] = energy[row]
+                self.runtime_s[index] = runtime[row]
+        _LOGGER.debug("Restored energy ledger of %s", self._date)
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Schedule one save for every change until it is written."""
+        if self._save_scheduled:
+            return
+        self._save_scheduled = True
+        self._store.async_delay_save(self._data_to_save, LEDGER_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        """Return the ledger as stored."""
+        self._save_scheduled = False
+        return {
+            "date": self._date.isoformat(),
+            "devices": self.devices,
+            "energy_wh": self.energy_wh.round(3).tolist(),
+            "runtime_s": self.runtime_s.round(1).tolist(),
+        }
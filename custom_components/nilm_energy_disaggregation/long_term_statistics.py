@@ -0,0 +1,197 @@
+"""Long-term statistics of NILM Energy Disaggregation devices."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+    statistics_during_period,
+)
+from homeassistant.const import UnitOfEnergy, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from .ledger import NilmEnergyLedger
+
+_LOGGER = logging.getLogger(__name__)
+
+SECONDS_PER_HOUR = 3600
+
+
+def energy_statistic_id(entry_id: str, device: str) -> str:
+    """Return the external statistic id of a device's energy."""
+    return f"{DOMAIN}:{entry_id.lower()}_{device}_energy"
+
+
+def energy_metadata(entry_id: str, device: str) -> StatisticMetaData:
+    """Return the statistic metadata of a device's energy."""
+    return StatisticMetaData(
+        has_mean=False,
+        has_sum=True,
+        name=f"NILM {device} energy",
+        source=DOMAIN,
+        statistic_id=energy_statistic_id(entry_id, device),
+        unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+    )
+
+
+def runtime_statistic_id(entry_id: str, device: str) -> str:
+    """Return the external statistic id of a device's runtime."""
+    return f"{DOMAIN}:{entry_id.lower()}_{device}_runtime"
+
+
+def runtime_metadata(entry_id: str, device: str) -> StatisticMetaData:
+    """Return the statistic metadata of a device's runtime."""
+    return StatisticMetaData(
+        has_mean=False,
+        has_sum=True,
+        name=f"NILM {device} runtime",
+        source=DOMAIN,
+        statistic_id=runtime_statistic_id(entry_id, device),
+        unit_of_measurement=UnitOfTime.HOURS,
+    )
+
+
+def hour_starts(day: date, hours: int) -> List[Optional[datetime]]:
+    """Return the start of the first local hours of a day, in UTC.
+
+    An hour skipped by a DST change starts at the same instant as the next
+    one, which holds its readings, so it is None.
+    """
+    midnight = dt_util.start_of_local_day(day)
+    starts = [dt_util.as_utc(midnight.replace(hour=hour)) for hour in range(hours)]
+    return [
+        None if start == following else start
+        for start, following in zip(starts, starts[1:] + [None])
+    ]
+
+
+def last_sums(
+    hass: HomeAssistant, statistic_ids: List[str]
+) -> Dict[str, Tuple[datetime, float]]:
+    """Return the start and sum of the last statistic of every id that has one."""
+    last: Dict[str, Tuple[datetime, float]] = {}
+    for statistic_id in statistic_ids:
+        rows = get_last_statistics(hass, 1, statistic_id, True, {"sum"}).get(statistic_id)
+        if rows:
+            last[statistic_id] = (
+                dt_util.utc_from_timestamp(rows[0]["start"]),
+                rows[0]["sum"] or 0.0,
+            )
+    return last
+
+
+def sums_before(
+    hass: HomeAssistant, statistic_ids: List[str], time: datetime
+) -> Dict[str, float]:
+    """Return the sum of the last statistic starting before a time, for every id that has one.
+
+    The hour before is read first; ids without a statistic there are read
+    over their whole history before the time.
+    """
+    sums: Dict[str, float] = {}
+    for since in (time - timedelta(hours=1), dt_util.utc_from_timestamp(0)):
+        missing = {statistic_id for statistic_id in statistic_ids if statistic_id not in sums}
+        if not missing:
+            break
+        rows = statistics_during_period(hass, since, time, missing, "hour", None, {"sum"})
+        for statistic_id, statistic_rows in rows.items():
+            if statistic_rows:
+                sums[statistic_id] = statistic_rows[-1]["sum"] or 0.0
+    return sums
+
+
+class NilmStatisticsExporter:
+    """Export the hourly energy and runtime of the ledger to long-term statistics.
+
+    Each time the ledger closes an hour, every completed hour of its day
+    that the statistics do not hold yet is exported. This also covers hours
+    completed while Home Assistant was stopped, as long as the ledger was
+    restored for the same day. Each statistic gets one batched
+    ``async_add_external_statistics()`` call. Sums continue from the last
+    statistic in the database, so they line up with a previous backfill.
+    The database is only read by the first export, later ones continue
+    from what was exported last, until a backfill rewrites the statistics
+    and ``async_reset()`` is called.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, ledger: NilmEnergyLedger) -> None:
+        """Initialize the exporter."""
+        self._hass = hass
+        self._ledger = ledger
+        self._metadata = [
+            (energy_metadata(entry_id, device), runtime_metadata(entry_id, device))
+            for device in ledger.devices
+        ]
+        self._last: Optional[Dict[str, Tuple[datetime, float]]] = None
+        self._lock = asyncio.Lock()
+        self.exported_rows = 0
+
+    @callback
+    def async_export(self, day: date, hours: int) -> None:
+        """Export the first ``hours`` buckets of the ledger's day in the background."""
+        if not hours or "recorder" not in self._hass.config.components:
+            return
+        # Copies, the ledger is cleared at midnight right after this call
+        self._hass.async_create_task(
+            self._async_export(
+                day, hours, self._ledger.energy_wh.copy(), self._ledger.runtime_s.copy()
+            )
+        )
+
+    async def async_reset(self) -> None:
+        """Read the last sums from the database again on the next export."""
+        async with self._lock:
+            self._last = None
+
+    async def _async_export(
+        self, day: date, hours: int, energy_wh: np.ndarray, runtime_s: np.ndarray
+    ) -> None:
+        """Export the first ``hours`` buckets of a day."""
+        async with self._lock:
+            if self._last is None:
+                statistic_ids = [
+                    metadata["statistic_id"] for pair in self._metadata for metadata in pair
+                ]
+                self._last = await get_instance(self._hass).async_add_executor_job(
+                    last_sums, self._hass, statistic_ids
+                )
+            self._export(hour_starts(day, hours), energy_wh, runtime_s, self._last)
+        _LOGGER.debug("Exported NILM statistics of %s up to hour %d", day, hours)
+
+    def _export(
+        self,
+        starts: List[Optional[datetime]],
+        energy_wh: np.ndarray,
+        runtime_s: np.ndarray,
+        last: Dict[str, Tuple[datetime, float]],
+    ) -> None:
+        """Add the statistics of the hours after the last exported one."""
+        for row, pair in enumerate(self._metadata):
+            for metadata, values in zip(
+                pair, (energy_wh[row] / 1000, runtime_s[row] / SECONDS_PER_HOUR)
+            ):
+                last_start, total = last.get(metadata["statistic_id"], (None, 0.0))
+                statistics = []
+                for start, value in zip(starts, values):
+                    if start is None or (last_start is not None and start <= last_start):
+                        continue
+                    total += float(value)
+                    statistics.append(
+                        StatisticData(start=start, state=float(value), sum=total)
+                    )
+                if statistics:
+                    async_add_external_statistics(self._hass, metadata, statistics)
+                    last[metadata["statistic_id"]] = (statistics[-1]["start"], total)
+                    self.exported_rows += len(statistics)
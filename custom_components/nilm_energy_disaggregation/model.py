@@ -0,0 +1,342 @@
+"""NILM model for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import base64
+import copy
+import hashlib
+import json
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+
+from .const import DEFAULT_COMPILED_RESOLUTION, DEFAULT_EDGE_THRESHOLD, FEATURE_WINDOW
+from .features import FEATURES, signature_training_set
+from .forest import CompactForest
+from .signatures import SignatureLibrary, builtin_library
+
+# Bump whenever training or compilation changes so cached models are rebuilt
+MODEL_FORMAT_VERSION = 3
+
+# Training samples spread over every power state
+TRAINING_SAMPLES = 20
+
+
+def power_training_set(signatures: SignatureLibrary) -> Dict[str, np.ndarray]:
+    """Return power readings spread evenly over every state, labelled with its device."""
+    states = signatures.states
+    lows = np.array([state.min_power for state in states], dtype=float)
+    highs = np.array([state.max_power for state in states], dtype=float)
+    steps = np.linspace(0.0, 1.0, TRAINING_SAMPLES)
+    return {
+        "power": (lows[:, np.newaxis] + (highs - lows)[:, np.newaxis] * steps).ravel(),
+        "device": np.repeat(
+            np.array([state.device for state in states], dtype=object), TRAINING_SAMPLES
+        ),
+    }
+
+
+class NilmModel:
+    """NILM model for device detection.
+
+    With ``compiled`` enabled, the trained forest is sampled once over a
+    quantized power grid after every ``train()``. Since power is the only
+    feature, ``predict()`` reduces to an index lookup of the nearest grid
+    point, without touching the scaler or the forest: it returns the
+    forest's probabilities (as float32) at the reading rounded to the grid.
+    The forest is piecewise constant, so only readings within half a grid
+    step of one of its splits can get another class or confidence.
+
+    After fitting, the forest and its scaler are flattened into a
+    ``CompactForest`` and the scikit-learn objects are dropped. A trained
+    model can be exported with ``as_dict()`` or ``as_arrays()`` and restored
+    with ``load_dict()`` or ``load_arrays()`` so it does not have to be
+    retrained on every startup.
+    scikit-learn is only imported by ``train()``, so restored models never
+    load it.
+
+    The model detects the devices of ``signatures``, the built-in library
+    by default.
+
+    With ``multi_feature`` enabled, the model is trained on the rolling
+    features of synthetic traces of every device (see ``features.py``) and
+    predictions take a feature matrix. The lookup table only covers power,
+    so such models are never compiled.
+    """
+
+    def __init__(
+        self,
+        sensitivity: float = 0.5,
+        compiled: bool = True,
+        resolution: float = DEFAULT_COMPILED_RESOLUTION,
+        train: bool = True,
+        multi_feature: bool = False,
+        signatures: Optional[SignatureLibrary] = None,
+    ):
+        """Initialize the NILM model."""
+        self._sensitivity = sensitivity
+        self._estimator_params = {"n_estimators": 100, "random_state": 42}
+        self._forest: Optional[CompactForest] = None
+
+        # Compiled power -> probability lookup table
+        self._multi_feature = multi_feature
+        self._compiled = compiled and not multi_feature
+        self._resolution = resolution
+        self._classes: Optional[np.ndarray] = None
+        self._table: Optional[np.ndarray] = None
+        self._table_origin = 0.0
+
+        self._signatures = signatures if signatures is not None else builtin_library()
+        if multi_feature:
+            self._training_data = signature_training_set(self._signatures)
+        else:
+            self._training_data = power_training_set(self._signatures)
+
+        # Train initial model
+        if train:
+            self.train(self._training_data)
+
+    @property
+    def devices(self) -> List[str]:
+        """Return the devices the model can detect."""
+        return list(self._signatures)
+
+    @property
+    def signatures(self) -> SignatureLibrary:
+        """Return the signatures the model is trained on."""
+        return self._signatures
+
+    @property
+    def sensitivity(self) -> float:
+        """Return the confidence a prediction must exceed to be reported."""
+        return self._sensitivity
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Return the features the model is trained on."""
+        return list(FEATURES) if self._multi_feature else ["power"]
+
+    @property
+    def training_data(self) -> Dict[str, np.ndarray]:
+        """Return the training data built from the device signatures."""
+        return self._training_data
+
+    @property
+    def compiled(self) -> bool:
+        """Return True if predictions are served from the lookup table."""
+        return self._table is not None
+
+    @property
+    def exportable(self) -> bool:
+        """Return True once the model is trained and can be exported."""
+        return self._table is not None or self._forest is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory held by the lookup table and forest arrays."""
+        return (self._table.nbytes if self._table is not None else 0) + (
+            self._forest.nbytes if self._forest is not None else 0
+        )
+
+    @property
+    def cache_key(self) -> str:
+        """Return a hash of everything that determines the trained model."""
+        params = {
+            "version": MODEL_FORMAT_VERSION,
+            "signatures": self._signatures.as_dict(),
+            "estimator": self._estimator_params,
+            "compiled": self._compiled,
+            "resolution": self._resolution,
+        }
+        if self._multi_feature:
+            params["features"] = {
+                "names": FEATURES,
+                "window": FEATURE_WINDOW,
+                "threshold": DEFAULT_EDGE_THRESHOLD,
+            }
+        return hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def with_sensitivity(self, sensitivity: float) -> NilmModel:
+        """Return the model at another sensitivity, sharing the trained arrays."""
+        model = copy.copy(self)
+        model._sensitivity = sensitivity
+        return model
+
+    def train(self, training_data: Dict[str, np.ndarray]) -> None:
+        """Train the NILM model on "power" (or "features") and "device" label arrays."""
+        # pylint: disable-next=import-outside-toplevel
+        from sklearn.ensemble import RandomForestClassifier
+
+        # pylint: disable-next=import-outside-toplevel
+        from sklearn.preprocessing import StandardScaler
+
+        if self._multi_feature:
+            X = np.asarray(training_data["features"], dtype=float)
+        else:
+            X = np.asarray(training_data["power"], dtype=float).reshape(-1, 1)
+        y = np.asarray(training_data["device"])
+
+        # Scale features
+        forest = RandomForestClassifier(**self._estimator_params)
+        scaler = StandardScaler()
+        scaler.fit(X)
+        X_scaled = scaler.transform(X)
+
+        # Train model, then keep only its flattened arrays
+        forest.fit(X_scaled, y)
+        self._classes = forest.classes_
+        self._forest = CompactForest.from_sklearn(forest, scaler)
+
+        # Rebuild the lookup table so it always matches the trained forest
+        self._table = None
+        if self._compiled:
+            self._compile(float(X.min()), float(X.max()))
+            # The table stands in for the forest from now on
+            self._forest = None
+
+    def _compile(self, min_power: float, max_power: float) -> None:
+        """Sample the forest over a quantized power grid."""
+        # Outside the training range the forest is constant, so clamping
+        # lookups to the grid edges is exact
+        origin = np.floor(min_power / self._resolution) * self._resolution
+        steps = int(np.ceil((max_power - origin) / self._resolution)) + 1
+        grid = origin + self._resolution * np.arange(steps + 1)
+
+        probabilities = self._forest.predict_proba(grid.reshape(-1, 1))
+        self._table = np.ascontiguousarray(probabilities, dtype=np.float32)
+        self._table_origin = float(origin)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Export the trained model as a JSON serializable dict."""
+        if self._table is None:
+            if self._forest is None:
+                raise ValueError("Only trained models can be exported")
+            return {
+                "classes": [str(device) for device in self._classes],
+                "forest": self._forest.as_dict(),
+            }
+        return {
+            "classes": [str(device) for device in self._classes],
+            "origin": self._table_origin,
+            "resolution": self._resolution,
+            "shape": list(self._table.shape),
+            "table": base64.b64encode(self._table.tobytes()).decode("ascii"),
+        }
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        """Restore a model exported with as_dict()."""
+        self._classes = np.array(data["classes"], dtype=object)
+        if "forest" in data:
+            self._forest = CompactForest.from_dict(data["forest"])
+            self._table = None
+            return
+        self._table_origin = float(data["origin"])
+        self._resolution = float(data["resolution"])
+        self._table = np.frombuffer(
+            base64.b64decode(data["table"]), dtype=np.float32
+        ).reshape(data["shape"])
+
+    def as_arrays(self) -> Dict[str, np.ndarray]:
+        """Export the trained model as named arrays, for an ``.npz`` file."""
+        if not self.exportable:
+            raise ValueError("Only trained models can be exported")
+        arrays = {"classes": np.array([str(device) for device in self._classes])}
+        if self._table is None:
+            for name, array in self._forest.as_arrays().items():
+                arrays[f"forest_{name}"] = array
+            return arrays
+        arrays["origin"] = np.array(self._table_origin)
+        arrays["resolution"] = np.array(self._resolution)
+        arrays["table"] = self._table
+        return arrays
+
+    def load_arrays(self, arrays: Mapping[str, np.ndarray]) -> None:
+        """Restore a model exported with as_arrays()."""
+        self._classes = np.array([str(device) for device in arrays["classes"]], dtype=object)
+        if "table" not in arrays:
+            self._forest = CompactForest.from_arrays(
+                {name: arrays[f"forest_{name}"] for name in CompactForest.__slots__}
+            )
+            self._table = None
+            return
+        self._table_origin = float(arrays["origin"])
+        self._resolution = float(arrays["resolution"])
+        self._table = np.asarray(arrays["table"], dtype=np.float32)
+
+    def _predict_proba(
+        self, powers: np.ndarray, features: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return class probabilities for a batch of power readings."""
+        if self._multi_feature:
+            if features is None:
+                raise ValueError("A multi-feature model needs the reading features")
+            return self._forest.predict_proba(features)
+        if self._table is None:
+            return self._forest.predict_proba(powers.reshape(-1, 1))
+
+        # The forest at the nearest grid point, like its piecewise constant output
+        position = np.rint((powers - self._table_origin) / self._resolution)
+        return self._table[np.clip(position, 0, len(self._table) - 1).astype(np.intp)]
+
+    def predict_batch(
+        self,
+        powers: List[float],
+        timestamps: Optional[List[float]] = None,
+        features: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Predict devices for a batch of power readings in one model call."""
+        # A single probability evaluation yields both the class and its confidence
+        probabilities = self._predict_proba(np.asarray(powers, dtype=float), features)
+        best = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(best)), best]
+
+        # Only return predictions above sensitivity threshold
+        results = []
+        for power, index, confidence in zip(powers, best, confidences):
+            if confidence > self._sensitivity:
+                device = self._classes[index]
+                results.append({device: {"power": float(power), "confidence": float(confidence)}})
+            else:
+                results.append({})
+        return results
+
+    def predict_power_matrix(
+        self,
+        powers: np.ndarray,
+        timestamps: Optional[np.ndarray] = None,
+        features: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Return the power of every device (columns) for every reading (rows)."""
+        powers = np.asarray(powers, dtype=float)
+        probabilities = self._predict_proba(powers, features)
+        best = probabilities.argmax(axis=1)
+        detected = probabilities[np.arange(len(best)), best] > self._sensitivity
+
+        columns = np.array([self.devices.index(device) for device in self._classes])
+        matrix = np.zeros((len(powers), len(self.devices)))
+        matrix[detected, columns[best[detected]]] = powers[detected]
+        return matrix
+
+    def label(self, powers: np.ndarray) -> np.ndarray:
+        """Return the detected device for every reading, None below the sensitivity."""
+        probabilities = self._predict_proba(np.asarray(powers, dtype=float))
+        best = probabilities.argmax(axis=1)
+        labels = np.asarray(self._classes, dtype=object)[best]
+        labels[probabilities[np.arange(len(best)), best] <= self._sensitivity] = None
+        return labels
+
+    def predict(self, current_power: float) -> Dict[str, Dict[str, float]]:
+        """Predict devices from current power consumption."""
+        return self.predict_batch([current_power])[0]
+
+
+def train_exported_model(training_data: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Train a compiled model and return it exported.
+
+    This is the entry point of background retraining, which runs it in a
+    separate process so fitting never holds the event loop's GIL.
+    """
+    model = NilmModel(train=False)
+    model.train(training_data)
+    return model.as_dict()
@@ -0,0 +1,266 @@
+"""Persistent cache of trained NILM models."""
+from __future__ import annotations
+
+import asyncio
+import importlib
+from functools import partial
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Set, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DATA_MODEL_CACHE,
+    DATA_MODEL_REGISTRY,
+    DOMAIN,
+    MAX_CACHED_MODELS,
+    STORAGE_DIR_MODELS,
+    STORAGE_KEY_MODELS,
+    STORAGE_VERSION,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .model import NilmModel
+    from .signatures import SignatureLibrary
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def read_arrays(path: str) -> Dict[str, np.ndarray]:
+    """Return the arrays of an ``.npz`` file."""
+    # pylint: disable-next=import-outside-toplevel
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def write_arrays(path: str, arrays: Dict[str, np.ndarray]) -> None:
+    """Write arrays to an ``.npz`` file, replacing it at once."""
+    # pylint: disable-next=import-outside-toplevel
+    import numpy as np
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as file:
+        np.savez(file, **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+def remove_files(paths: Iterable[str]) -> None:
+    """Remove files, ignoring the ones already gone."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class NilmModelCache:
+    """Store trained models in .storage, keyed by their training parameters.
+
+    The arrays of every model are an ``.npz`` file in ``STORAGE_DIR_MODELS``,
+    read when the model is loaded and never kept by the cache. A small
+    index store records the file and save time of every model.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY_MODELS)
+        self._directory = hass.config.path(STORAGE_DIR, STORAGE_DIR_MODELS)
+        self._index: Optional[Dict[str, Dict[str, str]]] = None
+
+    async def _async_index(self) -> Dict[str, Dict[str, str]]:
+        """Return the index of the cached models, loading it from disk once."""
+        if self._index is None:
+            data = await self._store.async_load()
+            models = (data or {}).get("models", {})
+            # Models exported inline by earlier versions are dropped
+            self._index = {key: cached for key, cached in models.items() if "file" in cached}
+            if len(self._index) != len(models):
+                await self._store.async_save({"models": self._index})
+        return self._index
+
+    async def async_load_model(self, model: NilmModel, key: Optional[str] = None) -> bool:
+        """Restore a trained model from the cache, return False on a miss."""
+        key = key or model.cache_key
+        index = await self._async_index()
+        cached = index.get(key)
+        if cached is None:
+            return False
+
+        path = os.path.join(self._directory, cached["file"])
+        try:
+            arrays = await self._hass.async_add_executor_job(read_arrays, path)
+            await self._hass.async_add_executor_job(model.load_arrays, arrays)
+        except (OSError, KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Discarding unreadable cached NILM model: %s", err)
+            index.pop(key)
+            await self._hass.async_add_executor_job(remove_files, [path])
+            await self._store.async_save({"models": index})
+            return False
+        return True
+
+    async def async_save_model(self, model: NilmModel, key: Optional[str] = None) -> None:
+        """Add a trained model to the cache and persist it."""
+        if not model.exportable:
+            return
+
+        key = key or model.cache_key
+        await self._hass.async_add_executor_job(
+            write_arrays, os.path.join(self._directory, f"{key}.npz"), model.as_arrays()
+        )
+        index = await self._async_index()
+        index[key] = {"saved": dt_util.utcnow().isoformat(), "file": f"{key}.npz"}
+
+        # Keep only the most recently trained models
+        evicted = sorted(index, key=lambda key: index[key]["saved"])[:-MAX_CACHED_MODELS]
+        await self._hass.async_add_executor_job(
+            remove_files,
+            [os.path.join(self._directory, index.pop(key)["file"]) for key in evicted],
+        )
+        await self._store.async_save({"models": index})
+
+
+async def async_import_module(hass: HomeAssistant, module: str) -> Any:
+    """Import a module of this package, and with it numpy, in the executor."""
+    return await hass.async_add_executor_job(
+        importlib.import_module, f"{__package__}.{module}"
+    )
+
+
+def retrained_key(model: NilmModel, entry_id: str) -> str:
+    """Return the cache key of a model retrained on an entry's history."""
+    return f"{model.cache_key}_{entry_id}"
+
+
+@callback
+def async_get_model_cache(hass: HomeAssistant) -> NilmModelCache:
+    """Return the model cache shared by all config entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_MODEL_CACHE not in domain_data:
+        domain_data[DATA_MODEL_CACHE] = NilmModelCache(hass)
+    return domain_data[DATA_MODEL_CACHE]
+
+
+class NilmModelRegistry:
+    """Trained models shared by every config entry loaded in this process.
+
+    Entries whose model would be trained from the same signatures and
+    parameters share a single instance, whatever their sensitivities: the
+    sensitivity is only a threshold on the predictions, so every entry gets
+    a ``with_sensitivity()`` view of the shared arrays. An instance is
+    dropped once the last entry using it releases it. A model retrained on
+    the history of one entry is only used by that entry.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the registry."""
+        self._hass = hass
+        self._lock = asyncio.Lock()
+        self._models: Dict[str, NilmModel] = {}
+        self._users: Dict[str, Set[str]] = {}
+        self._entry_keys: Dict[str, str] = {}
+        # Models served from memory, from the cache and trained from scratch
+        self.shared_hits = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def model_count(self) -> int:
+        """Return the number of models held in memory."""
+        return len(self._models)
+
+    async def async_acquire(
+        self,
+        entry_id: str,
+        sensitivity: float,
+        signatures: SignatureLibrary,
+        multi_feature: bool = False,
+    ) -> NilmModel:
+        """Return an entry's model at its sensitivity, loading or training it if not shared yet."""
+        # Concurrent setups of entries with the same model must train it once
+        async with self._lock:
+            key, model = await self._async_get(
+                entry_id, sensitivity, signatures, multi_feature
+            )
+            self._async_register(entry_id, key, model)
+        return model.with_sensitivity(sensitivity)
+
+    async def _async_get(
+        self,
+        entry_id: str,
+        sensitivity: float,
+        signatures: SignatureLibrary,
+        multi_feature: bool,
+    ) -> Tuple[str, NilmModel]:
+        """Return the registry key and model for an entry."""
+        cache = async_get_model_cache(self._hass)
+        model_module = await async_import_module(self._hass, "model")
+        model = await self._hass.async_add_executor_job(
+            partial(
+                model_module.NilmModel,
+                sensitivity=sensitivity,
+                train=False,
+                multi_feature=multi_feature,
+                signatures=signatures,
+            )
+        )
+
+        # A model retrained on the entry's history takes precedence
+        for cache_key in (retrained_key(model, entry_id), model.cache_key):
+            if cache_key in self._models:
+                self.shared_hits += 1
+                _LOGGER.debug("Sharing NILM model %s with %s", cache_key, entry_id)
+                return cache_key, self._models[cache_key]
+            if await cache.async_load_model(model, cache_key):
+                self.cache_hits += 1
+                _LOGGER.debug("Loaded cached NILM model %s", cache_key)
+                return cache_key, model
+
+        self.cache_misses += 1
+        _LOGGER.debug("Training NILM model %s", model.cache_key)
+        await self._hass.async_add_executor_job(model.train, model.training_data)
+        await cache.async_save_model(model)
+        return model.cache_key, model
+
+    @callback
+    def _async_register(self, entry_id: str, key: str, model: NilmModel) -> None:
+        """Record that an entry uses a model."""
+        if self._entry_keys.get(entry_id) != key:
+            self.async_release(entry_id)
+        self._models[key] = model
+        self._users.setdefault(key, set()).add(entry_id)
+        self._entry_keys[entry_id] = key
+
+    @callback
+    def async_replace(self, entry_id: str, cache_key: str, model: NilmModel) -> None:
+        """Make an entry use a model trained for it alone, such as a retrained one."""
+        self._async_register(entry_id, cache_key, model)
+
+    @callback
+    def async_release(self, entry_id: str) -> None:
+        """Release the model of an entry, dropping it if no other entry uses it."""
+        key = self._entry_keys.pop(entry_id, None)
+        if key is None:
+            return
+        users = self._users[key]
+        users.discard(entry_id)
+        if not users:
+            del self._users[key]
+            del self._models[key]
+            _LOGGER.debug("Released NILM model %s", key)
+
+
+@callback
+def async_get_model_registry(hass: HomeAssistant) -> NilmModelRegistry:
+    """Return the model registry shared by all config entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_MODEL_REGISTRY not in domain_data:
+        domain_data[DATA_MODEL_REGISTRY] = NilmModelRegistry(hass)
+    return domain_data[DATA_MODEL_REGISTRY]
@@ -0,0 +1,186 @@
+"""Background retraining of NILM Energy Disaggregation models."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from datetime import timedelta
+from multiprocessing.pool import Pool
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .backfill import fetch_states, parse_states
+from .baseline import BaselineEstimator
+from .const import CONF_SOURCE_SENSOR, RETRAIN_HISTORY_DAYS, RETRAIN_MAX_SAMPLES
+from .model import NilmModel, train_exported_model
+from .model_cache import async_get_model_cache, async_get_model_registry, retrained_key
+from .runtime import NilmRuntimeData
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def build_training_data(
+    model: NilmModel, powers: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Label recorded powers with the current model and add the signature seeds.
+
+    Readings the current model cannot classify above its sensitivity are left
+    out, and the history is subsampled so fitting time stays bounded.
+    """
+    powers = powers[~np.isnan(powers)]
+    if len(powers) > RETRAIN_MAX_SAMPLES:
+        rng = np.random.default_rng(42)
+        powers = rng.choice(powers, RETRAIN_MAX_SAMPLES, replace=False)
+
+    labels = model.label(powers)
+    labelled = np.array([label is not None for label in labels], dtype=bool)
+    seeds = model.training_data
+    return {
+        "power": np.concatenate([seeds["power"], powers[labelled]]),
+        "device": np.concatenate([seeds["device"], labels[labelled]]),
+    }
+
+
+class NilmRetrainer:
+    """Retrain the classifier of a config entry without blocking inference.
+
+    Fitting runs in a single-process pool, so it never competes with the
+    event loop for the GIL. The running engine keeps serving predictions
+    until the new model is swapped in. Requests made while a retrain is
+    running join it, and a running retrain can be cancelled, which
+    terminates the training process.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        runtime_data: NilmRuntimeData,
+    ) -> None:
+        """Initialize the retrainer."""
+        self._hass = hass
+        self._config_entry = config_entry
+        self._runtime_data = runtime_data
+        self._task: Optional[asyncio.Task] = None
+        self._pool: Optional[Pool] = None
+
+    @staticmethod
+    def supports(engine: Any) -> bool:
+        """Return True if the engine is a model this retrainer can replace."""
+        return isinstance(engine, NilmModel)
+
+    @property
+    def running(self) -> bool:
+        """Return True while a retrain is in progress."""
+        return self._task is not None and not self._task.done()
+
+    @callback
+    def async_request(self) -> asyncio.Task:
+        """Start a retrain, or return the one already running."""
+        if not self.running:
+            self._task = self._hass.async_create_task(self._async_run())
+        return self._task
+
+    @callback
+    def async_cancel(self) -> bool:
+        """Cancel the running retrain, return False if none was running."""
+        if not self.running:
+            return False
+        self._task.cancel()
+        return True
+
+    async def _async_fit(self, training_data: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """Fit a model in a separate process and return it exported."""
+        loop = asyncio.get_running_loop()
+        result: asyncio.Future = loop.create_future()
+
+        def _resolve(value: Any) -> None:
+            if not result.done():
+                result.set_result(value)
+
+        def _fail(err: BaseException) -> None:
+            if not result.done():
+                result.set_exception(err)
+
+        # Spawn rather than fork: forking the threaded HA process is unsafe
+        creating = self._hass.async_add_executor_job(
+            multiprocessing.get_context("spawn").Pool, 1
+        )
+        try:
+            self._pool = await asyncio.shield(creating)
+            self._pool.apply_async(
+                train_exported_model,
+                (training_data,),
+                callback=lambda value: loop.call_soon_threadsafe(_resolve, value),
+                error_callback=lambda err: loop.call_soon_threadsafe(_fail, err),
+            )
+            return await result
+        finally:
+            # A cancel during the creation still gets the pool once it exists.
+            # Terminating also stops a fit that is still running after a cancel.
+            pool = await creating
+            self._pool = None
+            await self._hass.async_add_executor_job(pool.terminate)
+            await self._hass.async_add_executor_job(pool.join)
+
+    async def _async_run(self) -> None:
+        """Run a retrain and log its failure."""
+        try:
+            await self._async_retrain()
+        except asyncio.CancelledError:
+            _LOGGER.info("Retraining of the NILM model was cancelled")
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.exception("Retraining of the NILM model failed: %s", err)
+
+    async def _async_retrain(self) -> None:
+        """Retrain on recent history and swap the new model in."""
+        current = self._runtime_data.engine
+        source_sensor = self._config_entry.data[CONF_SOURCE_SENSOR]
+        end = dt_util.utcnow()
+        start = end - timedelta(days=RETRAIN_HISTORY_DAYS)
+
+        _LOGGER.info("Retraining NILM model on %s history", source_sensor)
+        states = await get_instance(self._hass).async_add_executor_job(
+            fetch_states, self._hass, source_sensor, start, end
+        )
+        offsets, powers = await self._hass.async_add_executor_job(
+            parse_states, states, start
+        )
+        del states
+        # The model sees readings without the always-on load, like the sensors
+        powers = await self._hass.async_add_executor_job(
+            BaselineEstimator().subtract_series, powers, offsets + start.timestamp()
+        )
+        training_data = await self._hass.async_add_executor_job(
+            build_training_data, current, powers
+        )
+
+        exported = await self._async_fit(training_data)
+
+        model = NilmModel(
+            sensitivity=self._runtime_data.sensitivity,
+            train=False,
+            signatures=current.signatures,
+        )
+        await self._hass.async_add_executor_job(model.load_dict, exported)
+
+        # Swap atomically: the next inference batch uses the new model
+        self._runtime_data.engine = model
+        if self._runtime_data.worker is not None:
+            self._runtime_data.worker.model = model
+
+        # Entries sharing the previous model keep using it
+        key = retrained_key(model, self._config_entry.entry_id)
+        async_get_model_registry(self._hass).async_replace(
+            self._config_entry.entry_id, key, model
+        )
+        await async_get_model_cache(self._hass).async_save_model(model, key)
+        _LOGGER.info(
+            "NILM model retrained on %d samples", len(training_data["power"])
+        )
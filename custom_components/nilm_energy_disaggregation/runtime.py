@@ -0,0 +1,59 @@
+"""Runtime data of NILM Energy Disaggregation config entries."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
+
+from .const import DEFAULT_SENSITIVITY, DOMAIN
+from .metrics import NilmMetrics
+
+if TYPE_CHECKING:
+    from .aggregation import PowerAggregator
+    from .baseline import NilmBaseline
+    from .inference import NilmInferenceWorker
+    from .ledger import NilmEnergyLedger
+    from .long_term_statistics import NilmStatisticsExporter
+    from .retrain import NilmRetrainer
+    from .sensor import NilmDeviceSensor
+
+
+@dataclass
+class NilmRuntimeData:
+    """Objects shared by the platforms and services of a config entry."""
+
+    config: Mapping[str, Any]
+    pipeline: Tuple[Any, ...] = ()
+    sensitivity: float = DEFAULT_SENSITIVITY
+    engine: Any = None
+    worker: Optional[NilmInferenceWorker] = None
+    sensors: Dict[str, NilmDeviceSensor] = field(default_factory=dict)
+    backfill_task: Optional[asyncio.Task] = None
+    retrainer: Optional[NilmRetrainer] = None
+    ledger: Optional[NilmEnergyLedger] = None
+    exporter: Optional[NilmStatisticsExporter] = None
+    aggregator: Optional[PowerAggregator] = None
+    baseline: Optional[NilmBaseline] = None
+    metrics: NilmMetrics = field(default_factory=NilmMetrics)
+
+
+def get_option(config_entry: ConfigEntry, key: str, default: Any = None) -> Any:
+    """Return a setting of an entry, the options taking precedence over the data."""
+    return config_entry.options.get(key, config_entry.data.get(key, default))
+
+
+def get_runtime_data(hass: HomeAssistant, entity_id: str) -> tuple[str, NilmRuntimeData]:
+    """Return the config entry id and runtime data behind a NILM entity."""
+    entity_entry = er.async_get(hass).async_get(entity_id)
+    if entity_entry is None or entity_entry.platform != DOMAIN:
+        raise HomeAssistantError(f"{entity_id} is not a NILM Energy Disaggregation entity")
+
+    runtime_data = hass.data.get(DOMAIN, {}).get(entity_entry.config_entry_id)
+    if not isinstance(runtime_data, NilmRuntimeData):
+        raise HomeAssistantError(f"The config entry of {entity_id} is not loaded")
+    return entity_entry.config_entry_id, runtime_data
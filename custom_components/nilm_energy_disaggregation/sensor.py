@@ -2,14 +2,10 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Set
 from datetime import datetime, timedelta
 
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-
 from homeassistant.components.sensor import (
     SensorEntity,
     SensorDeviceClass,
@@ -17,54 +13,136 @@ from homeassistant.components.sensor import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
-    CONF_SOURCE_SENSOR,
+    CONF_SCAN_INTERVAL,
+    EntityCategory,
     UnitOfPower,
     UnitOfEnergy,
     UnitOfTime,
 )
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_state_change
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change,
+    async_track_time_interval,
+)
 from homeassistant.helpers.typing import StateType
 from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
+    CONF_SOURCE_SENSOR,
+    CONF_SMOOTHING_MODE,
+    CONF_SMOOTHING_WINDOW,
+    CONF_AGGREGATION,
+    CONF_MIN_POWER,
+    CHANNEL_TICK_DELAY,
+    DEFAULT_AGGREGATION,
+    DEFAULT_MIN_POWER,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_SMOOTHING_MODE,
+    DEFAULT_SMOOTHING_WINDOW,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_CONFIDENCE_DEADBAND,
+    SIGNAL_OPTIONS_UPDATED,
     ATTR_CURRENT_POWER,
     ATTR_CUMULATIVE_RUNTIME,
     ATTR_DEVICE_STATE,
     ATTR_DAILY_ENERGY,
     ATTR_LAST_UPDATE,
-    ATTR_DETECTION_CONFIDENCE
+    ATTR_DETECTION_CONFIDENCE,
+    ATTR_DAILY_BASELINE,
+    ATTR_WEEKLY_BASELINE,
+)
+from .aggregation import PowerAggregator
+from .inference import NilmInferenceWorker
+from .metrics import (
+    METRICS_WRITE_INTERVAL,
+    STAGE_ACCOUNTING,
+    STAGE_PARSE,
+    STAGE_WRITE,
+    STAGES,
+    TIMING_SAMPLE_MASK,
+    LatencyHistogram,
+    NilmMetrics,
 )
+from .runtime import NilmRuntimeData, get_option
+from .engines import (
+    async_create_engine,
+    get_sensitivity,
+    get_source_sensors,
+)
+from .model_cache import async_import_module
+from .smoothing import PowerSmoother
+
+if TYPE_CHECKING:
+    from .baseline import NilmBaseline
+    from .ledger import NilmEnergyLedger
 
 LOGGER = logging.getLogger(__name__)
 
 class NilmDeviceSensor(SensorEntity):
-    """Representation of a NILM device sensor."""
+    """Representation of a NILM device sensor.
+
+    State writes are coalesced: ON/OFF transitions are written immediately,
+    other changes only once they leave the power/confidence deadband, and at
+    most once per ``min_write_interval``. A change that arrives too early is
+    flushed when the interval expires. States are only pushed, never polled.
+    """
 
     _attr_device_class = SensorDeviceClass.POWER
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = UnitOfPower.WATT
+    _attr_should_poll = False
+    # Hourly energy and runtime are exported to long-term statistics, so
+    # attributes changing on every write are kept out of the recorder
+    _unrecorded_attributes = frozenset(
+        {
+            ATTR_CUMULATIVE_RUNTIME,
+            ATTR_DAILY_ENERGY,
+            ATTR_LAST_UPDATE,
+            ATTR_DETECTION_CONFIDENCE,
+        }
+    )
 
     def __init__(
         self,
         hass: HomeAssistant,
+        entry_id: str,
         source_sensor: str,
         device_name: str,
-        initial_state: str = "OFF"
+        ledger: NilmEnergyLedger,
+        initial_state: str = "OFF",
+        min_write_interval: float = DEFAULT_SCAN_INTERVAL,
+        smoother: PowerSmoother | None = None,
+        metrics: NilmMetrics | None = None,
+        name: str | None = None,
+        min_power: float = DEFAULT_MIN_POWER,
     ):
         """Initialize the sensor."""
-        self._attr_name = f"NILM {device_name}"
-        self._attr_unique_id = f"{DOMAIN}_{device_name}"
+        self._attr_name = name or f"NILM {device_name}"
+        self._attr_unique_id = f"{entry_id}_{device_name}"
         self._source_sensor = source_sensor
         self._current_power = 0.0
-        self._cumulative_runtime = timedelta()
         self._device_state = initial_state
-        self._daily_energy = 0.0  # kWh
+        self._ledger = ledger
+        self._ledger_index = ledger.index(device_name)
         self._last_update = dt_util.utcnow()
         self._detection_confidence = 0.0
-        self._last_power_values = []  # Store last N power values for smoothing
+        self._smoother = smoother or PowerSmoother()
+        self._metrics = metrics or NilmMetrics()
+        self._write_timings = self._metrics.stages[STAGE_WRITE]
+        self._min_power = min_power
+
+        # Write coalescing
+        self._min_write_interval = timedelta(seconds=min_write_interval)
+        self._written_state = None
+        self._written_power = 0.0
+        self._written_confidence = 0.0
+        self._last_write = None
+        self._flush_unsub: CALLBACK_TYPE | None = None
 
     @property
     def native_value(self) -> float:
@@ -81,9 +159,11 @@ class NilmDeviceSensor(SensorEntity):
         """Return additional state attributes."""
         return {
             ATTR_CURRENT_POWER: self._current_power,
-            ATTR_CUMULATIVE_RUNTIME: str(self._cumulative_runtime),
+            ATTR_CUMULATIVE_RUNTIME: str(
+                timedelta(seconds=round(self._ledger.runtime(self._ledger_index)))
+            ),
             ATTR_DEVICE_STATE: self._device_state,
-            ATTR_DAILY_ENERGY: round(self._daily_energy, 3),
+            ATTR_DAILY_ENERGY: round(self._ledger.energy_kwh(self._ledger_index), 3),
             ATTR_LAST_UPDATE: self._last_update.isoformat(),
             ATTR_DETECTION_CONFIDENCE: round(self._detection_confidence * 100, 1)
         }
@@ -91,104 +171,239 @@ class NilmDeviceSensor(SensorEntity):
     def update_state(self, power: float, confidence: float, timestamp: datetime):
         """Update the state of the device."""
         # Update power with smoothing
-        self._last_power_values.append(power)
-        if len(self._last_power_values) > 5:  # Keep last 5 values
-            self._last_power_values.pop(0)
-        self._current_power = np.mean(self._last_power_values)
+        self._current_power = self._smoother.update(power)
         
         # Update confidence
         self._detection_confidence = confidence
         
         # Calculate time since last update
-        time_diff = timestamp - self._last_update
+        seconds = (timestamp - self._last_update).total_seconds()
         self._last_update = timestamp
         
-        # Update state and runtime
-        if power > 10:  # Threshold for device being ON
+        # Update state, and book runtime and energy (Wh) in the ledger
+        if power > self._min_power:
             if self._device_state == "OFF":
                 self._device_state = "ON"
-            self._cumulative_runtime += time_diff
-            
-            # Calculate energy consumption (kWh)
-            energy_kwh = (power * time_diff.total_seconds()) / (1000 * 3600)
-            self._daily_energy += energy_kwh
+            self._ledger.add(self._ledger_index, power * seconds / 3600, seconds)
         else:
             self._device_state = "OFF"
         
-        # Reset daily energy at midnight
-        if timestamp.hour == 0 and timestamp.minute == 0:
-            self._daily_energy = 0.0
-        
-        self.async_write_ha_state()
+        self._async_write_if_needed(timestamp)
 
-class NilmModel:
-    """NILM model for device detection."""
+    @callback
+    def async_set_options(
+        self,
+        min_power: float,
+        min_write_interval: float,
+        smoothing_window: int,
+        smoothing_mode: str,
+    ) -> None:
+        """Apply updated thresholds, write interval and smoothing."""
+        self._min_power = min_power
+        self._min_write_interval = timedelta(seconds=min_write_interval)
+        smoother = PowerSmoother(smoothing_window, smoothing_mode)
+        if smoother.settings != self._smoother.settings:
+            self._smoother = smoother
 
-    def __init__(self, sensitivity: float = 0.5):
-        """Initialize the NILM model."""
-        self._sensitivity = sensitivity
-        self._model = RandomForestClassifier(
-            n_estimators=100,
-            random_state=42
-        )
-        self._scaler = StandardScaler()
-        
-        # Example device signatures
-        self._device_signatures = {
-            "refrigerator": {"min_power": 40, "max_power": 100, "cycle_time": 30},
-            "tv": {"min_power": 80, "max_power": 150, "cycle_time": 0},
-            "microwave": {"min_power": 800, "max_power": 1200, "cycle_time": 0},
-            "washing_machine": {"min_power": 300, "max_power": 500, "cycle_time": 45},
-            "dishwasher": {"min_power": 200, "max_power": 400, "cycle_time": 60}
-        }
+    @callback
+    def async_reset_daily_energy(self) -> None:
+        """Clear today's energy and runtime of the device."""
+        self._ledger.async_reset(self._ledger_index)
+        self.async_write_ledger()
+
+    @callback
+    def async_write_ledger(self) -> None:
+        """Write the state after the ledger of the device changed."""
+        if self.hass is not None:
+            self._async_write(dt_util.utcnow())
+
+    @callback
+    def _async_write_if_needed(self, timestamp: datetime) -> None:
+        """Write the state if it changed enough and the rate limit allows it."""
+        if self.hass is None:
+            return
         
-        # Initialize training data with device signatures
-        power_values = []
-        device_labels = []
-        for device, signature in self._device_signatures.items():
-            # Generate sample points within device power range
-            powers = np.linspace(
-                signature["min_power"],
-                signature["max_power"],
-                20
-            )
-            power_values.extend(powers)
-            device_labels.extend([device] * 20)
+        # ON/OFF transitions are always written immediately
+        if self._device_state != self._written_state:
+            self._async_write(timestamp)
+            return
         
-        self._training_data = pd.DataFrame({
-            "power": power_values,
-            "device": device_labels
-        })
+        # Running devices accumulate energy and runtime, so they are refreshed
+        # at the maximum write rate; idle devices only when outside the deadband
+        if (
+            self._device_state == "OFF"
+            and abs(self._current_power - self._written_power) < DEFAULT_POWER_DEADBAND
+            and abs(self._detection_confidence - self._written_confidence)
+            < DEFAULT_CONFIDENCE_DEADBAND
+        ):
+            return
         
-        # Train initial model
-        self.train(self._training_data)
+        elapsed = timestamp - self._last_write
+        if elapsed >= self._min_write_interval:
+            self._async_write(timestamp)
+        elif self._flush_unsub is None:
+            self._flush_unsub = async_call_later(
+                self.hass,
+                self._min_write_interval - elapsed,
+                self._async_flush,
+            )
 
-    def train(self, training_data: pd.DataFrame) -> None:
-        """Train the NILM model."""
-        X = training_data[["power"]].values
-        y = training_data["device"].values
-        
-        # Scale features
-        self._scaler.fit(X)
-        X_scaled = self._scaler.transform(X)
-        
-        # Train model
-        self._model.fit(X_scaled, y)
+    @callback
+    def _async_write(self, timestamp: datetime) -> None:
+        """Write the state and remember what was written."""
+        if self._flush_unsub is not None:
+            self._flush_unsub()
+            self._flush_unsub = None
+        self._written_state = self._device_state
+        self._written_power = self._current_power
+        self._written_confidence = self._detection_confidence
+        self._last_write = timestamp
+        if not self._metrics.timing_writes:
+            self.async_write_ha_state()
+            return
+        start = time.perf_counter_ns()
+        self.async_write_ha_state()
+        self._write_timings.record(time.perf_counter_ns() - start)
 
-    def predict(self, current_power: float) -> Dict[str, Dict[str, float]]:
-        """Predict devices from current power consumption."""
-        # Scale input power
-        power_scaled = self._scaler.transform([[current_power]])
-        
-        # Get model predictions and probabilities
-        device = self._model.predict(power_scaled)[0]
-        probabilities = self._model.predict_proba(power_scaled)[0]
-        confidence = max(probabilities)
-        
-        # Only return predictions above sensitivity threshold
-        if confidence > self._sensitivity:
-            return {device: {"power": current_power, "confidence": confidence}}
-        return {}
+    @callback
+    def _async_flush(self, now: datetime) -> None:
+        """Write a change that was held back by the rate limit."""
+        self._flush_unsub = None
+        self._async_write(now)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel a pending write when the entity is removed."""
+        if self._flush_unsub is not None:
+            self._flush_unsub()
+            self._flush_unsub = None
+
+class NilmStandbySensor(SensorEntity):
+    """Always-on load of a config entry, removed before disaggregation.
+
+    The state is written when the baseline leaves the power deadband around
+    the last written value.
+    """
+
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfPower.WATT
+    _attr_icon = "mdi:power-standby"
+    _attr_should_poll = False
+
+    def __init__(self, entry_id: str, baseline: NilmBaseline) -> None:
+        """Initialize the sensor."""
+        self._attr_name = "NILM standby"
+        self._attr_unique_id = f"{entry_id}_standby"
+        self._baseline = baseline
+        self._written_value = baseline.value
+
+    @callback
+    def async_write_if_needed(self) -> None:
+        """Write the state if the baseline changed enough."""
+        if (
+            self.hass is None
+            or abs(self._baseline.value - self._written_value) < DEFAULT_POWER_DEADBAND
+        ):
+            return
+        self._written_value = self._baseline.value
+        self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> float:
+        """Return the current baseline."""
+        return round(self._baseline.value, 1)
+
+    @property
+    def extra_state_attributes(self) -> Dict[str, Any]:
+        """Return the day and week estimates."""
+        day = sum(estimator.day.value or 0.0 for estimator in self._baseline.estimators)
+        week = sum(estimator.week.value or 0.0 for estimator in self._baseline.estimators)
+        return {
+            ATTR_DAILY_BASELINE: round(day, 1),
+            ATTR_WEEKLY_BASELINE: round(week, 1),
+        }
+
+class NilmMetricSensor(SensorEntity):
+    """Diagnostic sensor exposing one hot path metric of a config entry.
+
+    The state is written every ``METRICS_WRITE_INTERVAL`` by the platform.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        entry_id: str,
+        key: str,
+        name: str,
+        value_fn: Callable[[], StateType],
+        unit: str | None = None,
+        state_class: SensorStateClass = SensorStateClass.MEASUREMENT,
+    ) -> None:
+        """Initialize the sensor."""
+        self._attr_name = name
+        self._attr_unique_id = f"{entry_id}_{key}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+        self._value_fn = value_fn
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the current value of the metric."""
+        return self._value_fn()
+
+
+def _metric_sensors(
+    entry_id: str, metrics: NilmMetrics, worker: NilmInferenceWorker
+) -> List[NilmMetricSensor]:
+    """Return the diagnostic sensors of a config entry, disabled by default."""
+
+    def p99(histogram: LatencyHistogram) -> Callable[[], StateType]:
+        return lambda: histogram.quantile_ms(0.99)
+
+    sensors = [
+        NilmMetricSensor(
+            entry_id,
+            f"{stage}_p99",
+            f"NILM {stage} p99",
+            p99(metrics.stages[stage]),
+            UnitOfTime.MILLISECONDS,
+        )
+        for stage in STAGES
+    ]
+    sensors.append(
+        NilmMetricSensor(
+            entry_id,
+            "events",
+            "NILM events",
+            lambda: metrics.events,
+            state_class=SensorStateClass.TOTAL_INCREASING,
+        )
+    )
+    sensors.append(
+        NilmMetricSensor(
+            entry_id,
+            "dropped_samples",
+            "NILM dropped samples",
+            lambda: worker.dropped_samples,
+            state_class=SensorStateClass.TOTAL_INCREASING,
+        )
+    )
+    return sensors
+
+@callback
+def _async_remove_stale_entities(
+    hass: HomeAssistant, config_entry: ConfigEntry, unique_ids: Set[str]
+) -> None:
+    """Remove the sensors of devices that are no longer enabled."""
+    registry = er.async_get(hass)
+    for entity_entry in er.async_entries_for_config_entry(registry, config_entry.entry_id):
+        if entity_entry.domain == "sensor" and entity_entry.unique_id not in unique_ids:
+            LOGGER.debug("Removing %s, its device is disabled", entity_entry.entity_id)
+            registry.async_remove(entity_entry.entity_id)
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -197,53 +412,306 @@ async def async_setup_entry(
 ) -> None:
     """Set up the NILM sensor platform."""
     source_sensor = config_entry.data.get(CONF_SOURCE_SENSOR)
+    source_sensors = get_source_sensors(config_entry)
+    scan_interval = get_option(config_entry, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+    min_power = get_option(config_entry, CONF_MIN_POWER, DEFAULT_MIN_POWER)
+    smoothing_mode = get_option(config_entry, CONF_SMOOTHING_MODE, DEFAULT_SMOOTHING_MODE)
+    smoothing_window = get_option(
+        config_entry, CONF_SMOOTHING_WINDOW, DEFAULT_SMOOTHING_WINDOW
+    )
+    
+    # Create the configured disaggregation engine, for the enabled devices only
+    runtime_data: NilmRuntimeData = hass.data[DOMAIN][config_entry.entry_id]
+    runtime_data.sensitivity = get_sensitivity(config_entry)
+    nilm_model = await async_create_engine(
+        hass, config_entry, sensitivity=runtime_data.sensitivity
+    )
+    runtime_data.engine = nilm_model
+    
+    # Restore today's energy and runtime
+    ledger_module = await async_import_module(hass, "ledger")
+    ledger = ledger_module.NilmEnergyLedger(
+        hass, config_entry.entry_id, nilm_model.devices
+    )
+    await ledger.async_load()
+    runtime_data.ledger = ledger
     
-    # Initialize NILM model
-    nilm_model = NilmModel(sensitivity=0.6)
+    # Devices found on one channel of a multi-channel entry are named after
+    # the source sensor of the channel
+    device_sources = {device: (source_sensor, None) for device in nilm_model.devices}
+    if len(source_sensors) > 1:
+        for device, (name, channel) in nilm_model.channel_devices.items():
+            if channel is None:
+                continue
+            source = hass.states.get(source_sensors[channel])
+            label = source.name if source is not None else source_sensors[channel]
+            device_sources[device] = (source_sensors[channel], f"NILM {name} ({label})")
     
     # Create sensors for each potential device
     device_sensors = {
-        device: NilmDeviceSensor(hass, source_sensor, device)
-        for device in nilm_model._device_signatures.keys()
+        device: NilmDeviceSensor(
+            hass,
+            config_entry.entry_id,
+            device_sources[device][0],
+            device,
+            ledger,
+            min_write_interval=scan_interval,
+            smoother=PowerSmoother(smoothing_window, smoothing_mode),
+            metrics=runtime_data.metrics,
+            name=device_sources[device][1],
+            min_power=min_power,
+        )
+        for device in nilm_model.devices
     }
     
-    async_add_entities(device_sensors.values(), True)
+    runtime_data.sensors = device_sensors
+    async_add_entities(device_sensors.values())
+    
+    @callback
+    def async_ledger_reset() -> None:
+        """Write every device state after the ledger was cleared at midnight."""
+        for sensor in device_sensors.values():
+            sensor.async_write_ledger()
+    
+    # Completed hours go to long-term statistics, including the ones of
+    # today that ended while Home Assistant was stopped
+    statistics_module = await async_import_module(hass, "long_term_statistics")
+    exporter = statistics_module.NilmStatisticsExporter(hass, config_entry.entry_id, ledger)
+    runtime_data.exporter = exporter
+    exporter.async_export(ledger.date, ledger.hour)
+    config_entry.async_on_unload(
+        ledger.async_start(async_ledger_reset, exporter.async_export)
+    )
+    metrics = runtime_data.metrics
+    parse_timings = metrics.stages[STAGE_PARSE]
+    accounting_timings = metrics.stages[STAGE_ACCOUNTING]
+    write_timings = metrics.stages[STAGE_WRITE]
+    
+    @callback
+    def async_update_sensors(
+        detected_devices: Dict[str, Dict[str, float]], current_time: datetime
+    ) -> None:
+        """Update every device sensor from one detection result."""
+        # Update device states
+        for device_name, device_data in detected_devices.items():
+            if device_name in device_sensors:
+                device_sensors[device_name].update_state(
+                    device_data["power"],
+                    device_data["confidence"],
+                    current_time
+                )
+        
+        # Update inactive devices
+        for device_name, sensor in device_sensors.items():
+            if device_name not in detected_devices:
+                sensor.update_state(0.0, 0.0, current_time)
+    
+    @callback
+    def async_apply_detections(
+        detected_devices: Dict[str, Dict[str, float]], current_time: datetime
+    ) -> None:
+        """Push a batch result from the inference worker to the entities."""
+        metrics.results += 1
+        if metrics.results & TIMING_SAMPLE_MASK:
+            async_update_sensors(detected_devices, current_time)
+            return
+        
+        # Entity writes happen inside update_state and are timed separately
+        write_ns = write_timings.total_ns
+        metrics.timing_writes = True
+        try:
+            start = time.perf_counter_ns()
+            async_update_sensors(detected_devices, current_time)
+            elapsed = time.perf_counter_ns() - start
+        finally:
+            metrics.timing_writes = False
+        accounting_timings.record(elapsed - (write_timings.total_ns - write_ns))
+    
+    # Model inference runs in the executor, never on the event loop
+    worker = NilmInferenceWorker(
+        hass, nilm_model, async_apply_detections, metrics=metrics
+    )
+    runtime_data.worker = worker
+    config_entry.async_on_unload(worker.async_stop)
+    metric_sensors = _metric_sensors(config_entry.entry_id, metrics, worker)
+    async_add_entities(metric_sensors)
+    
+    @callback
+    def async_write_metrics(now: datetime) -> None:
+        """Write the diagnostic sensors that are enabled."""
+        for sensor in metric_sensors:
+            if sensor.hass is not None:
+                sensor.async_write_ha_state()
+    
+    config_entry.async_on_unload(
+        async_track_time_interval(
+            hass, async_write_metrics, timedelta(seconds=METRICS_WRITE_INTERVAL)
+        )
+    )
+    
+    # The always-on load is tracked per channel and removed from the readings
+    baseline_module = await async_import_module(hass, "baseline")
+    baseline = baseline_module.NilmBaseline(
+        hass, config_entry.entry_id, len(source_sensors)
+    )
+    await baseline.async_load()
+    runtime_data.baseline = baseline
+    standby_sensor = NilmStandbySensor(config_entry.entry_id, baseline)
+    async_add_entities([standby_sensor])
+    _async_remove_stale_entities(
+        hass,
+        config_entry,
+        {
+            entity.unique_id
+            for entity in (*device_sensors.values(), *metric_sensors, standby_sensor)
+        },
+    )
+    
+    @callback
+    def async_submit(power: float, timestamp: datetime) -> None:
+        """Submit a reading of the source sensor minus the always-on load."""
+        worker.async_submit(baseline.subtract(power, timestamp.timestamp()), timestamp)
+        standby_sensor.async_write_if_needed()
     
     @callback
     def sensor_state_listener(entity_id: str, old_state: str, new_state: str) -> None:
         """Handle changes in source sensor state."""
+        nonlocal cancel_tick
         if new_state is None:
             return
         
+        metrics.events += 1
+        timed = not metrics.events & TIMING_SAMPLE_MASK
+        if timed:
+            start = time.perf_counter_ns()
         try:
             current_power = float(new_state.state)
-            current_time = dt_util.utcnow()
-            
-            # Use NILM model to detect devices
-            detected_devices = nilm_model.predict(current_power)
-            
-            # Update device states
-            for device_name, device_data in detected_devices.items():
-                if device_name in device_sensors:
-                    device_sensors[device_name].update_state(
-                        device_data["power"],
-                        device_data["confidence"],
-                        current_time
-                    )
-            
-            # Update inactive devices
-            for device_name, sensor in device_sensors.items():
-                if device_name not in detected_devices:
-                    sensor.update_state(0.0, 0.0, current_time)
-        
         except ValueError as err:
+            metrics.parse_errors += 1
             LOGGER.error("Error processing sensor data: %s", err)
-        except Exception as err:
-            LOGGER.exception("Unexpected error in NILM processing: %s", err)
+            return
+        if timed:
+            parse_timings.record(time.perf_counter_ns() - start)
+        
+        if readings is not None:
+            # Channels report one after the other, the readings of all
+            # channels within CHANNEL_TICK_DELAY make a single tick
+            readings.update(entity_id, current_power)
+            if cancel_tick is None:
+                cancel_tick = async_call_later(hass, CHANNEL_TICK_DELAY, async_tick)
+            return
+        
+        if aggregator is None:
+            async_submit(current_power, dt_util.utcnow())
+            return
+        
+        # Only a large step is evaluated before the end of the window
+        now = dt_util.utcnow()
+        window = aggregator.add(current_power, now)
+        if window is not None:
+            async_submit(window.mean, window.end)
+            if window.closed_by_step:
+                async_submit(current_power, now)
     
-    # Start monitoring the source sensor
-    async_track_state_change(
-        hass,
-        source_sensor,
-        sensor_state_listener
+    @callback
+    def async_close_window(now: datetime) -> None:
+        """Evaluate the readings of the scan interval that just ended."""
+        window = aggregator.close(dt_util.utcnow())
+        if window is not None:
+            async_submit(window.mean, window.end)
+    
+    @callback
+    def async_tick(now: datetime) -> None:
+        """Evaluate the latest readings of every channel in one sample."""
+        nonlocal cancel_tick
+        cancel_tick = None
+        worker.async_submit(
+            baseline.subtract_channels(readings.values, now.timestamp()), now
+        )
+        standby_sensor.async_write_if_needed()
+    
+    @callback
+    def async_cancel_tick() -> None:
+        """Drop the tick still waiting for readings."""
+        if cancel_tick is not None:
+            cancel_tick()
+    
+    config_entry.async_on_unload(async_cancel_tick)
+    
+    # The readings of a multi-channel entry are held in one vector
+    readings = None
+    cancel_tick: CALLBACK_TYPE | None = None
+    if len(source_sensors) > 1:
+        channels = await async_import_module(hass, "channels")
+        readings = channels.ChannelReadings(source_sensors)
+        for entity_id in source_sensors:
+            state = hass.states.get(entity_id)
+            try:
+                readings.update(entity_id, float(state.state))
+            except (AttributeError, ValueError):
+                continue
+    
+    # High-rate meters are evaluated once per scan interval
+    aggregator = None
+    window_timer: CALLBACK_TYPE | None = None
+    if readings is None and get_option(config_entry, CONF_AGGREGATION, DEFAULT_AGGREGATION):
+        aggregator = PowerAggregator()
+        runtime_data.aggregator = aggregator
+        window_timer = async_track_time_interval(
+            hass, async_close_window, timedelta(seconds=scan_interval)
+        )
+    
+    @callback
+    def async_stop_window_timer() -> None:
+        """Stop closing aggregation windows."""
+        if window_timer is not None:
+            window_timer()
+    
+    config_entry.async_on_unload(async_stop_window_timer)
+    
+    @callback
+    def async_options_updated() -> None:
+        """Apply updated thresholds and intervals without reloading the entry."""
+        nonlocal scan_interval, window_timer
+        sensitivity = get_sensitivity(config_entry)
+        if sensitivity != runtime_data.sensitivity:
+            # The next inference batch uses the new threshold, the trained
+            # model is shared rather than retrained
+            engine = runtime_data.engine.with_sensitivity(sensitivity)
+            runtime_data.engine = engine
+            runtime_data.sensitivity = sensitivity
+            worker.model = engine
+        
+        interval = get_option(config_entry, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+        if interval != scan_interval and window_timer is not None:
+            window_timer()
+            window_timer = async_track_time_interval(
+                hass, async_close_window, timedelta(seconds=interval)
+            )
+        scan_interval = interval
+        
+        for sensor in device_sensors.values():
+            sensor.async_set_options(
+                get_option(config_entry, CONF_MIN_POWER, DEFAULT_MIN_POWER),
+                scan_interval,
+                get_option(config_entry, CONF_SMOOTHING_WINDOW, DEFAULT_SMOOTHING_WINDOW),
+                get_option(config_entry, CONF_SMOOTHING_MODE, DEFAULT_SMOOTHING_MODE),
+            )
+        LOGGER.debug("Applied updated options of %s", config_entry.title)
+    
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            f"{SIGNAL_OPTIONS_UPDATED}_{config_entry.entry_id}",
+            async_options_updated,
+        )
+    )
+    
+    # Start monitoring the source sensors
+    config_entry.async_on_unload(
+        async_track_state_change(
+            hass,
+            source_sensors,
+            sensor_state_listener
+        )
     )
@@ -0,0 +1,300 @@
+"""Sequence-to-point disaggregation engine of NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import copy
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from .const import SEQ2POINT_BATCH_WINDOWS
+
+if TYPE_CHECKING:
+    from .signatures import SignatureLibrary
+
+
+def sliding_windows(series: np.ndarray, window: int) -> np.ndarray:
+    """Return the windows ending at every reading from the ``window``-th on.
+
+    The windows are a read-only view of the series, each row starting one
+    reading after the previous one, so no reading is copied.
+    """
+    stride = series.strides[0]
+    return as_strided(
+        series,
+        shape=(len(series) - window + 1, window),
+        strides=(stride, stride),
+        writeable=False,
+    )
+
+
+class WindowBuffer:
+    """The latest readings of a stream, viewed as one window per reading.
+
+    Readings are written to a preallocated array of ``window - 1 +
+    capacity`` readings. When a batch does not fit, the last ``window - 1``
+    readings are moved back to the start first, so the windows of every
+    batch of up to ``capacity`` readings are one stretch of the array and
+    are returned by ``sliding_windows()``. Before the stream fills a window
+    it is padded with its first reading.
+    """
+
+    __slots__ = ("_window", "_buffer", "_end")
+
+    def __init__(self, window: int, capacity: int) -> None:
+        """Initialize an empty buffer."""
+        self._window = window
+        self._buffer = np.empty(window - 1 + capacity, dtype=np.float32)
+        self._end: Optional[int] = None
+
+    def extend(self, readings: np.ndarray) -> np.ndarray:
+        """Add readings and return their windows, valid until the next call."""
+        count = len(readings)
+        history = self._window - 1
+        if self._end is None:
+            self._buffer[:history] = readings[0]
+            self._end = history
+        elif self._end + count > len(self._buffer):
+            self._buffer[:history] = self._buffer[self._end - history : self._end]
+            self._end = history
+        self._buffer[self._end : self._end + count] = readings
+        self._end += count
+        return sliding_windows(self._buffer[self._end - count - history : self._end], self._window)
+
+
+class Seq2PointNetwork:
+    """A convolutional sequence-to-point network, evaluated with NumPy.
+
+    Weights are read from a ``.npz`` file holding:
+
+    * ``devices``: the names of the ``n`` devices;
+    * ``window``: the number of readings of an input window;
+    * ``mains_mean`` and ``mains_std``: the normalization of the readings;
+    * ``power_mean`` and ``power_std``: the normalization of the power of
+      every device;
+    * ``layer_<i>_weight`` and ``layer_<i>_bias`` for every layer from 0:
+      a ``(kernel, in, out)`` weight is a valid 1-D convolution over
+      ``(length, channels)`` maps, a ``(in, out)`` weight a dense layer,
+      which flattens the maps in that order (the Keras layouts).
+
+    Every layer but the last is followed by a ReLU. The last one has ``2n``
+    outputs, the normalized power of every device at the last reading of
+    the window followed by the logit of the device running.
+
+    The normalization of the readings is folded into the first layer when
+    loading, so windows of raw readings are evaluated as they are.
+    """
+
+    def __init__(
+        self,
+        devices: List[str],
+        window: int,
+        layers: List[Tuple[np.ndarray, np.ndarray]],
+        power_mean: np.ndarray,
+        power_std: np.ndarray,
+    ) -> None:
+        """Initialize the network from normalized-input layers."""
+        self.devices = devices
+        self.window = window
+        self._layers = layers
+        self._power_mean = power_mean
+        self._power_std = power_std
+
+    @classmethod
+    def load(cls, path: str) -> Seq2PointNetwork:
+        """Read a network from a weights file and check its shapes."""
+        with np.load(path, allow_pickle=False) as data:
+            devices = [str(device) for device in data["devices"]]
+            window = int(data["window"])
+            mains_mean = float(data["mains_mean"])
+            mains_std = float(data["mains_std"])
+            power_mean = np.asarray(data["power_mean"], dtype=np.float32)
+            power_std = np.asarray(data["power_std"], dtype=np.float32)
+            layers = []
+            while f"layer_{len(layers)}_weight" in data:
+                layers.append(
+                    (
+                        np.asarray(data[f"layer_{len(layers)}_weight"], dtype=np.float32),
+                        np.asarray(data[f"layer_{len(layers)}_bias"], dtype=np.float32),
+                    )
+                )
+
+        if window < 1 or mains_std <= 0:
+            raise ValueError("The window and mains_std must be positive")
+        if power_mean.shape != (len(devices),) or power_std.shape != (len(devices),):
+            raise ValueError("power_mean and power_std need one value per device")
+        if not layers:
+            raise ValueError("The network has no layers")
+
+        length, channels = window, 1
+        flat = False
+        for number, (weight, bias) in enumerate(layers):
+            if weight.ndim == 3 and not flat:
+                kernel, inputs, outputs = weight.shape
+                if inputs != channels or not 0 < kernel <= length:
+                    raise ValueError(f"Layer {number} does not fit a {length}x{channels} map")
+                length, channels = length - kernel + 1, outputs
+            elif weight.ndim == 2:
+                inputs, outputs = weight.shape
+                if inputs != length * channels:
+                    raise ValueError(f"Layer {number} needs {length * channels} inputs")
+                length, channels, flat = 1, outputs, True
+            else:
+                raise ValueError(f"Layer {number} is neither a convolution nor dense")
+            if bias.shape != (outputs,):
+                raise ValueError(f"Layer {number} needs one bias per output")
+        if not flat or channels != 2 * len(devices):
+            raise ValueError(f"The last layer needs {2 * len(devices)} dense outputs")
+
+        # (x - mean) / std through the first layer is x through scaled weights
+        weight, bias = layers[0]
+        layers[0] = (
+            weight / np.float32(mains_std),
+            bias
+            - np.float32(mains_mean / mains_std)
+            * weight.reshape(-1, weight.shape[-1]).sum(axis=0),
+        )
+        return cls(devices, window, layers, power_mean, power_std)
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory held by the weights."""
+        return sum(weight.nbytes + bias.nbytes for weight, bias in self._layers)
+
+    def predict(self, windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the power and running probability of every device for every window."""
+        # Windows are (batch, length), maps (batch, length, channels)
+        maps = windows[:, :, np.newaxis]
+        last = len(self._layers) - 1
+        for number, (weight, bias) in enumerate(self._layers):
+            if weight.ndim == 3:
+                # Every output position sees a view of ``kernel`` positions
+                kernel = weight.shape[0]
+                batch, length, channels = maps.shape
+                patches = as_strided(
+                    maps,
+                    shape=(batch, length - kernel + 1, kernel, channels),
+                    strides=(maps.strides[0], maps.strides[1], maps.strides[1], maps.strides[2]),
+                    writeable=False,
+                )
+                maps = np.tensordot(patches, weight, axes=([2, 3], [0, 1]))
+            else:
+                maps = maps.reshape(len(maps), -1) @ weight
+            maps += bias
+            if number < last:
+                np.maximum(maps, 0, out=maps)
+
+        devices = len(self.devices)
+        power = np.maximum(maps[:, :devices] * self._power_std + self._power_mean, 0)
+        probability = 0.5 * (1 + np.tanh(0.5 * maps[:, devices:]))
+        return power, probability
+
+
+class Seq2PointEngine:
+    """Detect devices from the window of readings ending at every reading.
+
+    Live readings go through a ``WindowBuffer`` and every batch of them is
+    evaluated in one pass of the network. History arrays (backfill) are
+    windowed on their own, like a new stream, and evaluated
+    ``SEQ2POINT_BATCH_WINDOWS`` windows at a time. A device is reported
+    when its running probability is above the sensitivity, with the power
+    estimated by the network.
+
+    The network is shared between streams and sensitivities, the buffer
+    belongs to the stream. Only the devices of the network that are in
+    ``signatures`` are detected.
+    """
+
+    def __init__(
+        self, network: Seq2PointNetwork, signatures: SignatureLibrary, sensitivity: float = 0.5
+    ) -> None:
+        """Initialize the engine."""
+        self._network = network
+        self._sensitivity = sensitivity
+        self._columns = np.array(
+            [column for column, device in enumerate(network.devices) if device in signatures],
+            dtype=np.intp,
+        )
+        if not len(self._columns):
+            raise ValueError("The sequence model detects none of the enabled devices")
+        self._devices = [network.devices[column] for column in self._columns]
+        self._buffer = WindowBuffer(network.window, SEQ2POINT_BATCH_WINDOWS)
+
+    @classmethod
+    def from_file(
+        cls, path: str, signatures: SignatureLibrary, sensitivity: float = 0.5
+    ) -> Seq2PointEngine:
+        """Create an engine with the network of a weights file."""
+        return cls(Seq2PointNetwork.load(path), signatures, sensitivity)
+
+    @property
+    def devices(self) -> List[str]:
+        """Return the devices the engine can detect."""
+        return list(self._devices)
+
+    @property
+    def window(self) -> int:
+        """Return the number of readings of a window."""
+        return self._network.window
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory held by the network weights."""
+        return self._network.nbytes
+
+    def new_stream(self) -> Seq2PointEngine:
+        """Return an engine sharing the network, with no stream state."""
+        engine = copy.copy(self)
+        engine._buffer = WindowBuffer(self._network.window, SEQ2POINT_BATCH_WINDOWS)
+        return engine
+
+    def with_sensitivity(self, sensitivity: float) -> Seq2PointEngine:
+        """Return the engine at another sensitivity, keeping the stream state."""
+        engine = copy.copy(self)
+        engine._sensitivity = sensitivity
+        return engine
+
+    def _evaluate(self, windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the power and probability of the detected devices per window."""
+        power, probability = self._network.predict(windows)
+        return power[:, self._columns], probability[:, self._columns]
+
+    def predict_batch(
+        self, powers: List[float], timestamps: Optional[List[float]] = None
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Predict devices for a batch of readings, in order."""
+        readings = np.asarray(powers, dtype=np.float32)
+        results = []
+        for start in range(0, len(readings), SEQ2POINT_BATCH_WINDOWS):
+            windows = self._buffer.extend(readings[start : start + SEQ2POINT_BATCH_WINDOWS])
+            for device_powers, confidences in zip(*self._evaluate(windows)):
+                results.append({
+                    device: {"power": float(power), "confidence": float(confidence)}
+                    for device, power, confidence in zip(
+                        self._devices, device_powers, confidences
+                    )
+                    if confidence > self._sensitivity
+                })
+        return results
+
+    def predict_power_matrix(
+        self, powers: np.ndarray, timestamps: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return the power of every device (columns) for every reading (rows)."""
+        readings = np.asarray(powers, dtype=np.float32)
+        matrix = np.zeros((len(readings), len(self._devices)))
+        if not len(readings):
+            return matrix
+
+        window = self._network.window
+        series = np.concatenate((np.full(window - 1, readings[0], dtype=np.float32), readings))
+        windows = sliding_windows(series, window)
+        for start in range(0, len(windows), SEQ2POINT_BATCH_WINDOWS):
+            stop = start + SEQ2POINT_BATCH_WINDOWS
+            device_powers, confidences = self._evaluate(windows[start:stop])
+            matrix[start:stop] = np.where(confidences > self._sensitivity, device_powers, 0.0)
+        return matrix
+
+    def predict(self, current_power: float) -> Dict[str, Dict[str, float]]:
+        """Predict devices from current power consumption."""
+        return self.predict_batch([current_power])[0]
@@ -0,0 +1,147 @@
+"""Services for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+
+from .const import (
+    ATTR_CANCEL,
+    ATTR_DAYS,
+    ATTR_ENABLED,
+    DEFAULT_BACKFILL_DAYS,
+    DOMAIN,
+    SERVICE_BACKFILL,
+    SERVICE_RESET_DAILY_ENERGY,
+    SERVICE_RETRAIN_MODEL,
+    SERVICE_SET_DEBUG_CAPTURE,
+)
+from .debug_log import async_get_debug_capture
+from .engines import get_source_sensors
+from .model_cache import async_import_module
+from .runtime import get_runtime_data
+
+_LOGGER = logging.getLogger(__name__)
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_DAYS, default=DEFAULT_BACKFILL_DAYS): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=3650)
+        ),
+    }
+)
+
+RETRAIN_MODEL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_CANCEL, default=False): cv.boolean,
+    }
+)
+
+RESET_DAILY_ENERGY_SCHEMA = vol.Schema({vol.Required(ATTR_ENTITY_ID): cv.entity_id})
+
+SET_DEBUG_CAPTURE_SCHEMA = vol.Schema({vol.Required(ATTR_ENABLED): cv.boolean})
+
+
+@callback
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register the NILM Energy Disaggregation services."""
+
+    async def async_handle_backfill(call: ServiceCall) -> None:
+        """Start disaggregating the recorded history of an entry."""
+        entry_id, runtime_data = get_runtime_data(hass, call.data[ATTR_ENTITY_ID])
+        if "recorder" not in hass.config.components:
+            raise HomeAssistantError("Backfill requires the recorder integration")
+        if runtime_data.backfill_task is not None and not runtime_data.backfill_task.done():
+            raise HomeAssistantError("A backfill is already running for this entry")
+
+        config_entry = hass.config_entries.async_get_entry(entry_id)
+        if len(get_source_sensors(config_entry)) > 1:
+            raise HomeAssistantError("Backfill only supports entries with one source sensor")
+        backfill = await async_import_module(hass, "backfill")
+
+        async def async_run() -> None:
+            """Run the backfill and log its failure."""
+            try:
+                await backfill.async_backfill(
+                    hass, config_entry, call.data[ATTR_DAYS], runtime_data.sensitivity
+                )
+                if runtime_data.exporter is not None:
+                    # The backfill rewrote the sums the exporter continues from
+                    await runtime_data.exporter.async_reset()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.exception("Backfill failed: %s", err)
+
+        runtime_data.backfill_task = hass.async_create_task(async_run())
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_BACKFILL, async_handle_backfill, schema=BACKFILL_SCHEMA
+    )
+
+    async def async_handle_retrain_model(call: ServiceCall) -> None:
+        """Start retraining the model of an entry, or cancel a running retrain."""
+        entry_id, runtime_data = get_runtime_data(hass, call.data[ATTR_ENTITY_ID])
+        if call.data[ATTR_CANCEL]:
+            if runtime_data.retrainer is None or not runtime_data.retrainer.async_cancel():
+                raise HomeAssistantError("No retrain is running for this entry")
+            return
+
+        if "recorder" not in hass.config.components:
+            raise HomeAssistantError("Retraining requires the recorder integration")
+        retrain = await async_import_module(hass, "retrain")
+        if not retrain.NilmRetrainer.supports(runtime_data.engine):
+            raise HomeAssistantError("Only the classifier engine can be retrained")
+
+        if runtime_data.retrainer is None:
+            runtime_data.retrainer = retrain.NilmRetrainer(
+                hass, hass.config_entries.async_get_entry(entry_id), runtime_data
+            )
+        if runtime_data.retrainer.running:
+            _LOGGER.debug("Retrain of %s already running, joining it", entry_id)
+        runtime_data.retrainer.async_request()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RETRAIN_MODEL,
+        async_handle_retrain_model,
+        schema=RETRAIN_MODEL_SCHEMA,
+    )
+
+    async def async_handle_reset_daily_energy(call: ServiceCall) -> None:
+        """Clear today's energy and runtime of a device."""
+        entity_id = call.data[ATTR_ENTITY_ID]
+        _, runtime_data = get_runtime_data(hass, entity_id)
+        for sensor in runtime_data.sensors.values():
+            if sensor.entity_id == entity_id:
+                sensor.async_reset_daily_energy()
+                return
+        raise HomeAssistantError(f"{entity_id} is not a NILM device sensor")
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RESET_DAILY_ENERGY,
+        async_handle_reset_daily_energy,
+        schema=RESET_DAILY_ENERGY_SCHEMA,
+    )
+
+    async def async_handle_set_debug_capture(call: ServiceCall) -> None:
+        """Start or stop capturing the debug log to a file."""
+        capture = async_get_debug_capture(hass)
+        if call.data[ATTR_ENABLED]:
+            capture.async_enable(SERVICE_SET_DEBUG_CAPTURE)
+        else:
+            # Overrides the entry options until the entries are reloaded
+            await capture.async_disable()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_DEBUG_CAPTURE,
+        async_handle_set_debug_capture,
+        schema=SET_DEBUG_CAPTURE_SCHEMA,
+    )
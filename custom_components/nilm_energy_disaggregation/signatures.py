@@ -0,0 +1,281 @@
+"""Appliance signature library of NILM Energy Disaggregation."""
+from __future__ import annotations
+
+import logging
+import os
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util.json import load_json
+from homeassistant.util.yaml import load_yaml
+
+from .const import CONF_DEVICES_CONFIG, DEVICE_SIGNATURES, SIGNATURE_LIBRARY_FILES
+from .runtime import get_option
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_STATE = "on"
+
+
+def _power_range(value: Dict[str, Any]) -> Dict[str, Any]:
+    """Check that a power range is not reversed."""
+    if value["min_power"] > value["max_power"]:
+        raise vol.Invalid("min_power must not exceed max_power")
+    return value
+
+
+def _single_state(value: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand the single-state shorthand into a list of states."""
+    if "states" in value:
+        if "min_power" in value or "max_power" in value:
+            raise vol.Invalid("Use either states or min_power/max_power")
+        return value
+    if "min_power" not in value or "max_power" not in value:
+        raise vol.Invalid("A signature needs states or min_power and max_power")
+    value = dict(value)
+    value["states"] = [
+        _power_range(
+            {
+                "name": DEFAULT_STATE,
+                "min_power": value.pop("min_power"),
+                "max_power": value.pop("max_power"),
+            }
+        )
+    ]
+    return value
+
+
+STATE_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional("name", default=DEFAULT_STATE): cv.string,
+            vol.Required("min_power"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required("max_power"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        }
+    ),
+    _power_range,
+)
+
+SIGNATURE_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional("min_power"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional("max_power"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional("states"): vol.All(cv.ensure_list, [STATE_SCHEMA], vol.Length(min=1)),
+            vol.Optional("cycle_time", default=0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional("phases", default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=3)),
+        }
+    ),
+    _single_state,
+)
+
+LIBRARY_SCHEMA = vol.Schema({cv.slug: SIGNATURE_SCHEMA})
+
+
+@dataclass(frozen=True)
+class PowerState:
+    """A power range an appliance runs in."""
+
+    device: str
+    name: str
+    min_power: float
+    max_power: float
+
+    @property
+    def center(self) -> float:
+        """Return the middle of the range."""
+        return (self.min_power + self.max_power) / 2
+
+
+@dataclass(frozen=True)
+class ApplianceSignature:
+    """The power states and duty cycle of an appliance.
+
+    The power of an appliance running on several phases is its total over
+    all of them, split evenly between them.
+    """
+
+    name: str
+    states: Tuple[PowerState, ...]
+    cycle_time: float = 0.0
+    phases: int = 1
+
+    @property
+    def min_power(self) -> float:
+        """Return the lowest power of any state."""
+        return min(state.min_power for state in self.states)
+
+    @property
+    def max_power(self) -> float:
+        """Return the highest power of any state."""
+        return max(state.max_power for state in self.states)
+
+    @property
+    def nominal_power(self) -> float:
+        """Return the middle of the highest state, the appliance's rated power."""
+        return max(self.states, key=lambda state: state.max_power).center
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the signature in library format."""
+        return {
+            "states": [
+                {"name": state.name, "min_power": state.min_power, "max_power": state.max_power}
+                for state in self.states
+            ],
+            "cycle_time": self.cycle_time,
+            "phases": self.phases,
+        }
+
+
+class IntervalIndex:
+    """Find the states whose power range holds a reading in O(log n).
+
+    Every range bound splits the power axis into elementary segments. Each
+    segment is assigned, once, the states covering it, and each bound the
+    states ending exactly on it, so a lookup is one bisection.
+    """
+
+    def __init__(self, states: Iterable[PowerState], tolerance: float = 0.0) -> None:
+        """Compile the index, widening every range by ``tolerance``."""
+        ranges = [
+            (state.min_power * (1 - tolerance), state.max_power * (1 + tolerance), state)
+            for state in states
+        ]
+        self._bounds = sorted({bound for low, high, _ in ranges for bound in (low, high)})
+        covering: List[List[PowerState]] = [[] for _ in self._bounds]
+        ending: List[List[PowerState]] = [[] for _ in self._bounds]
+        for low, high, state in ranges:
+            first = bisect_right(self._bounds, low) - 1
+            last = bisect_right(self._bounds, high) - 1
+            for segment in range(first, last):
+                covering[segment].append(state)
+            ending[last].append(state)
+        self._covering = [tuple(states) for states in covering]
+        self._ending = [tuple(states) for states in ending]
+
+    def candidates(self, power: float) -> Tuple[PowerState, ...]:
+        """Return the states whose range holds a reading."""
+        segment = bisect_right(self._bounds, power) - 1
+        if segment < 0:
+            return ()
+        if power == self._bounds[segment]:
+            return self._covering[segment] + self._ending[segment]
+        return self._covering[segment]
+
+
+class SignatureLibrary(Mapping[str, ApplianceSignature]):
+    """Appliance signatures by device name."""
+
+    def __init__(self, signatures: Iterable[ApplianceSignature]) -> None:
+        """Initialize the library."""
+        self._signatures = {signature.name: signature for signature in signatures}
+        self._indexes: Dict[float, IntervalIndex] = {}
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> SignatureLibrary:
+        """Build a library from signatures validated with LIBRARY_SCHEMA."""
+        return cls(
+            ApplianceSignature(
+                name=device,
+                states=tuple(
+                    PowerState(device, state["name"], state["min_power"], state["max_power"])
+                    for state in signature["states"]
+                ),
+                cycle_time=signature["cycle_time"],
+                phases=signature["phases"],
+            )
+            for device, signature in config.items()
+        )
+
+    def __getitem__(self, device: str) -> ApplianceSignature:
+        """Return the signature of a device."""
+        return self._signatures[device]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the device names."""
+        return iter(self._signatures)
+
+    def __len__(self) -> int:
+        """Return the number of devices."""
+        return len(self._signatures)
+
+    @property
+    def states(self) -> List[PowerState]:
+        """Return the states of every device."""
+        return [state for signature in self._signatures.values() for state in signature.states]
+
+    def index(self, tolerance: float = 0.0) -> IntervalIndex:
+        """Return the interval index of the states, compiled on first use."""
+        if tolerance not in self._indexes:
+            self._indexes[tolerance] = IntervalIndex(self.states, tolerance)
+        return self._indexes[tolerance]
+
+    def by_phases(self, multi_phase: bool) -> SignatureLibrary:
+        """Return the single-phase or the multi-phase signatures."""
+        return SignatureLibrary(
+            signature
+            for signature in self._signatures.values()
+            if (signature.phases > 1) == multi_phase
+        )
+
+    def subset(self, devices: Iterable[str]) -> SignatureLibrary:
+        """Return a library restricted to some devices."""
+        return SignatureLibrary(
+            self._signatures[device] for device in devices if device in self._signatures
+        )
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Return the library in library format."""
+        return {device: signature.as_dict() for device, signature in self._signatures.items()}
+
+
+def builtin_library() -> SignatureLibrary:
+    """Return the library of the built-in device signatures."""
+    return SignatureLibrary.from_config(LIBRARY_SCHEMA(DEVICE_SIGNATURES))
+
+
+def load_signature_library(config_dir: str) -> SignatureLibrary:
+    """Return the built-in signatures, extended and overridden by the user library.
+
+    The user library is the first of ``SIGNATURE_LIBRARY_FILES`` found in
+    the config directory, mapping device names to signatures.
+    """
+    signatures = dict(DEVICE_SIGNATURES)
+    for filename in SIGNATURE_LIBRARY_FILES:
+        path = os.path.join(config_dir, filename)
+        if not os.path.isfile(path):
+            continue
+        try:
+            user = load_yaml(path) if filename.endswith(".yaml") else load_json(path)
+            LIBRARY_SCHEMA(user or {})
+        except (HomeAssistantError, vol.Invalid) as err:
+            _LOGGER.error("Ignoring invalid signature library %s: %s", path, err)
+            break
+        signatures.update(user or {})
+        _LOGGER.debug("Loaded %d signatures from %s", len(user or {}), path)
+        break
+    return SignatureLibrary.from_config(LIBRARY_SCHEMA(signatures))
+
+
+async def async_get_signatures(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> SignatureLibrary:
+    """Return the signatures of the devices enabled for a config entry."""
+    library = await hass.async_add_executor_job(
+        load_signature_library, hass.config.config_dir
+    )
+    devices_config: Mapping[str, bool] = get_option(config_entry, CONF_DEVICES_CONFIG) or {}
+    enabled = library.subset(
+        device for device in library if devices_config.get(device, True)
+    )
+    if not enabled:
+        _LOGGER.warning("No device is enabled, detecting all %d devices", len(library))
+        return library
+    return enabled
@@ -0,0 +1,110 @@
+"""Power smoothing for NILM Energy Disaggregation."""
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+
+from .const import (
+    DEFAULT_SMOOTHING_MODE,
+    DEFAULT_SMOOTHING_WINDOW,
+    SMOOTHING_EMA,
+    SMOOTHING_MEDIAN,
+    SMOOTHING_MODES,
+)
+
+
+class PowerSmoother:
+    """Smooth a power stream in O(1) per sample without allocating.
+
+    ``mean`` keeps a preallocated ring buffer of the last ``window`` samples
+    and a running sum, ``median`` additionally keeps the buffered samples in
+    a sorted list of the same fixed size, and ``ema`` is an exponential moving
+    average with the span of ``window``.
+    """
+
+    __slots__ = (
+        "_mode",
+        "_size",
+        "_values",
+        "_sorted",
+        "_index",
+        "_count",
+        "_sum",
+        "_alpha",
+        "_value",
+    )
+
+    def __init__(
+        self,
+        window: int = DEFAULT_SMOOTHING_WINDOW,
+        mode: str = DEFAULT_SMOOTHING_MODE,
+    ) -> None:
+        """Initialize the smoother."""
+        if mode not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown smoothing mode: {mode}")
+        self._mode = mode
+        self._size = max(1, int(window))
+        self._values = [0.0] * self._size
+        self._sorted: list[float] = []
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+        self._alpha = 2.0 / (self._size + 1)
+        self._value = 0.0
+
+    @property
+    def value(self) -> float:
+        """Return the current smoothed value."""
+        return self._value
+
+    @property
+    def settings(self) -> tuple[int, str]:
+        """Return the window and the mode of the smoother."""
+        return self._size, self._mode
+
+    def reset(self) -> None:
+        """Forget all buffered samples."""
+        self._sorted.clear()
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+        self._value = 0.0
+
+    def update(self, value: float) -> float:
+        """Add a sample and return the smoothed value."""
+        if self._mode == SMOOTHING_EMA:
+            if self._count:
+                self._value += self._alpha * (value - self._value)
+            else:
+                self._value = value
+                self._count = 1
+            return self._value
+
+        # Replace the oldest sample once the ring buffer is full
+        if self._count == self._size:
+            oldest = self._values[self._index]
+            self._sum -= oldest
+            if self._mode == SMOOTHING_MEDIAN:
+                del self._sorted[bisect_left(self._sorted, oldest)]
+        else:
+            self._count += 1
+
+        self._values[self._index] = value
+        self._sum += value
+        if self._mode == SMOOTHING_MEDIAN:
+            insort(self._sorted, value)
+
+        self._index += 1
+        if self._index == self._size:
+            self._index = 0
+            # Re-sum once per lap so floating point drift cannot accumulate
+            self._sum = sum(self._values)
+
+        if self._mode == SMOOTHING_MEDIAN:
+            middle = self._count // 2
+            if self._count % 2:
+                self._value = self._sorted[middle]
+            else:
+                self._value = (self._sorted[middle - 1] + self._sorted[middle]) / 2
+        else:
+            self._value = self._sum / self._count
+        return self._value